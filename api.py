@@ -1,17 +1,338 @@
 import json
+import threading
+import time
 import requests
-from requests_toolbelt.multipart.encoder import MultipartEncoder
-from dotenv import load_dotenv, set_key, find_dotenv
 import os
+from urllib.parse import urlencode
+
+from batch import Batch
+from cache import CacheEntry, ResponseCache
+from cassette import Cassette
+from coalescing import SingleFlight
+from credentials import CredentialStore, default_env_path
+from json_codec import JSONCodec, get_codec
+from metrics import MetricsRegistry, RequestTiming, TimedHTTPAdapter, connect_time, endpoint_label, reset_connect_time
+from renderers import get_renderer
+from resilience import Resilience
+from streaming import iter_json_items
+from tokens import TokenManager, token_identity
+from uploads import AvatarUpload, is_upload
+
+DEFAULT_BASE_URL = 'https://api.dev.zojnikfood.ru'
+DEFAULT_TIMEOUT = (3.05, 30)
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def idempotency_headers(key: str) -> dict:
+    """Заголовок Idempotency-Key: сервер выполняет изменяющий запрос с одним ключом только один раз"""
+    return {'Idempotency-Key': key} if key else None
+
 
 class Zojnik:
-    def __init__(self):
-        self.base_url = 'https://api.dev.zojnikfood.ru'
-        dotenv_path = find_dotenv()
-        load_dotenv(dotenv_path)
+    def __init__(self, base_url: str = None, pool_connections: int = 10,
+                 pool_maxsize: int = 10, pool_block: bool = False, keep_alive: bool = True,
+                 timeout=DEFAULT_TIMEOUT, token_leeway: float = 30.0, background_refresh: bool = False,
+                 verbosity='full', cache: ResponseCache = None, metrics: MetricsRegistry = None,
+                 cassette: Cassette = None, codec: JSONCodec = 'auto', coalescing: SingleFlight = None,
+                 resilience: Resilience = None):
+        """Клиент API Zojnik с собственным пулом соединений.
+
+        pool_connections - сколько пулов по разным хостам держать открытыми,
+        pool_maxsize - максимум keep-alive соединений к одному хосту,
+        pool_block - ждать освобождения соединения вместо открытия лишнего,
+        keep_alive - переиспользовать соединения между запросами,
+        timeout - таймаут запроса в секундах: число или пара (connect, read),
+        token_leeway - за сколько секунд до истечения access токена его обновлять,
+        background_refresh - обновлять токен в фоновом потоке, не дожидаясь очередного запроса,
+        verbosity - вывод ответов: 'silent', 'summary', 'full', 'log' или свой renderers.Renderer.
+        Каждый метод принимает verbosity и для отдельного вызова,
+        cache - cache.ResponseCache для справочников (категории, теги, антитеги); None отключает кэш,
+        metrics - metrics.MetricsRegistry для замеров каждого запроса; None отключает замеры,
+        cassette - cassette.Cassette для записи обменов с сервером или их воспроизведения без сети,
+        codec - JSON-кодек для тел запросов и ответов: 'auto' (orjson или msgspec, если установлены),
+        'orjson', 'msgspec', 'json' или свой json_codec.JSONCodec,
+        coalescing - coalescing.SingleFlight: одинаковые одновременные GET (тот же URL и пользователь) из разных
+        потоков выполняются одним запросом,
+        resilience - resilience.Resilience: повторы с задержкой и учётом Retry-After, адаптивное ограничение
+        одновременных запросов и размыкатель цепи по эндпоинтам. Resilience.default() включает всё сразу"""
+        dotenv_path = default_env_path()
         self.dotenv_path = dotenv_path  # Сохранение пути к .env файлу
+        # Хранилище общее для всех клиентов процесса: .env читается с диска один раз
+        self.credentials = CredentialStore.for_path(dotenv_path) if dotenv_path else None
+        if self.credentials is not None:
+            self.credentials.export_to_environ()
+        # Адрес API можно переопределить переменной окружения, например, чтобы работать с fake_server
+        self.base_url = (base_url or os.getenv('ZOJNIK_BASE_URL') or DEFAULT_BASE_URL).rstrip('/')
+
+        self.timeout = timeout
+        self.renderer = get_renderer(verbosity)
+        self.codec = get_codec(codec)
+        self.cache = cache
+        self.metrics = metrics
+        self.coalescing = coalescing
+        self.resilience = resilience
+        self.keep_alive = keep_alive
+        self.pool_maxsize = pool_maxsize
+        # Один адаптер (и пул urllib3 внутри него) разделяется всеми потоками,
+        # а объект Session у каждого потока свой: сам Session не потокобезопасен.
+        # TimedHTTPAdapter дополнительно замеряет время установки соединений для metrics
+        self._adapter = TimedHTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                         pool_block=pool_block)
+        if cassette is not None:
+            self._adapter = cassette.adapter(self._adapter)
+        self._local = threading.local()
+        self._sessions = []
+        self._sessions_lock = threading.Lock()
+        self._closed = False
+
+        # Токены берутся из окружения один раз, дальше живут в памяти и обновляются по refresh токену
+        self.tokens = TokenManager(self.get_access_token_by_refresh_token, os.getenv('valid_access_token'),
+                                   os.getenv('valid_refresh_token'), leeway=token_leeway)
+        if background_refresh:
+            self.tokens.start_background_refresh()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Закрывает все соединения пула. После закрытия клиент нельзя использовать"""
+        self.tokens.stop_background_refresh()
+        with self._sessions_lock:
+            self._closed = True
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
+        self._adapter.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def _get_session(self) -> requests.Session:
+        """Возвращает Session текущего потока, подключённый к общему пулу соединений"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('https://', self._adapter)
+            session.mount('http://', self._adapter)
+            if not self.keep_alive:
+                session.headers['Connection'] = 'close'
+            with self._sessions_lock:
+                if self._closed:
+                    raise RuntimeError("Клиент Zojnik уже закрыт")
+                self._sessions.append(session)
+            self._local.session = session
+        return session
+
+    def _request(self, method: str, path: str, auth: bool = False, **kwargs) -> requests.Response:
+        """Отправляет запрос к API через общий пул соединений.
+
+        При auth=True добавляет заголовок авторизации, а если сервер ответил 401, один раз обновляет токен
+        и повторяет запрос"""
+        if self._closed:
+            raise RuntimeError("Клиент Zojnik уже закрыт")
+        kwargs.setdefault('timeout', self.timeout)
+        if 'json' in kwargs:
+            # Тело кодируется выбранным кодеком, а не json.dumps внутри requests
+            kwargs['data'] = self.codec.dumps(kwargs.pop('json'))
+            kwargs['headers'] = {'Content-Type': 'application/json', **(kwargs.get('headers') or {})}
+        session = self._get_session()
+        # Ссылки пагинации (next) приходят от сервера уже абсолютными
+        url = path if path.startswith(('http://', 'https://')) else self.base_url + path
+        if not auth:
+            return self._send(session, method, url, **kwargs)
+
+        extra_headers = kwargs.pop('headers', None) or {}
+        headers = {**self.get_authorized_headers(), **extra_headers}
+        response = self._send(session, method, url, headers=headers, **kwargs)
+        used_token = headers['Authorization'][len('Bearer '):]
+        if response.status_code == 401 and self.tokens.refresh(stale_token=used_token):
+            self._discard(response)
+            headers = {**self.get_authorized_headers(), **extra_headers}
+            response = self._send(session, method, url, headers=headers, **kwargs)
+        return response
+
+    def _send(self, session: requests.Session, method: str, url: str, **kwargs) -> requests.Response:
+        """Отправляет запрос через self.resilience, если он задан. Заменённые повтором ответы
+        учитываются в метриках и закрываются"""
+        if self.resilience is None:
+            return self._transmit(session, method, url, **kwargs)
+        return self.resilience.send(endpoint_label(method, url), method,
+                                    lambda: self._transmit(session, method, url, **kwargs), self._discard)
+
+    def _discard(self, response: requests.Response):
+        self._observe(response)
+        response.close()
+
+    def _transmit(self, session: requests.Session, method: str, url: str, **kwargs) -> requests.Response:
+        """Отправляет запрос; если включены метрики, прикрепляет к ответу замеры в response.timing.
+        Замеры попадают в self.metrics через _observe, когда ответ разобран.
+
+        body_factory() строит потоковое тело заново для каждой отправки: прочитанный поток повторить нельзя"""
+        body_factory = kwargs.pop('body_factory', None)
+        if body_factory is not None:
+            body = body_factory()
+            kwargs['data'] = body
+            kwargs['headers'] = {**(kwargs.get('headers') or {}), 'Content-Type': body.content_type}
+        if self.metrics is None:
+            return session.request(method, url, **kwargs)
+
+        timing = RequestTiming(endpoint_label(method, url), started=time.perf_counter())
+        reset_connect_time()
+        try:
+            response = session.request(method, url, **kwargs)
+        except requests.RequestException as error:
+            timing.total = time.perf_counter() - timing.started
+            timing.connect = connect_time()
+            timing.error = type(error).__name__
+            self.metrics.observe(timing)
+            raise
+        timing.connect = connect_time()
+        timing.status = response.status_code
+        # elapsed - время от отправки запроса до разбора заголовков ответа
+        timing.ttfb = response.elapsed.total_seconds()
+        if not kwargs.get('stream'):
+            timing.total = time.perf_counter() - timing.started
+            timing.response_bytes = len(response.content)
+        response.timing = timing
+        return response
+
+    def _observe(self, response: requests.Response, decode: float = None):
+        """Передаёт замеры ответа в self.metrics. Для потокового ответа полное время и объём считаются
+        в момент вызова, то есть после чтения тела"""
+        timing = getattr(response, 'timing', None)
+        if timing is None:
+            return
+        if timing.total is None:
+            timing.total = time.perf_counter() - timing.started
+            timing.response_bytes = response.raw.tell()
+        timing.decode = decode
+        self.metrics.observe(timing)
+
+    def _parse(self, response: requests.Response):
+        """Возвращает тело ответа как JSON, а если это не JSON - как текст. JSON разбирается кодеком
+        прямо из байтов ответа"""
+        try:
+            return self.codec.loads(response.content)
+        except self.codec.errors:
+            return response.text
+
+    def _decode(self, response: requests.Response):
+        """_parse с замером времени разбора, если включены метрики"""
+        if self.metrics is None:
+            return self._parse(response)
+        started = time.perf_counter()
+        result = self._parse(response)
+        self._observe(response, time.perf_counter() - started)
+        return result
+
+    def _call(self, method: str, path: str, verbosity=None, **kwargs):
+        """Общий путь всех методов API: запрос, разбор ответа и вывод выбранным рендерером.
+        Возвращает статус запроса и результат"""
+        if method == 'GET' and self.coalescing is not None:
+            status, result = self.coalescing.do(self._coalescing_key(method, path, kwargs),
+                                                lambda: self._fetch(method, path, **kwargs))
+        else:
+            status, result = self._fetch(method, path, **kwargs)
+        self._render(status, result, method, path, verbosity)
+        return status, result
 
-    def get_access_and_refresh_token_pair(self, username: str, password: str) -> json:
+    def _fetch(self, method: str, path: str, **kwargs):
+        response = self._request(method, path, **kwargs)
+        return response.status_code, self._decode(response)
+
+    def _coalescing_key(self, method: str, path: str, kwargs: dict) -> tuple:
+        """Запросы объединяются, только если совпадают метод, URL с параметрами и пользователь (access токен)"""
+        params = kwargs.get('params')
+        identity = self.tokens.access_token if kwargs.get('auth') else None
+        return method, path, tuple(sorted(params.items())) if params else None, identity
+
+    def _render(self, status: int, result, method: str, path: str, verbosity=None):
+        renderer = self.renderer if verbosity is None else get_renderer(verbosity)
+        if renderer.enabled:
+            renderer.render(status, result, method, path)
+
+    def _cache_key(self, path: str) -> str:
+        """Как и в _coalescing_key, ключ включает пользователя: ответ одного пользователя не отдаётся другому,
+        даже при общем каталоге кэша. Пользователь берётся из токена, поэтому обновление токена запись не сбрасывает"""
+        return f'{self.base_url}{path}#{token_identity(self.tokens.access_token)}'
+
+    def _cached_call(self, path: str, verbosity=None):
+        """GET справочника через self.cache: свежая запись отдаётся без запроса, устаревшая отдаётся сразу
+        и перепроверяется в фоне, отсутствующая загружается с сервера"""
+        if self.cache is None:
+            return self._call('GET', path, auth=True, verbosity=verbosity)
+
+        key = self._cache_key(path)
+        entry = self.cache.get(key)
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.record('hits')
+        elif entry is not None and self.cache.is_usable_stale(entry):
+            self.cache.record('stale_served')
+            if self.cache.start_revalidation(key):
+                threading.Thread(target=self._background_revalidate, args=(key, path, entry),
+                                 name='zojnik-cache-revalidate', daemon=True).start()
+        else:
+            entry = self._revalidate(key, path, entry)
+        self._render(entry.status, entry.result, 'GET', path, verbosity)
+        return entry.status, entry.result
+
+    def _revalidate(self, key: str, path: str, entry: CacheEntry = None) -> CacheEntry:
+        """Условный запрос к серверу. 304 продлевает имеющуюся запись, 200 заменяет её"""
+        headers = {}
+        if entry is not None and entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry is not None and entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        response = self._request('GET', path, auth=True, headers=headers)
+        etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+
+        if response.status_code == 304 and entry is not None:
+            self._observe(response)
+            self.cache.record('revalidated')
+            entry = CacheEntry(entry.status, entry.result, etag or entry.etag, last_modified or entry.last_modified)
+        else:
+            self.cache.record('misses')
+            entry = CacheEntry(response.status_code, self._decode(response), etag, last_modified)
+            if response.status_code != 200:
+                return entry
+        self.cache.put(key, entry)
+        return entry
+
+    def _background_revalidate(self, key: str, path: str, entry: CacheEntry):
+        try:
+            self._revalidate(key, path, entry)
+        except (requests.RequestException, RuntimeError):
+            # Сеть недоступна или клиент закрыт: остаётся устаревшая запись, перепроверим при следующем обращении
+            pass
+        finally:
+            self.cache.finish_revalidation(key)
+
+    def _iter_items(self, path: str, page_size: int = None, chunk_size: int = STREAM_CHUNK_SIZE, model=None):
+        """Потоково читает список с сервера и отдаёт элементы по одному.
+
+        Тело ответа читается кусками по chunk_size байт и разбирается по мере поступления. Если сервер отдаёт
+        список постранично (page_size), генератор переходит по ссылкам next. С model (класс из models) каждый
+        элемент сразу превращается в модель, и словари всего списка в памяти не копятся. При ошибке HTTP бросает
+        requests.HTTPError"""
+        params = {'page_size': page_size} if page_size else None
+        while path:
+            envelope = {}
+            response = self._request('GET', path, auth=True, params=params, stream=True)
+            with response:
+                try:
+                    response.raise_for_status()
+                    items = iter_json_items(response.iter_content(chunk_size), envelope, self.codec.loads)
+                    yield from (items if model is None else map(model.from_dict, items))
+                finally:
+                    self._observe(response)
+            # next уже содержит все параметры запроса
+            path, params = envelope.get('next'), None
+
+    def get_access_and_refresh_token_pair(self, username: str, password: str, *, verbosity=None) -> json:
         '''Метод делает запрос к API сервера и возвращает статус запроса и результат в формате JSON с уникальной парой
         из access token и refresh token, найденным по указанным username и password'''
 
@@ -24,29 +345,24 @@ class Zojnik:
             'password': password
         }
 
-        response = requests.post(self.base_url + '/api/auth/jwt/create/', headers = headers, json=data)
-
-        status = response.status_code
-        result = ""
-
-        try:
-            result = response.json()
-        except json.decoder.JSONDecodeError:
-            result = response.text
-
-        # print(f"\n\nStatus Code: {status}")
-        print(f"\nResponse: {result}")
+        status, result = self._call('POST', '/api/auth/jwt/create/', headers=headers, json=data, verbosity=verbosity)
+        if 200 <= status < 300 and isinstance(result, dict) and 'access' in result:
+            self.tokens.set_tokens(result['access'], result.get('refresh'))
         return status, result
 
     def update_env_file(self, key: str, value: str):
         """Обновляет переменную в .env файле"""
-        if not self.dotenv_path:
+        self.update_env_values({key: value})
+
+    def update_env_values(self, values: dict):
+        """Обновляет несколько переменных в .env файле одной атомарной записью"""
+        if self.credentials is None:
             raise FileNotFoundError("Не удалось найти .env файл")
-        set_key(self.dotenv_path, key, value)
+        self.credentials.update(values)
 
     def get_authorized_headers(self):
         """Возвращает заголовки с токеном авторизации"""
-        access_token = os.getenv('valid_access_token')
+        access_token = self.tokens.get_access_token()
         if not access_token:
             raise ValueError("Не удалось найти 'valid_access_token' в .env файле")
         return {
@@ -54,7 +370,7 @@ class Zojnik:
             'Content-Type': 'application/json'
         }
 
-    def get_access_token_by_refresh_token(self, refresh_token: str) -> json:
+    def get_access_token_by_refresh_token(self, refresh_token: str, *, verbosity='silent') -> json:
         '''Метод делает запрос к API сервера, передаёт refresh token и возвращает статус запроса и результат в формате JSON,
         содержащий access token, если переданный refresh token является действительным'''
 
@@ -66,19 +382,7 @@ class Zojnik:
             'refresh': refresh_token
         }
 
-        response = requests.post(self.base_url + '/api/auth/jwt/refresh/', headers = headers, json=data)
-
-        status = response.status_code
-        result = ""
-
-        try:
-            result = response.json()
-        except json.decoder.JSONDecodeError:
-            result = response.text
-
-        # print(f"\n\nStatus Code: {status}")
-        # print(f"\nResponse: {result}")
-        return status, result
+        return self._call('POST', '/api/auth/jwt/refresh/', headers=headers, json=data, verbosity=verbosity)
 
     def verify_token(self, token: str) -> json:
         '''Метод делает запрос к API сервера, передаёт access token или refresh token и возвращает статус запроса 200
@@ -92,12 +396,13 @@ class Zojnik:
             'token': token
         }
 
-        response = requests.post(self.base_url + '/api/auth/jwt/verify/', headers = headers, json=data)
+        response = self._request('POST', '/api/auth/jwt/verify/', headers = headers, json=data)
+        self._observe(response)
 
         status = response.status_code
         return status
 
-    def new_user_registration(self, first_name: str, last_name: str, username: str, phone_number: str, email: str, password: str) -> json:
+    def new_user_registration(self, first_name: str, last_name: str, username: str, phone_number: str, email: str, password: str, *, verbosity=None) -> json:
         '''Метод делает запрос к API сервера на регистрацию нового пользователя и возвращает статус запроса и
         результат в формате JSON с данными о добавленном пользователе. Обязательные поля для заполнения email и password'''
 
@@ -114,89 +419,34 @@ class Zojnik:
             'password': password
         }
 
-        response = requests.post(self.base_url + '/api/users/reg/', headers = headers, json=data)
-
-        status = response.status_code
-        result = ""
-
-        try:
-            result = response.json()
-        except json.decoder.JSONDecodeError:
-            result = response.text
-
-        print(f"\nStatus Code: {status}")
-        print(f"\nResponse:")
-        if isinstance(result, list):
-            for item in result:
-                if isinstance(item, dict):
-                    for key, value in item.items():
-                        print(f"{key}: {value}")
-                    print()
-                else:
-                    print(item)
-        elif isinstance(result, dict):
-            for key, value in result.items():
-                print(f"{key}: {value}")
-        else:
-            print(result)
-
-        return status, result
+        return self._call('POST', '/api/users/reg/', headers=headers, json=data, verbosity=verbosity)
 
     def change_password(self, old_password: str, new_password: str) -> json:
         '''Метод делает запрос к API сервера на смену пароля и возвращает статус запроса'''
 
-        headers = self.get_authorized_headers()
-
         data = {
             'old_password': old_password,
             'new_password': new_password
         }
 
-        response = requests.post(self.base_url + '/api/users/change-passwd/', headers = headers, json=data)
+        response = self._request('POST', '/api/users/change-passwd/', auth=True, json=data)
+        self._observe(response)
 
         status = response.status_code
 
         return status
 
-    def open_user_profile(self) -> json:
+    def open_user_profile(self, *, verbosity=None) -> json:
         '''Метод делает запрос к API сервера на получение данных зарегистрированного пользователя и возвращает
         статус запроса и результат в формате JSON с данными пользователя'''
 
-        headers = self.get_authorized_headers()
-
-        response = requests.get(self.base_url + '/api/users/me/', headers = headers)
+        return self._call('GET', '/api/users/me/', auth=True, verbosity=verbosity)
 
-        status = response.status_code
-        result = ""
-
-        try:
-            result = response.json()
-        except json.decoder.JSONDecodeError:
-            result = response.text
-
-        print(f"\nStatus Code: {status}")
-        print(f"\nResponse:")
-        if isinstance(result, list):
-            for item in result:
-                if isinstance(item, dict):
-                    for key, value in item.items():
-                        print(f"{key}: {value}")
-                    print()
-                else:
-                    print(item)
-        elif isinstance(result, dict):
-            for key, value in result.items():
-                print(f"{key}: {value}")
-        else:
-            print(result)
-
-        return status, result
-
-    def change_user_profile(self, first_name: str, last_name: str, email: str, phone_number: str, username: str, profile: dict) -> json:
+    def change_user_profile(self, first_name: str, last_name: str, email: str, phone_number: str, username: str, profile: dict, *,
+                            idempotency_key: str = None, verbosity=None) -> json:
         '''Метод делает запрос к API сервера на частичное изменение данных зарегистрированного пользователя и
-        возвращает статус запроса и результат в формате JSON с обновлёнными данными пользователя'''
-
-        headers = self.get_authorized_headers()
+        возвращает статус запроса и результат в формате JSON с обновлёнными данными пользователя.
+        idempotency_key - как в create_plate'''
 
         data = {
             'first_name': first_name,
@@ -207,174 +457,45 @@ class Zojnik:
             'profile': profile
         }
 
-        response = requests.patch(self.base_url + '/api/users/me/', headers = headers, json=data)
+        return self._call('PATCH', '/api/users/me/', auth=True, json=data, headers=idempotency_headers(idempotency_key),
+                          verbosity=verbosity)
 
-        status = response.status_code
-        result = ""
-
-        try:
-            result = response.json()
-        except json.decoder.JSONDecodeError:
-            result = response.text
-
-        print(f"\nStatus Code: {status}")
-        print(f"\nResponse:")
-        if isinstance(result, list):
-            for item in result:
-                if isinstance(item, dict):
-                    for key, value in item.items():
-                        print(f"{key}: {value}")
-                    print()
-                else:
-                    print(item)
-        elif isinstance(result, dict):
-            for key, value in result.items():
-                print(f"{key}: {value}")
-        else:
-            print(result)
-
-        return status, result
-
-    def get_food_categories(self) -> json:
+    def get_food_categories(self, *, verbosity=None) -> json:
         '''Метод делает запрос к API сервера на получение категорий продуктов для авторизованного пользователя и возвращает
         статус запроса и результат в формате JSON с данными'''
 
-        headers = self.get_authorized_headers()
-
-        response = requests.get(self.base_url + '/api/food/dicts/foodcategory/', headers = headers)
-
-        status = response.status_code
-        result = ""
-
-        try:
-            result = response.json()
-        except json.decoder.JSONDecodeError:
-            result = response.text
-
-        print(f"\nStatus Code: {status}")
-        print(f"\nResponse:")
-        if isinstance(result, list):
-            for item in result:
-                if isinstance(item, dict):
-                    for key, value in item.items():
-                        print(f"{key}: {value}")
-                    print()
-                else:
-                    print(item)
-        elif isinstance(result, dict):
-            for key, value in result.items():
-                print(f"{key}: {value}")
-        else:
-            print(result)
+        return self._cached_call('/api/food/dicts/foodcategory/', verbosity=verbosity)
 
-        return status, result
-
-    def get_list_of_tags(self) -> json:
+    def get_list_of_tags(self, *, verbosity=None) -> json:
         '''Метод делает запрос к API сервера на получение списка тегов для авторизованного пользователя и возвращает
         статус запроса и результат в формате JSON с данными'''
 
-        headers = self.get_authorized_headers()
-
-        response = requests.get(self.base_url + '/api/food/dicts/tag/', headers = headers)
-
-        status = response.status_code
-        result = ""
-
-        try:
-            result = response.json()
-        except json.decoder.JSONDecodeError:
-            result = response.text
-
-        print(f"\nStatus Code: {status}")
-        print(f"\nResponse:")
-        if isinstance(result, list):
-            for item in result:
-                if isinstance(item, dict):
-                    for key, value in item.items():
-                        print(f"{key}: {value}")
-                    print()
-                else:
-                    print(item)
-        elif isinstance(result, dict):
-            for key, value in result.items():
-                print(f"{key}: {value}")
-        else:
-            print(result)
+        return self._cached_call('/api/food/dicts/tag/', verbosity=verbosity)
 
-        return status, result
-
-    def get_list_of_antitags(self) -> json:
+    def get_list_of_antitags(self, *, verbosity=None) -> json:
         '''Метод делает запрос к API сервера на получение списка антитегов для авторизованного пользователя и возвращает
         статус запроса и результат в формате JSON с данными'''
 
-        headers = self.get_authorized_headers()
+        return self._cached_call('/api/food/dicts/antitag/', verbosity=verbosity)
 
-        response = requests.get(self.base_url + '/api/food/dicts/antitag/', headers = headers)
-
-        status = response.status_code
-        result = ""
-
-        try:
-            result = response.json()
-        except json.decoder.JSONDecodeError:
-            result = response.text
-
-        print(f"\nStatus Code: {status}")
-        print(f"\nResponse:")
-        if isinstance(result, list):
-            for item in result:
-                if isinstance(item, dict):
-                    for key, value in item.items():
-                        print(f"{key}: {value}")
-                    print()
-                else:
-                    print(item)
-        elif isinstance(result, dict):
-            for key, value in result.items():
-                print(f"{key}: {value}")
-        else:
-            print(result)
-
-        return status, result
-
-    def get_list_of_plates(self) -> json:
+    def get_list_of_plates(self, *, verbosity=None) -> json:
         '''Метод делает запрос к API сервера на получение списка созданных тарелок с расчитанными КБЖУ, ценой и рейтингом.
         Возвращает статус запроса и результат в формате JSON'''
 
-        headers = self.get_authorized_headers()
+        return self._call('GET', '/api/plate/', auth=True, verbosity=verbosity)
 
-        response = requests.get(self.base_url + '/api/plate/', headers = headers)
-        status = response.status_code
-        result = ""
+    def iter_plates(self, page_size: int = None, chunk_size: int = STREAM_CHUNK_SIZE, *, model=None):
+        '''Генератор по списку тарелок, как в get_list_of_plates, но без загрузки всего ответа в память.
+        Тарелки отдаются по одной по мере чтения ответа, страницы (page_size) запрашиваются по ссылкам next.
+        model=models.Plate отдаёт компактные модели вместо словарей'''
 
-        try:
-            result = response.json()
-        except json.decoder.JSONDecodeError:
-            result = response.text
-
-        print(f"\nStatus Code: {status}")
-        print(f"\nResponse:")
-        if isinstance(result, list):
-            for item in result:
-                if isinstance(item, dict):
-                    for key, value in item.items():
-                        print(f"{key}: {value}")
-                    print()
-                else:
-                    print(item)
-        elif isinstance(result, dict):
-            for key, value in result.items():
-                print(f"{key}: {value}")
-        else:
-            print(result)
-
-        return status, result
+        return self._iter_items('/api/plate/', page_size, chunk_size, model)
 
-    def create_plate(self, protein: int, garnish: int, vegetable: int) -> json:
+    def create_plate(self, protein: int, garnish: int, vegetable: int, *, idempotency_key: str = None,
+                     verbosity=None) -> json:
         '''Метод делает запрос к API сервера на создание тарелки по id компонентов для зарегистрированного пользователя и
-        возвращает статус запроса и результат в формате JSON'''
-
-        headers = self.get_authorized_headers()
+        возвращает статус запроса и результат в формате JSON. С idempotency_key повтор запроса с тем же ключом
+        не создаст вторую тарелку'''
 
         data = {
             'proteinproduct': protein,
@@ -382,105 +503,53 @@ class Zojnik:
             'vegetableproduct': vegetable,
         }
 
-        response = requests.post(self.base_url + '/api/plate/', headers = headers, json=data)
-
-        status = response.status_code
-        result = ""
-
-        try:
-            result = response.json()
-        except json.decoder.JSONDecodeError:
-            result = response.text
-
-        print(f"\nStatus Code: {status}")
-        print(f"\nResponse:")
-        if isinstance(result, list):
-            for item in result:
-                if isinstance(item, dict):
-                    for key, value in item.items():
-                        print(f"{key}: {value}")
-                    print()
-                else:
-                    print(item)
-        elif isinstance(result, dict):
-            for key, value in result.items():
-                print(f"{key}: {value}")
-        else:
-            print(result)
+        return self._call('POST', '/api/plate/', auth=True, json=data, headers=idempotency_headers(idempotency_key),
+                          verbosity=verbosity)
 
-        return status, result
-
-    def get_plate_details(self, plate_id: int) -> json:
+    def get_plate_details(self, plate_id: int, *, verbosity=None) -> json:
         '''Метод делает запрос к API сервера на получение информации о тарелке по её id. Возвращает статус запроса и
         результат в формате JSON'''
 
-        headers = self.get_authorized_headers()
-
-        response = requests.get(f'{self.base_url}/api/plate/{plate_id}', headers = headers)
-        status = response.status_code
-        result = ""
+        return self._call('GET', f'/api/plate/{plate_id}', auth=True, verbosity=verbosity)
 
-        try:
-            result = response.json()
-        except json.decoder.JSONDecodeError:
-            result = response.text
-
-        print(f"\nStatus Code: {status}")
-        print(f"\nResponse:")
-        if isinstance(result, list):
-            for item in result:
-                if isinstance(item, dict):
-                    for key, value in item.items():
-                        print(f"{key}: {value}")
-                    print()
-                else:
-                    print(item)
-        elif isinstance(result, dict):
-            for key, value in result.items():
-                print(f"{key}: {value}")
-        else:
-            print(result)
+    def get_plates(self, plate_ids, *, concurrency: int = None, verbosity=None) -> Batch:
+        '''Метод параллельно запрашивает информацию о нескольких тарелках по их id через общий пул соединений
+        (не более concurrency запросов одновременно, по умолчанию pool_maxsize). Возвращает batch.Batch:
+        итерация отдаёт (id, статус, результат) по мере готовности ответов, wait() ждёт все, а results и errors
+        содержат успешные ответы и ошибки по каждому id'''
 
-        return status, result
+        return Batch(lambda plate_id: self.get_plate_details(plate_id, verbosity=verbosity), plate_ids,
+                     concurrency or self.pool_maxsize, errors=(requests.RequestException,))
 
-    def get_menu_with_filters(self, tags: str, antitags: str, category: str) -> json:
+    def get_menu_with_filters(self, tags: str, antitags: str, category: str, *, verbosity=None) -> json:
         '''Метод делает запрос к API сервера на получение списка блюд отфильтрованного по тегам, антитегам и категориям.
         Возвращает статус запроса и результат в формате JSON'''
 
-        headers = self.get_authorized_headers()
+        return self._call('GET', f'/api/food?tags={tags}&{antitags}&{category}', auth=True, verbosity=verbosity)
 
-        response = requests.get(f'{self.base_url}/api/food?tags={tags}&{antitags}&{category}', headers = headers)
-        status = response.status_code
-        result = ""
+    def iter_menu_with_filters(self, tags: str, antitags: str, category: str, page_size: int = None,
+                               chunk_size: int = STREAM_CHUNK_SIZE, *, model=None):
+        '''Генератор по меню с фильтрами, как в get_menu_with_filters, но блюда отдаются по одной по мере
+        чтения ответа, а страницы (page_size) запрашиваются по ссылкам next. model=models.Dish отдаёт модели'''
 
-        try:
-            result = response.json()
-        except json.decoder.JSONDecodeError:
-            result = response.text
-
-        print(f"\nStatus Code: {status}")
-        print(f"\nResponse:")
-        if isinstance(result, list):
-            for item in result:
-                if isinstance(item, dict):
-                    for key, value in item.items():
-                        print(f"{key}: {value}")
-                    print()
-                else:
-                    print(item)
-        elif isinstance(result, dict):
-            for key, value in result.items():
-                print(f"{key}: {value}")
-        else:
-            print(result)
+        return self._iter_items(f'/api/food?tags={tags}&{antitags}&{category}', page_size, chunk_size, model)
 
-        return status, result
+    def iter_dishes(self, page_size: int = None, chunk_size: int = STREAM_CHUNK_SIZE, *, tags: str = None,
+                    antitags: str = None, category: str = None, model=None):
+        '''Генератор по каталогу блюд. Без фильтров отдаёт весь каталог; tags, antitags и category передаются
+        серверу как параметры запроса. Блюда отдаются по одному по мере чтения ответа, а страницы (page_size)
+        запрашиваются по ссылкам next. model=models.Dish отдаёт модели'''
 
-    def create_dish(self, name: str, calories: float, protein: float, fat: float, carbohydrates: float, allergen: bool,
-                    other: str, price: float, rating: int, avatar: str, category: str) -> json:
-        '''Метод делает запрос к API сервера на создание нового блюда. Возвращает статус запроса и результат в формате JSON'''
+        filters = {'tags': tags, 'antitags': antitags, 'category': category}
+        query = urlencode({key: value for key, value in filters.items() if value})
+        return self._iter_items('/api/food/' + (f'?{query}' if query else ''), page_size, chunk_size, model)
 
-        headers = self.get_authorized_headers()
+    def create_dish(self, name: str, calories: float, protein: float, fat: float, carbohydrates: float, allergen: bool,
+                    other: str, price: float, rating: int, avatar: str, category: str, *, on_progress=None,
+                    idempotency_key: str = None, verbosity=None) -> json:
+        '''Метод делает запрос к API сервера на создание нового блюда. Возвращает статус запроса и результат в формате JSON.
+        Если avatar - путь (pathlib.Path) или открытый файл, картинка отправляется потоково в multipart/form-data,
+        а on_progress(отправлено_байт, всего_байт) сообщает о ходе отправки. idempotency_key - как в create_plate'''
 
         data = {
             'name': name,
@@ -496,66 +565,19 @@ class Zojnik:
             'category': category
         }
 
-        response = requests.post(self.base_url + '/api/food/', headers = headers, json=data)
-
-        status = response.status_code
-        result = ""
+        return self._send_dish('POST', '/api/food/', data, on_progress, idempotency_key, verbosity)
 
-        try:
-            result = response.json()
-        except json.decoder.JSONDecodeError:
-            result = response.text
-
-        print(f"\nStatus Code: {status}")
-        print(f"\nResponse:")
-        if isinstance(result, list):
-            for item in result:
-                if isinstance(item, dict):
-                    for key, value in item.items():
-                        print(f"{key}: {value}")
-                    print()
-                else:
-                    print(item)
-        elif isinstance(result, dict):
-            for key, value in result.items():
-                print(f"{key}: {value}")
-        else:
-            print(result)
-
-        return status, result
-
-    def get_dish_details(self, dish_id: int) -> json:
+    def get_dish_details(self, dish_id: int, *, verbosity=None) -> json:
         '''Метод делает запрос к API сервера на получение информации о блюде по его id. Возвращает статус запроса и
         результат в формате JSON'''
 
-        headers = self.get_authorized_headers()
+        return self._call('GET', f'/api/food/{dish_id}', auth=True, verbosity=verbosity)
 
-        response = requests.get(f'{self.base_url}/api/food/{dish_id}', headers = headers)
-        status = response.status_code
-        result = ""
+    def get_dishes(self, dish_ids, *, concurrency: int = None, verbosity=None) -> Batch:
+        '''Метод параллельно запрашивает информацию о нескольких блюдах по их id, см. get_plates'''
 
-        try:
-            result = response.json()
-        except json.decoder.JSONDecodeError:
-            result = response.text
-
-        print(f"\nStatus Code: {status}")
-        print(f"\nResponse:")
-        if isinstance(result, list):
-            for item in result:
-                if isinstance(item, dict):
-                    for key, value in item.items():
-                        print(f"{key}: {value}")
-                    print()
-                else:
-                    print(item)
-        elif isinstance(result, dict):
-            for key, value in result.items():
-                print(f"{key}: {value}")
-        else:
-            print(result)
-
-        return status, result
+        return Batch(lambda dish_id: self.get_dish_details(dish_id, verbosity=verbosity), dish_ids,
+                     concurrency or self.pool_maxsize, errors=(requests.RequestException,))
 
     def change_dish(
             self,
@@ -570,12 +592,13 @@ class Zojnik:
             price: float,
             rating: int,
             avatar: str,
-            category: str) -> json:
+            category: str,
+            *,
+            on_progress=None,
+            idempotency_key: str = None,
+            verbosity=None) -> json:
         '''Метод делает запрос к API сервера на изменение информации о блюде по его id. Возвращает статус запроса и
-        результат в формате JSON'''
-
-        headers = self.get_authorized_headers()
-
+        результат в формате JSON. avatar, on_progress и idempotency_key - как в create_dish'''
 
         data = {
             'name': name,
@@ -591,32 +614,16 @@ class Zojnik:
             'category': category
         }
 
-        response = requests.patch(f'{self.base_url}/api/food/{dish_id}', headers = headers, json=data)
-        status = response.status_code
-        result = ""
+        return self._send_dish('PATCH', f'/api/food/{dish_id}', data, on_progress, idempotency_key, verbosity)
 
-        try:
-            result = response.json()
-        except json.decoder.JSONDecodeError:
-            result = response.text
-
-        print(f"\nStatus Code: {status}")
-        print(f"\nResponse:")
-        if isinstance(result, list):
-            for item in result:
-                if isinstance(item, dict):
-                    for key, value in item.items():
-                        print(f"{key}: {value}")
-                    print()
-                else:
-                    print(item)
-        elif isinstance(result, dict):
-            for key, value in result.items():
-                print(f"{key}: {value}")
-        else:
-            print(result)
-
-        return status, result
+    def _send_dish(self, method: str, path: str, data: dict, on_progress, idempotency_key: str, verbosity):
+        """Блюдо отправляется в JSON, а если avatar - файл, то в multipart/form-data с чтением файла по частям"""
+        headers = idempotency_headers(idempotency_key)
+        if not is_upload(data['avatar']):
+            return self._call(method, path, auth=True, json=data, headers=headers, verbosity=verbosity)
+        with AvatarUpload(data, on_progress) as upload:
+            return self._call(method, path, auth=True, body_factory=upload.encoder, headers=headers,
+                              verbosity=verbosity)
 
 
     #Рейтинги и комментарии пока не работают
@@ -626,7 +633,7 @@ class Zojnik:
     #
     #     headers = self.get_authorized_headers()
     #
-    #     response = requests.get(self.base_url + '/api/food/{dish_id}/comments/', headers = headers)
+    #     response = self._request('GET', '/api/food/{dish_id}/comments/', headers = headers)
     #     status = response.status_code
     #     result = ""
     #
@@ -665,7 +672,7 @@ class Zojnik:
     #         'user_id': user_id
     #     }
     #
-    #     response = requests.post(self.base_url + '/api/food/{dish_id}/comments/', headers = headers, json=data)
+    #     response = self._request('POST', '/api/food/{dish_id}/comments/', headers = headers, json=data)
     #     status = response.status_code
     #     result = ""
     #
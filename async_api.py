@@ -0,0 +1,430 @@
+import asyncio
+import importlib.util
+import json
+import os
+from urllib.parse import urlencode
+
+import httpx
+
+from api import DEFAULT_BASE_URL, STREAM_CHUNK_SIZE, idempotency_headers
+from batch import AsyncBatch
+from coalescing import AsyncSingleFlight
+from credentials import CredentialStore, default_env_path
+from json_codec import JSONCodec, get_codec
+from renderers import get_renderer
+from streaming import aiter_json_items
+from tokens import AsyncTokenManager
+from uploads import AvatarUpload, is_upload
+
+DEFAULT_TIMEOUT = httpx.Timeout(30, connect=3.05)
+
+
+async def _iter_body(encoder, chunk_size: int = STREAM_CHUNK_SIZE):
+    """Тело multipart из uploads.AvatarUpload для httpx: файл читается по частям во время отправки"""
+    while True:
+        chunk = encoder.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+class AsyncZojnik:
+    '''Асинхронный клиент API Zojnik. Повторяет методы Zojnik, но каждый из них является корутиной и возвращает
+    те же значения: статус запроса и результат в формате JSON'''
+
+    def __init__(self, base_url: str = None, max_connections: int = 100,
+                 max_keepalive_connections: int = 20, keepalive_expiry: float = 5.0, concurrency: int = 10,
+                 timeout=DEFAULT_TIMEOUT, token_leeway: float = 30.0, verbosity='silent',
+                 codec: JSONCodec = 'auto', coalescing: AsyncSingleFlight = None, http2: bool = True):
+        """Клиент с одним пулом соединений на event loop.
+
+        max_connections - максимум одновременно открытых соединений,
+        max_keepalive_connections - сколько простаивающих соединений держать открытыми,
+        keepalive_expiry - сколько секунд хранить простаивающее соединение,
+        concurrency - ограничение одновременных запросов по умолчанию для gather,
+        token_leeway - за сколько секунд до истечения access токена его обновлять,
+        verbosity - вывод ответов, как у Zojnik. По умолчанию асинхронный клиент ничего не печатает,
+        codec - JSON-кодек, как у Zojnik,
+        coalescing - coalescing.AsyncSingleFlight: одинаковые одновременные GET выполняются одним запросом,
+        http2 - мультиплексировать запросы через одно HTTP/2 соединение, если сервер его поддерживает. Работает,
+        только если установлен пакет h2, иначе запросы идут по пулу HTTP/1.1 соединений"""
+        dotenv_path = default_env_path()
+        self.dotenv_path = dotenv_path  # Сохранение пути к .env файлу
+        # Хранилище общее для всех клиентов процесса: .env читается с диска один раз
+        self.credentials = CredentialStore.for_path(dotenv_path) if dotenv_path else None
+        if self.credentials is not None:
+            self.credentials.export_to_environ()
+        # Адрес API можно переопределить переменной окружения, например, чтобы работать с fake_server
+        self.base_url = (base_url or os.getenv('ZOJNIK_BASE_URL') or DEFAULT_BASE_URL).rstrip('/')
+
+        self.concurrency = concurrency
+        self.renderer = get_renderer(verbosity)
+        self.codec = get_codec(codec)
+        self.coalescing = coalescing
+        limits = httpx.Limits(max_connections=max_connections,
+                              max_keepalive_connections=max_keepalive_connections,
+                              keepalive_expiry=keepalive_expiry)
+        self.http2 = http2 and importlib.util.find_spec('h2') is not None
+        self._client = httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=timeout, http2=self.http2)
+
+        self.tokens = AsyncTokenManager(self.get_access_token_by_refresh_token, os.getenv('valid_access_token'),
+                                        os.getenv('valid_refresh_token'), leeway=token_leeway)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        """Закрывает все соединения пула"""
+        await self._client.aclose()
+
+    @property
+    def closed(self) -> bool:
+        return self._client.is_closed
+
+    async def _request(self, method: str, path: str, auth: bool = False, **kwargs) -> httpx.Response:
+        """Отправляет запрос к API через общий пул соединений.
+
+        При auth=True добавляет заголовок авторизации, а если сервер ответил 401, один раз обновляет токен
+        и повторяет запрос. body_factory - как у Zojnik: функция, которая строит тело заново для каждой отправки
+        (multipart с файлом из uploads.AvatarUpload). При stream=True тело ответа не читается, ответ нужно закрыть
+        (response.aclose)"""
+        body_factory = kwargs.pop('body_factory', None)
+        if 'json' in kwargs:
+            kwargs['content'] = self.codec.dumps(kwargs.pop('json'))
+            kwargs['headers'] = {'Content-Type': 'application/json', **(kwargs.get('headers') or {})}
+        extra_headers = kwargs.pop('headers', None) or {}
+        if not auth:
+            return await self._send(method, path, extra_headers, body_factory, kwargs)
+
+        await self.tokens.get_access_token()
+        headers = {**self.get_authorized_headers(), **extra_headers}
+        response = await self._send(method, path, headers, body_factory, kwargs)
+        used_token = headers['Authorization'][len('Bearer '):]
+        if response.status_code == 401 and await self.tokens.refresh(stale_token=used_token):
+            await response.aclose()
+            headers = {**self.get_authorized_headers(), **extra_headers}
+            response = await self._send(method, path, headers, body_factory, kwargs)
+        return response
+
+    async def _send(self, method: str, path: str, headers: dict, body_factory, kwargs: dict) -> httpx.Response:
+        if body_factory is not None:
+            # Длина известна заранее, поэтому тело уходит с Content-Length, а не chunked
+            encoder = body_factory()
+            headers = {**headers, 'Content-Type': encoder.content_type, 'Content-Length': str(encoder.len)}
+            kwargs = {**kwargs, 'content': _iter_body(encoder)}
+        # kwargs не меняется: при повторе после 401 запрос должен уйти с теми же параметрами, в том числе stream
+        request_kwargs = {key: value for key, value in kwargs.items() if key != 'stream'}
+        request = self._client.build_request(method, path, headers=headers, **request_kwargs)
+        return await self._client.send(request, stream=kwargs.get('stream', False))
+
+    async def _iter_items(self, path: str, page_size: int = None, chunk_size: int = STREAM_CHUNK_SIZE, model=None):
+        """Асинхронный аналог Zojnik._iter_items: элементы списка отдаются по мере чтения ответа, страницы
+        запрашиваются по ссылкам next. При ошибке HTTP бросает httpx.HTTPStatusError"""
+        params = {'page_size': page_size} if page_size else None
+        while path:
+            envelope = {}
+            response = await self._request('GET', path, auth=True, params=params, stream=True)
+            try:
+                response.raise_for_status()
+                async for item in aiter_json_items(response.aiter_bytes(chunk_size), envelope, self.codec.loads):
+                    yield item if model is None else model.from_dict(item)
+            finally:
+                await response.aclose()
+            # next уже содержит все параметры запроса
+            path, params = envelope.get('next'), None
+
+    def _parse(self, response: httpx.Response):
+        try:
+            return self.codec.loads(response.content)
+        except self.codec.errors:
+            return response.text
+
+    async def _call(self, method: str, path: str, verbosity=None, **kwargs):
+        """Общий путь всех методов API: запрос, разбор ответа и вывод выбранным рендерером"""
+        if method == 'GET' and self.coalescing is not None:
+            status, result = await self.coalescing.do(self._coalescing_key(method, path, kwargs),
+                                                      lambda: self._fetch(method, path, **kwargs))
+        else:
+            status, result = await self._fetch(method, path, **kwargs)
+
+        renderer = self.renderer if verbosity is None else get_renderer(verbosity)
+        if renderer.enabled:
+            renderer.render(status, result, method, path)
+        return status, result
+
+    async def _fetch(self, method: str, path: str, **kwargs):
+        response = await self._request(method, path, **kwargs)
+        return response.status_code, self._parse(response)
+
+    def _coalescing_key(self, method: str, path: str, kwargs: dict) -> tuple:
+        """Запросы объединяются, только если совпадают метод, URL с параметрами и пользователь (access токен)"""
+        params = kwargs.get('params')
+        identity = self.tokens.access_token if kwargs.get('auth') else None
+        return method, path, tuple(sorted(params.items())) if params else None, identity
+
+    async def gather(self, *aws, limit: int = None, return_exceptions: bool = False) -> list:
+        """Выполняет корутины конкурентно, но не более limit одновременно (по умолчанию self.concurrency).
+        Результаты возвращаются в порядке передачи, как у asyncio.gather"""
+        semaphore = asyncio.Semaphore(limit or self.concurrency)
+
+        async def run(aw):
+            async with semaphore:
+                return await aw
+
+        return await asyncio.gather(*(run(aw) for aw in aws), return_exceptions=return_exceptions)
+
+    async def gather_dish_details(self, dish_ids, limit: int = None) -> list:
+        """Запрашивает информацию о нескольких блюдах. Возвращает список пар (статус, результат)"""
+        return await self.gather(*(self.get_dish_details(dish_id) for dish_id in dish_ids), limit=limit)
+
+    async def gather_plate_details(self, plate_ids, limit: int = None) -> list:
+        """Запрашивает информацию о нескольких тарелках. Возвращает список пар (статус, результат)"""
+        return await self.gather(*(self.get_plate_details(plate_id) for plate_id in plate_ids), limit=limit)
+
+    def get_dishes(self, dish_ids, *, concurrency: int = None, verbosity=None) -> AsyncBatch:
+        """Асинхронный аналог Zojnik.get_dishes: async for по результату отдаёт (id, статус, результат)
+        по мере готовности ответов"""
+        return AsyncBatch(lambda dish_id: self.get_dish_details(dish_id, verbosity=verbosity), dish_ids,
+                          concurrency or self.concurrency, errors=(httpx.HTTPError,))
+
+    def get_plates(self, plate_ids, *, concurrency: int = None, verbosity=None) -> AsyncBatch:
+        """Асинхронный аналог Zojnik.get_plates"""
+        return AsyncBatch(lambda plate_id: self.get_plate_details(plate_id, verbosity=verbosity), plate_ids,
+                          concurrency or self.concurrency, errors=(httpx.HTTPError,))
+
+    async def get_access_and_refresh_token_pair(self, username: str, password: str, *, verbosity=None) -> json:
+        '''Асинхронный аналог Zojnik.get_access_and_refresh_token_pair'''
+
+        data = {
+            'username': username,
+            'password': password
+        }
+
+        status, result = await self._call('POST', '/api/auth/jwt/create/', json=data, verbosity=verbosity)
+        if 200 <= status < 300 and isinstance(result, dict) and 'access' in result:
+            self.tokens.set_tokens(result['access'], result.get('refresh'))
+        return status, result
+
+    def update_env_file(self, key: str, value: str):
+        """Обновляет переменную в .env файле"""
+        self.update_env_values({key: value})
+
+    def update_env_values(self, values: dict):
+        """Обновляет несколько переменных в .env файле одной атомарной записью"""
+        if self.credentials is None:
+            raise FileNotFoundError("Не удалось найти .env файл")
+        self.credentials.update(values)
+
+    def get_authorized_headers(self):
+        """Возвращает заголовки с текущим токеном авторизации. Обновление токена выполняет _request"""
+        access_token = self.tokens.access_token
+        if not access_token:
+            raise ValueError("Не удалось найти 'valid_access_token' в .env файле")
+        return {
+            'Authorization': f'Bearer {access_token}',
+            'Content-Type': 'application/json'
+        }
+
+    async def get_access_token_by_refresh_token(self, refresh_token: str, *, verbosity='silent') -> json:
+        '''Асинхронный аналог Zojnik.get_access_token_by_refresh_token'''
+
+        data = {
+            'refresh': refresh_token
+        }
+
+        return await self._call('POST', '/api/auth/jwt/refresh/', json=data, verbosity=verbosity)
+
+    async def verify_token(self, token: str) -> json:
+        '''Асинхронный аналог Zojnik.verify_token. Возвращает только статус запроса'''
+
+        data = {
+            'token': token
+        }
+
+        response = await self._request('POST', '/api/auth/jwt/verify/', json=data)
+        return response.status_code
+
+    async def new_user_registration(self, first_name: str, last_name: str, username: str, phone_number: str,
+                                    email: str, password: str, *, verbosity=None) -> json:
+        '''Асинхронный аналог Zojnik.new_user_registration'''
+
+        data = {
+            'first_name': first_name,
+            'last_name': last_name,
+            'username': username,
+            'phone_number': phone_number,
+            'email': email,
+            'password': password
+        }
+
+        return await self._call('POST', '/api/users/reg/', json=data, verbosity=verbosity)
+
+    async def change_password(self, old_password: str, new_password: str) -> json:
+        '''Асинхронный аналог Zojnik.change_password. Возвращает только статус запроса'''
+
+        data = {
+            'old_password': old_password,
+            'new_password': new_password
+        }
+
+        response = await self._request('POST', '/api/users/change-passwd/', auth=True, json=data)
+        return response.status_code
+
+    async def open_user_profile(self, *, verbosity=None) -> json:
+        '''Асинхронный аналог Zojnik.open_user_profile'''
+
+        return await self._call('GET', '/api/users/me/', auth=True, verbosity=verbosity)
+
+    async def change_user_profile(self, first_name: str, last_name: str, email: str, phone_number: str,
+                                  username: str, profile: dict, *, idempotency_key: str = None,
+                                  verbosity=None) -> json:
+        '''Асинхронный аналог Zojnik.change_user_profile'''
+
+        data = {
+            'first_name': first_name,
+            'last_name': last_name,
+            'email': email,
+            'phone_number': phone_number,
+            'username': username,
+            'profile': profile
+        }
+
+        return await self._call('PATCH', '/api/users/me/', auth=True, json=data,
+                                headers=idempotency_headers(idempotency_key), verbosity=verbosity)
+
+    async def get_food_categories(self, *, verbosity=None) -> json:
+        '''Асинхронный аналог Zojnik.get_food_categories'''
+
+        return await self._call('GET', '/api/food/dicts/foodcategory/', auth=True, verbosity=verbosity)
+
+    async def get_list_of_tags(self, *, verbosity=None) -> json:
+        '''Асинхронный аналог Zojnik.get_list_of_tags'''
+
+        return await self._call('GET', '/api/food/dicts/tag/', auth=True, verbosity=verbosity)
+
+    async def get_list_of_antitags(self, *, verbosity=None) -> json:
+        '''Асинхронный аналог Zojnik.get_list_of_antitags'''
+
+        return await self._call('GET', '/api/food/dicts/antitag/', auth=True, verbosity=verbosity)
+
+    async def get_list_of_plates(self, *, verbosity=None) -> json:
+        '''Асинхронный аналог Zojnik.get_list_of_plates'''
+
+        return await self._call('GET', '/api/plate/', auth=True, verbosity=verbosity)
+
+    async def create_plate(self, protein: int, garnish: int, vegetable: int, *, idempotency_key: str = None,
+                           verbosity=None) -> json:
+        '''Асинхронный аналог Zojnik.create_plate'''
+
+        data = {
+            'proteinproduct': protein,
+            'garnishproduct': garnish,
+            'vegetableproduct': vegetable,
+        }
+
+        return await self._call('POST', '/api/plate/', auth=True, json=data,
+                                headers=idempotency_headers(idempotency_key), verbosity=verbosity)
+
+    def iter_plates(self, page_size: int = None, chunk_size: int = STREAM_CHUNK_SIZE, *, model=None):
+        '''Асинхронный аналог Zojnik.iter_plates: тарелки перебираются через async for'''
+
+        return self._iter_items('/api/plate/', page_size, chunk_size, model)
+
+    async def get_plate_details(self, plate_id: int, *, verbosity=None) -> json:
+        '''Асинхронный аналог Zojnik.get_plate_details'''
+
+        return await self._call('GET', f'/api/plate/{plate_id}', auth=True, verbosity=verbosity)
+
+    async def get_menu_with_filters(self, tags: str, antitags: str, category: str, *, verbosity=None) -> json:
+        '''Асинхронный аналог Zojnik.get_menu_with_filters'''
+
+        return await self._call('GET', f'/api/food?tags={tags}&{antitags}&{category}', auth=True, verbosity=verbosity)
+
+    def iter_menu_with_filters(self, tags: str, antitags: str, category: str, page_size: int = None,
+                               chunk_size: int = STREAM_CHUNK_SIZE, *, model=None):
+        '''Асинхронный аналог Zojnik.iter_menu_with_filters: блюда перебираются через async for'''
+
+        return self._iter_items(f'/api/food?tags={tags}&{antitags}&{category}', page_size, chunk_size, model)
+
+    def iter_dishes(self, page_size: int = None, chunk_size: int = STREAM_CHUNK_SIZE, *, tags: str = None,
+                    antitags: str = None, category: str = None, model=None):
+        '''Асинхронный аналог Zojnik.iter_dishes: блюда перебираются через async for'''
+
+        filters = {'tags': tags, 'antitags': antitags, 'category': category}
+        query = urlencode({key: value for key, value in filters.items() if value})
+        return self._iter_items('/api/food/' + (f'?{query}' if query else ''), page_size, chunk_size, model)
+
+    async def create_dish(self, name: str, calories: float, protein: float, fat: float, carbohydrates: float,
+                          allergen: bool, other: str, price: float, rating: int, avatar: str, category: str, *,
+                          on_progress=None, idempotency_key: str = None, verbosity=None) -> json:
+        '''Асинхронный аналог Zojnik.create_dish: avatar-файл (pathlib.Path или открытый двоичный файл)
+        отправляется в multipart/form-data по частям'''
+
+        data = {
+            'name': name,
+            'calories': calories,
+            'protein': protein,
+            'fat': fat,
+            'carbohydrates': carbohydrates,
+            'allergen': allergen,
+            'other': other,
+            'price': price,
+            'rating': rating,
+            'avatar': avatar,
+            'category': category
+        }
+
+        return await self._send_dish('POST', '/api/food/', data, on_progress, idempotency_key, verbosity)
+
+    async def get_dish_details(self, dish_id: int, *, verbosity=None) -> json:
+        '''Асинхронный аналог Zojnik.get_dish_details'''
+
+        return await self._call('GET', f'/api/food/{dish_id}', auth=True, verbosity=verbosity)
+
+    async def change_dish(
+            self,
+            dish_id: int,
+            name: str,
+            calories: float,
+            protein: float,
+            fat: float,
+            carbohydrates: float,
+            allergen: bool,
+            other: str,
+            price: float,
+            rating: int,
+            avatar: str,
+            category: str,
+            *,
+            on_progress=None,
+            idempotency_key: str = None,
+            verbosity=None) -> json:
+        '''Асинхронный аналог Zojnik.change_dish, avatar - как в create_dish'''
+
+        data = {
+            'name': name,
+            'calories': calories,
+            'protein': protein,
+            'fat': fat,
+            'carbohydrates': carbohydrates,
+            'allergen': allergen,
+            'other': other,
+            'price': price,
+            'rating': rating,
+            'avatar': avatar,
+            'category': category
+        }
+
+        return await self._send_dish('PATCH', f'/api/food/{dish_id}', data, on_progress, idempotency_key, verbosity)
+
+    async def _send_dish(self, method: str, path: str, data: dict, on_progress, idempotency_key: str, verbosity):
+        """Как Zojnik._send_dish: блюдо в JSON, а если avatar - файл, то в multipart/form-data"""
+        headers = idempotency_headers(idempotency_key)
+        if not is_upload(data['avatar']):
+            return await self._call(method, path, auth=True, json=data, headers=headers, verbosity=verbosity)
+        with AvatarUpload(data, on_progress) as upload:
+            return await self._call(method, path, auth=True, body_factory=upload.encoder, headers=headers,
+                                    verbosity=verbosity)
@@ -0,0 +1,102 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+class _BatchState:
+    """Общая часть Batch и AsyncBatch: id без повторов и раскладка ответов по results и errors"""
+
+    def _init_state(self, ids):
+        self.ids = list(dict.fromkeys(ids))
+        self.results = {}
+        self.errors = {}
+
+    def _store(self, item_id, status, result):
+        if status is not None and 200 <= status < 300:
+            self.results[item_id] = result
+        else:
+            self.errors[item_id] = (status, result)
+
+
+class Batch(_BatchState):
+    '''Параллельная загрузка записей по списку id через общий пул соединений клиента.
+
+    Повторяющиеся id запрашиваются один раз. При итерации по Batch тройки (id, статус, результат) отдаются
+    в порядке завершения запросов. Успешные результаты собираются в results[id], остальные - в errors[id]
+    как (статус, результат), а сетевые ошибки (исключения из errors) - как (None, исключение). wait() дожидается
+    всех запросов, close() отменяет ещё не отправленные'''
+
+    def __init__(self, fetch, ids, concurrency: int, errors: tuple = ()):
+        self._init_state(ids)
+        self._errors = errors
+        self._iterator = self._run(fetch, max(concurrency, 1))
+
+    def __iter__(self):
+        return self._iterator
+
+    def wait(self) -> 'Batch':
+        for _ in self:
+            pass
+        return self
+
+    def close(self):
+        self._iterator.close()
+
+    def _run(self, fetch, concurrency: int):
+        if not self.ids:
+            return
+        executor = ThreadPoolExecutor(min(concurrency, len(self.ids)), thread_name_prefix='zojnik-batch')
+        try:
+            futures = {executor.submit(fetch, item_id): item_id for item_id in self.ids}
+            for future in as_completed(futures):
+                item_id = futures[future]
+                try:
+                    status, result = future.result()
+                except self._errors as error:
+                    status, result = None, error
+                self._store(item_id, status, result)
+                yield item_id, status, result
+        finally:
+            # Если итерацию прервали, ещё не начатые запросы не отправляются, а уже отправленные завершатся
+            # в фоне. Ждать их нельзя: генератор может закрыться сборщиком мусора в одном из потоков пула
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class AsyncBatch(_BatchState):
+    '''То же, что Batch, для AsyncZojnik: async for отдаёт (id, статус, результат) по мере завершения,
+    не более concurrency запросов одновременно'''
+
+    def __init__(self, fetch, ids, concurrency: int, errors: tuple = ()):
+        self._init_state(ids)
+        self._errors = errors
+        self._fetch = fetch
+        self._concurrency = max(concurrency, 1)
+
+    def __aiter__(self):
+        return self._run()
+
+    async def wait(self) -> 'AsyncBatch':
+        async for _ in self:
+            pass
+        return self
+
+    async def _run(self):
+        # asyncio импортируется здесь: синхронный клиент тянет batch при каждом запуске, а asyncio ему не нужен
+        import asyncio
+
+        semaphore = asyncio.Semaphore(self._concurrency)
+
+        async def fetch(item_id):
+            async with semaphore:
+                try:
+                    return (item_id, *await self._fetch(item_id))
+                except self._errors as error:
+                    return item_id, None, error
+
+        tasks = [asyncio.ensure_future(fetch(item_id)) for item_id in self.ids]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item_id, status, result = await next_done
+                self._store(item_id, status, result)
+                yield item_id, status, result
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,243 @@
+"""Накладные расходы самого клиента Zojnik на вызов каждого метода API: заголовки и токены, кодирование тела,
+разбор JSON и вывод ответа, без учёта работы сервера.
+
+fake_server запускается в отдельном процессе, поэтому time.process_time() в этом процессе считает только
+клиента (включая его рабочие потоки). Для каждого метода замеряются процессорное и общее время вызова,
+пропускная способность и пик памяти, выделенной за вызов (tracemalloc). Список тарелок и iter_plates
+замеряются на нескольких размерах ответа, список - также с выводом verbosity='full' в /dev/null.
+
+Результаты печатаются и сохраняются в bench_output.txt. Если задан baseline (по умолчанию
+benchmarks/baselines/bench_client.json), скрипт завершается с кодом 1, когда процессорное время или память
+вызова выросли больше чем на --threshold. Новый baseline записывается с --save-baseline; сравнивать имеет смысл
+только замеры с той же машины.
+
+Запуск из корня репозитория: python benchmarks/bench_client.py --sizes 10,1000,100000"""
+import argparse
+import gc
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from api import Zojnik  # noqa: E402
+from fake_server import FakeZojnikServer  # noqa: E402
+from renderers import FullRenderer  # noqa: E402
+from zojnik import api_methods  # noqa: E402
+
+SIZES = (10, 1000, 100000)
+BASELINE = os.path.join(ROOT, 'benchmarks', 'baselines', 'bench_client.json')
+OUTPUT = os.path.join(ROOT, 'bench_output.txt')
+EMAIL, PASSWORD = 'bench@example.com', 'Benchpass1'
+DISH = dict(calories=100, protein=5, fat=2, carbohydrates=10, allergen=False, other='', price=150, rating=5,
+            avatar='', category='GARNISH_PRODUCTS')
+# Различия меньше этих величин считаются шумом даже при превышении порога
+CPU_FLOOR_MS, MEMORY_FLOOR_KIB = 0.05, 16.0
+
+_numbers = itertools.count(1)
+
+# Вызов каждого метода API: (клиент, данные сервера) -> результат. Генераторы и пакеты дочитываются до конца
+CALLS = {
+    'get_access_and_refresh_token_pair': lambda zf, server: zf.get_access_and_refresh_token_pair(EMAIL, PASSWORD),
+    'get_access_token_by_refresh_token': lambda zf, server: zf.get_access_token_by_refresh_token(
+        server['tokens']['refresh']),
+    'verify_token': lambda zf, server: zf.verify_token(server['tokens']['access']),
+    'new_user_registration': lambda zf, server: zf.new_user_registration(
+        'Анна', 'Петрова', f'bench{next(_numbers)}', '+79990000000', f'bench{next(_numbers)}@example.com', PASSWORD),
+    'change_password': lambda zf, server: zf.change_password(PASSWORD, PASSWORD),
+    'open_user_profile': lambda zf, server: zf.open_user_profile(),
+    'change_user_profile': lambda zf, server: zf.change_user_profile('Анна', 'Петрова', EMAIL, '+79990000000',
+                                                                     'bench', {'height': 170}),
+    'get_food_categories': lambda zf, server: zf.get_food_categories(),
+    'get_list_of_tags': lambda zf, server: zf.get_list_of_tags(),
+    'get_list_of_antitags': lambda zf, server: zf.get_list_of_antitags(),
+    'get_list_of_plates': lambda zf, server: zf.get_list_of_plates(),
+    'iter_plates': lambda zf, server: sum(1 for _ in zf.iter_plates()),
+    'get_plate_details': lambda zf, server: zf.get_plate_details(1),
+    'get_plates': lambda zf, server: zf.get_plates(range(1, 11)).wait(),
+    'create_plate': lambda zf, server: zf.create_plate(1, 2, 3),
+    'get_menu_with_filters': lambda zf, server: zf.get_menu_with_filters('', '', ''),
+    'iter_menu_with_filters': lambda zf, server: sum(1 for _ in zf.iter_menu_with_filters('', '', '')),
+    'iter_dishes': lambda zf, server: sum(1 for _ in zf.iter_dishes()),
+    'get_dish_details': lambda zf, server: zf.get_dish_details(1),
+    'get_dishes': lambda zf, server: zf.get_dishes(range(1, 11)).wait(),
+    'create_dish': lambda zf, server: zf.create_dish('Суп', **DISH),
+    'change_dish': lambda zf, server: zf.change_dish(1, 'Суп', **DISH),
+}
+# Методы, ответ которых растёт с числом тарелок на сервере
+SIZED = ('get_list_of_plates', 'iter_plates')
+# Записи выполняются последними: созданные тарелки не должны попасть в замеры списков
+WRITES = ('create_plate', 'create_dish', 'change_dish')
+
+
+def _serve(connection, plates: int):
+    """Тело процесса fake_server: отдаёт адрес и токены и работает до команды остановки"""
+    server = FakeZojnikServer(dishes=300, plates=plates)
+    user = server.add_user(EMAIL, PASSWORD, username='bench')
+    server.start()
+    connection.send({'base_url': server.base_url, 'plates': plates, 'tokens': server.issue_tokens(user['id'])})
+    connection.recv()
+    server.stop()
+
+
+@contextmanager
+def serve(plates: int):
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve, args=(child, plates), daemon=True)
+    process.start()
+    try:
+        yield parent.recv()
+    finally:
+        parent.send('stop')
+        process.join(10)
+
+
+def _time(call, min_time: float, min_calls: int) -> tuple:
+    """(процессорное время на вызов, общее время на вызов, число вызовов)"""
+    call()  # прогрев: соединение, токены, кэш renderer'а
+    calls = 0
+    cpu_started, started = time.process_time(), time.perf_counter()
+    while calls < min_calls or time.perf_counter() - started < min_time:
+        call()
+        calls += 1
+    return (time.process_time() - cpu_started) / calls, (time.perf_counter() - started) / calls, calls
+
+
+def _peak_memory(call, calls: int) -> int:
+    """Наибольший прирост памяти за один вызов в байтах. Отдельный прогон: tracemalloc замедляет выделение"""
+    gc.collect()
+    tracemalloc.start()
+    peak = 0
+    try:
+        for _ in range(calls):
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            call()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def measure(call, items: int = None, min_time: float = 0.5, min_calls: int = 3, memory_calls: int = 2) -> dict:
+    cpu, wall, calls = _time(call, min_time, min_calls)
+    result = {'calls': calls, 'cpu_ms': round(cpu * 1000, 4), 'wall_ms': round(wall * 1000, 4),
+              'per_second': round(1 / wall, 1), 'peak_kib': round(_peak_memory(call, memory_calls) / 1024, 1)}
+    if items:
+        result['items_per_second'] = round(items / wall)
+    return result
+
+
+def _client(server: dict, verbosity) -> Zojnik:
+    client = Zojnik(base_url=server['base_url'], verbosity=verbosity)
+    client.tokens.set_tokens(server['tokens']['access'], server['tokens']['refresh'])
+    return client
+
+
+def run(sizes=SIZES, min_time: float = 0.5, min_calls: int = 3, memory_calls: int = 2, progress=None) -> dict:
+    """Имя замера ('метод' или 'метод[тарелок]', с ' full' для вывода verbosity='full') -> метрики"""
+    missing = {method.__name__ for method in api_methods(Zojnik).values()} - set(CALLS)
+    if missing:
+        raise RuntimeError(f"Нет вызова для методов: {', '.join(sorted(missing))}")
+    results = {}
+
+    def record(name: str, client: Zojnik, server: dict, method: str, items: int = None):
+        results[name] = measure(lambda: CALLS[method](client, server), items, min_time, min_calls, memory_calls)
+        if progress:
+            progress(name, results[name])
+
+    with open(os.devnull, 'w', encoding='utf-8') as devnull:
+        for number, size in enumerate(sorted(sizes)):
+            with serve(size) as server, _client(server, 'silent') as client, \
+                    _client(server, FullRenderer(stream=devnull)) as printing:
+                for method in SIZED:
+                    record(f'{method}[{size}]', client, server, method, size)
+                # Генераторы ничего не выводят, поэтому вывод verbosity='full' замеряется только у списка
+                record(f'get_list_of_plates[{size}] full', printing, server, 'get_list_of_plates', size)
+                if number:
+                    continue
+                # Остальные методы не зависят от числа тарелок и замеряются на самом маленьком сервере
+                for method in sorted(set(CALLS) - set(SIZED) - set(WRITES)) + list(WRITES):
+                    record(method, client, server, method)
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Регрессии относительно baseline: (замер, метрика, было, стало). Замеры, которых нет в baseline, пропускаются"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric, floor in (('cpu_ms', CPU_FLOOR_MS), ('peak_kib', MEMORY_FLOOR_KIB)):
+            if current[metric] > previous[metric] * (1 + threshold) and current[metric] - previous[metric] > floor:
+                regressions.append((name, metric, previous[metric], current[metric]))
+    return regressions
+
+
+def machine() -> dict:
+    return {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+            'platform': platform.platform(), 'processor': platform.machine(), 'cpus': os.cpu_count()}
+
+
+def format_row(name: str, metrics: dict) -> str:
+    items = metrics.get('items_per_second')
+    return (f"{name:<42}{metrics['cpu_ms']:>11.3f}{metrics['wall_ms']:>11.3f}{metrics['per_second']:>10.1f}"
+            f"{items if items is not None else '':>12}{metrics['peak_kib']:>12.1f}")
+
+
+HEADER = f"{'замер':<42}{'CPU, мс':>11}{'всего, мс':>11}{'вызов/с':>10}{'записей/с':>12}{'пик, КиБ':>12}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк накладных расходов клиента Zojnik на вызов метода')
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)), help='число тарелок на сервере через запятую')
+    parser.add_argument('--min-time', type=float, default=0.5, help='минимальное время замера метода, секунд')
+    parser.add_argument('--min-calls', type=int, default=3)
+    parser.add_argument('--memory-calls', type=int, default=2, help='вызовов для замера памяти')
+    parser.add_argument('--baseline', default=BASELINE, help='файл baseline; пустая строка - без сравнения')
+    parser.add_argument('--threshold', type=float, default=0.25, help='допустимый рост CPU и памяти, доля')
+    parser.add_argument('--save-baseline', action='store_true', help='записать результаты в --baseline')
+    parser.add_argument('--output', default=OUTPUT)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    print(HEADER)
+    results = run(sizes, args.min_time, args.min_calls, args.memory_calls,
+                  progress=lambda name, metrics: print(format_row(name, metrics), flush=True))
+
+    lines = [f"Машина: {json.dumps(machine(), ensure_ascii=False)}", HEADER]
+    lines += [format_row(name, metrics) for name, metrics in results.items()]
+    regressions = []
+    if args.save_baseline and args.baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as baseline_file:
+            json.dump({'machine': machine(), 'results': results}, baseline_file, ensure_ascii=False, indent=2)
+            baseline_file.write('\n')
+        lines.append(f'Baseline записан в {args.baseline}')
+    elif args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get('machine') != machine():
+            lines.append(f"Внимание: baseline снят на другой машине: {json.dumps(baseline.get('machine'))}")
+        regressions = compare(results, baseline['results'], args.threshold)
+        lines.append(f'Сравнение с {args.baseline}, порог {args.threshold:.0%}: '
+                     + (f'регрессий: {len(regressions)}' if regressions else 'регрессий нет'))
+        lines += [f'  {name}: {metric} {before} -> {after} (+{(after / before - 1) if before else float("inf"):.0%})'
+                  for name, metric, before, after in regressions]
+
+    with open(args.output, 'w', encoding='utf-8') as output:
+        output.write('\n'.join(lines) + '\n')
+    print('\n'.join(lines[len(results) + 2:]))
+    raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
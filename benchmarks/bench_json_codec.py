@@ -0,0 +1,78 @@
+"""Сравнение разбора больших ответов: прежний путь response.json() против кодеков json_codec из байтов.
+
+Запуск из корня репозитория: python benchmarks/bench_json_codec.py --items 20000"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_server import FakeZojnikServer  # noqa: E402
+from json_codec import available_codecs, get_codec  # noqa: E402
+
+
+def _plates(count: int) -> list:
+    server = FakeZojnikServer(dishes=300, plates=0)
+    rnd = random.Random(0)
+    return [server._build_plate(number, rnd.randint(1, 300), rnd.randint(1, 300), rnd.randint(1, 300))
+            for number in range(1, count + 1)]
+
+
+def _response(payload) -> requests.Response:
+    """Ответ в том виде, в каком его возвращает requests после чтения тела"""
+    response = requests.Response()
+    response.status_code = 200
+    response.headers['Content-Type'] = 'application/json'
+    response._content = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    response.encoding = 'utf-8'
+    return response
+
+
+def _best(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def run(items: int, repeat: int) -> list:
+    payloads = {'plates': _plates(items),
+                'dishes': list(FakeZojnikServer(dishes=items, plates=0).dishes.values())}
+    rows = []
+    for name, payload in payloads.items():
+        response = _response(payload)
+        baseline = _best(response.json, repeat)
+        encode_baseline = _best(lambda: json.dumps(payload).encode('utf-8'), repeat)
+        rows.append((name, 'response.json()', len(response.content), baseline, 1.0, encode_baseline, 1.0))
+        for codec_name in available_codecs():
+            codec = get_codec(codec_name)
+            assert codec.loads(response.content) == payload
+            decode = _best(lambda: codec.loads(response.content), repeat)
+            encode = _best(lambda: codec.dumps(payload), repeat)
+            rows.append((name, codec_name, len(response.content), decode, baseline / decode, encode,
+                         encode_baseline / encode))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк JSON-кодеков клиента Zojnik')
+    parser.add_argument('--items', type=int, default=20000, help='число тарелок и блюд в ответе')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'ответ':<8}{'разбор':<18}{'байт':>11}{'decode, мс':>12}{'ускорение':>11}{'encode, мс':>12}"
+          f"{'ускорение':>11}")
+    for name, codec, size, decode, speedup, encode, encode_speedup in run(args.items, args.repeat):
+        print(f'{name:<8}{codec:<18}{size:>11}{decode * 1000:>12.2f}{speedup:>10.2f}x{encode * 1000:>12.2f}'
+              f'{encode_speedup:>10.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Память на запись: словари из JSON-ответа против моделей models со __slots__.
+
+Запуск из корня репозитория: python benchmarks/bench_models.py --items 50000"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_server import FakeZojnikServer  # noqa: E402
+from json_codec import get_codec  # noqa: E402
+from models import Dish, Plate, to_models  # noqa: E402
+
+
+def _payloads(count: int) -> dict:
+    server = FakeZojnikServer(dishes=count, plates=0)
+    rnd = random.Random(0)
+    plates = [server._build_plate(number, rnd.randint(1, count), rnd.randint(1, count), rnd.randint(1, count))
+              for number in range(1, count + 1)]
+    return {'dishes': (list(server.dishes.values()), Dish), 'plates': (plates, Plate)}
+
+
+def _measure(build) -> tuple:
+    """Объём памяти, оставшейся занятой результатом build(), и время построения.
+    Время замеряется отдельным прогоном: tracemalloc сильно замедляет выделение памяти"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    gc.collect()
+    started = time.perf_counter()
+    build()
+    return size, time.perf_counter() - started
+
+
+def run(items: int) -> list:
+    codec = get_codec()
+    rows = []
+    for name, (payload, model) in _payloads(items).items():
+        body = codec.dumps(payload)
+        dict_size, dict_time = _measure(lambda: codec.loads(body))
+        model_size, model_time = _measure(lambda: to_models(codec.loads(body), model))
+        as_dict_time = _measure(lambda: [record.as_dict() for record in to_models(codec.loads(body), model)])[1]
+        rows.append((name, items, dict_size / items, model_size / items, dict_time, model_time,
+                     as_dict_time - model_time))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк памяти моделей ответов Zojnik')
+    parser.add_argument('--items', type=int, default=50000)
+    args = parser.parse_args()
+
+    print(f"{'ответ':<8}{'записей':>9}{'dict, Б/зап':>13}{'модель, Б/зап':>15}{'экономия':>10}"
+          f"{'dict, мс':>10}{'модель, мс':>12}{'as_dict, мс':>13}")
+    for name, items, dict_size, model_size, dict_time, model_time, as_dict_time in run(args.items):
+        print(f'{name:<8}{items:>9}{dict_size:>13.0f}{model_size:>15.0f}{1 - model_size / dict_size:>10.0%}'
+              f'{dict_time * 1000:>10.1f}{model_time * 1000:>12.1f}{as_dict_time * 1000:>13.1f}')
+
+
+if __name__ == '__main__':
+    main()
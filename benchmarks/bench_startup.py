@@ -0,0 +1,84 @@
+"""Время холодного запуска CLI: python -m zojnik verify-token <токен> против локального fake_server.
+
+Каждый прогон - новый процесс интерпретатора. Скрипт печатает медиану и худшее время, самые дорогие импорты
+(по python -X importtime) и завершается с кодом 1, если медиана превышает бюджет.
+
+Запуск из корня репозитория: python benchmarks/bench_startup.py --runs 15 --budget 0.5"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_server import FakeZojnikServer  # noqa: E402
+
+
+def _environment(server: FakeZojnikServer) -> dict:
+    # Явный .env избавляет от поиска файла вверх по каталогам, как и рекомендуется для cron
+    return dict(os.environ, ZOJNIK_BASE_URL=server.base_url, ZOJNIK_DOTENV=os.path.join(ROOT, '.env'))
+
+
+def measure(server: FakeZojnikServer, token: str, runs: int) -> list:
+    command = [sys.executable, '-m', 'zojnik', 'verify-token', token]
+    env = _environment(server)
+    subprocess.run(command, cwd=ROOT, env=env, capture_output=True, check=True)  # прогрев кэша .pyc
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, env=env, capture_output=True, check=True)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def top_imports(server: FakeZojnikServer, token: str, limit: int) -> list:
+    """Самые дорогие импорты верхнего уровня: (модуль, секунды с учётом вложенных)"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-m', 'zojnik', 'verify-token', token], cwd=ROOT,
+                            env=_environment(server), capture_output=True, text=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):  # только модули, импортированные напрямую
+            imports.append((name.strip(), int(cumulative) / 1e6))
+    return sorted(imports, key=lambda item: item[1], reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк холодного запуска python -m zojnik')
+    parser.add_argument('--runs', type=int, default=15)
+    parser.add_argument('--budget', type=float, default=0.5, help='допустимая медиана в секундах')
+    parser.add_argument('--top', type=int, default=8, help='сколько самых дорогих импортов показать')
+    args = parser.parse_args()
+
+    with FakeZojnikServer() as server:
+        user = server.add_user('bench@example.com', 'Benchpass1')
+        token = server.issue_tokens(user['id'])['access']
+        timings = measure(server, token, args.runs)
+        interpreter = min(measure_interpreter() for _ in range(3))
+        imports = top_imports(server, token, args.top)
+
+    median = statistics.median(timings)
+    print(f'python -m zojnik verify-token: медиана {median * 1000:.0f} мс, худший {max(timings) * 1000:.0f} мс '
+          f'({args.runs} запусков, бюджет {args.budget * 1000:.0f} мс)')
+    print(f'из них пустой интерпретатор: {interpreter * 1000:.0f} мс')
+    print('Самые дорогие импорты:')
+    for name, seconds in imports:
+        print(f'  {name:<28} {seconds * 1000:7.1f} мс')
+    if median > args.budget:
+        print('Бюджет превышен')
+        raise SystemExit(1)
+
+
+def measure_interpreter() -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'], check=True)
+    return time.perf_counter() - started
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+import argparse
+import csv
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from api import Zojnik
+
+# Поля и типы берутся из сигнатуры create_dish, чтобы импорт не расходился с клиентом
+_CREATE_DISH_PARAMETERS = [parameter for parameter in inspect.signature(Zojnik.create_dish).parameters.values()
+                           if parameter.name != 'self' and parameter.kind == parameter.POSITIONAL_OR_KEYWORD]
+DISH_FIELDS = tuple(parameter.name for parameter in _CREATE_DISH_PARAMETERS)
+FIELD_TYPES = {parameter.name: parameter.annotation for parameter in _CREATE_DISH_PARAMETERS}
+OPTIONAL_FIELDS = {'allergen': False, 'other': None, 'rating': 0, 'avatar': None}
+
+_TRUE = {'1', 'true', 'yes', 'y', 'да', 't'}
+_FALSE = {'0', 'false', 'no', 'n', 'нет', 'f', ''}
+
+
+def read_rows(path: str):
+    """Построчно читает блюда из CSV или JSONL (.jsonl, .ndjson). Отдаёт пары (номер строки, словарь).
+    Вместо словаря для неразобранной строки JSONL отдаётся исключение ValueError: validate_row отметит её
+    ошибкой, а импорт продолжится"""
+    if path.endswith(('.jsonl', '.ndjson')):
+        with open(path, encoding='utf-8') as source:
+            for number, line in enumerate(source, 1):
+                if line.strip():
+                    try:
+                        yield number, json.loads(line)
+                    except json.JSONDecodeError as error:
+                        yield number, ValueError(f'ошибка разбора JSON: {error}')
+    else:
+        with open(path, encoding='utf-8-sig', newline='') as source:
+            for number, row in enumerate(csv.DictReader(source), 1):
+                yield number, row
+
+
+def _convert(field: str, value):
+    expected = FIELD_TYPES[field]
+    # Пустая строка допустима только в необязательных строковых полях
+    if value is None or (isinstance(value, str) and value.strip() == ''
+                         and (expected is not str or field not in OPTIONAL_FIELDS)):
+        if field in OPTIONAL_FIELDS:
+            return OPTIONAL_FIELDS[field]
+        raise ValueError('пустое значение')
+    if expected is bool:
+        if isinstance(value, bool):
+            return value
+        text = str(value).strip().lower()
+        if text in _TRUE:
+            return True
+        if text in _FALSE:
+            return False
+        raise ValueError(f'ожидается да/нет, получено {value!r}')
+    if expected is int:
+        number = float(value)
+        if not number.is_integer():
+            raise ValueError(f'ожидается целое число, получено {value!r}')
+        return int(number)
+    if expected is float:
+        return float(value)
+    if field in OPTIONAL_FIELDS and value == '':
+        return OPTIONAL_FIELDS[field]
+    return str(value)
+
+
+def validate_row(row: dict):
+    """Проверяет строку по полям create_dish. Возвращает (аргументы для create_dish, список ошибок)"""
+    if isinstance(row, ValueError):
+        return {}, [str(row)]
+    if not isinstance(row, dict):
+        return {}, [f'ожидается объект JSON, получено {type(row).__name__}']
+    errors = []
+    # csv.DictReader складывает значения сверх заголовка под ключ None
+    if None in row:
+        errors.append('лишние значения в строке')
+    unknown = sorted({key for key in row if key is not None} - set(DISH_FIELDS))
+    if unknown:
+        errors.append(f"неизвестные поля: {', '.join(map(str, unknown))}")
+    kwargs = {}
+    for field in DISH_FIELDS:
+        if field not in row and field not in OPTIONAL_FIELDS:
+            errors.append(f'{field}: обязательное поле')
+            continue
+        try:
+            kwargs[field] = _convert(field, row.get(field))
+        except (TypeError, ValueError) as error:
+            errors.append(f'{field}: {error}')
+    return kwargs, errors
+
+
+class BulkImporter:
+    '''Массовое создание блюд через Zojnik.create_dish.
+
+    Строки читаются из файла по мере обработки и отправляются пулом из workers потоков; одновременно
+    в работе не больше max_pending строк, поэтому память не растёт с размером файла. Результат каждой строки
+    пишется в output (JSONL) по мере готовности. Номера строк с окончательным результатом (успех, ошибка
+    валидации или 4xx) записываются в checkpoint, и повторный запуск пропускает их. Строки, упавшие
+    с 5xx, сетевой или любой другой ошибкой, в checkpoint не попадают и будут отправлены снова.
+
+    Каждое блюдо создаётся с Idempotency-Key вида '{run_id}:{номер строки}', поэтому повторная отправка строки,
+    которую сервер уже выполнил (ответ потерялся), не создаёт дубль. По умолчанию run_id вычисляется из пути,
+    размера и времени изменения файла и одинаков у всех запусков по неизменённому файлу'''
+
+    def __init__(self, client: Zojnik, workers: int = 8, max_pending: int = None, checkpoint_path: str = None,
+                 run_id: str = None):
+        self.client = client
+        self.workers = workers
+        self.max_pending = max_pending or workers * 4
+        self.checkpoint_path = checkpoint_path
+        self.run_id = run_id
+        self._write_lock = threading.Lock()
+
+    def _load_checkpoint(self) -> set:
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return set()
+        with open(self.checkpoint_path, encoding='utf-8') as checkpoint:
+            return {int(line) for line in checkpoint if line.strip()}
+
+    @staticmethod
+    def default_run_id(source: str) -> str:
+        """run_id по пути, размеру и времени изменения файла: изменённый файл получает новые ключи"""
+        info = os.stat(source)
+        identity = f'{os.path.abspath(source)}:{info.st_size}:{info.st_mtime_ns}'
+        return hashlib.sha256(identity.encode('utf-8')).hexdigest()[:16]
+
+    def run(self, source: str, output: str) -> dict:
+        """Импортирует блюда из source. Возвращает счётчики: created, failed, invalid, skipped"""
+        run_id = self.run_id or self.default_run_id(source)
+        done = self._load_checkpoint()
+        summary = {'created': 0, 'failed': 0, 'invalid': 0, 'skipped': 0}
+        pending = threading.BoundedSemaphore(self.max_pending)
+        checkpoint = open(self.checkpoint_path, 'a', encoding='utf-8') if self.checkpoint_path else None
+        started = time.perf_counter()
+        try:
+            with open(output, 'a', encoding='utf-8') as results, ThreadPoolExecutor(self.workers) as executor:
+                for number, row in read_rows(source):
+                    if number in done:
+                        summary['skipped'] += 1
+                        continue
+                    kwargs, errors = validate_row(row)
+                    if errors:
+                        record = {'row': number, 'ok': False, 'status': None, 'error': errors}
+                        self._record(results, checkpoint, summary, 'invalid', record, final=True)
+                        continue
+                    # Обратное давление: чтение файла ждёт, пока освободится место в очереди
+                    pending.acquire()
+                    try:
+                        future = executor.submit(self._create, number, kwargs, f'{run_id}:{number}')
+                    except BaseException:
+                        pending.release()
+                        raise
+                    future.add_done_callback(
+                        lambda future: self._on_done(future, results, checkpoint, summary, pending))
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+        summary['seconds'] = round(time.perf_counter() - started, 3)
+        return summary
+
+    def _create(self, number: int, kwargs: dict, idempotency_key: str):
+        try:
+            status, result = self.client.create_dish(**kwargs, idempotency_key=idempotency_key, verbosity='silent')
+        except requests.RequestException as error:
+            return {'row': number, 'ok': False, 'status': None, 'error': str(error)}, False
+        except Exception as error:
+            # Например, не открылся файл avatar: строка записывается как неудачная, импорт продолжается
+            return {'row': number, 'ok': False, 'status': None, 'error': f'{type(error).__name__}: {error}'}, False
+        ok = 200 <= status < 300
+        record = {'row': number, 'ok': ok, 'status': status}
+        record['result' if ok else 'error'] = result
+        return record, status < 500
+
+    def _on_done(self, future, results, checkpoint, summary, pending):
+        try:
+            record, final = future.result()
+            self._record(results, checkpoint, summary, 'created' if record['ok'] else 'failed', record, final)
+        finally:
+            # Место в очереди освобождается, даже если записать результат не удалось, иначе чтение файла зависнет
+            pending.release()
+
+    def _record(self, results, checkpoint, summary: dict, outcome: str, record: dict, final: bool):
+        with self._write_lock:
+            summary[outcome] += 1
+            results.write(json.dumps(record, ensure_ascii=False) + '\n')
+            results.flush()
+            if final and checkpoint is not None:
+                checkpoint.write(f"{record['row']}\n")
+                checkpoint.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Массовый импорт блюд из CSV или JSONL')
+    parser.add_argument('source', help='файл с блюдами (.csv, .jsonl)')
+    parser.add_argument('--output', required=True, help='файл JSONL с результатом по каждой строке')
+    parser.add_argument('--checkpoint', help='файл с номерами обработанных строк для продолжения импорта')
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--run-id', help='префикс Idempotency-Key (ASCII); по умолчанию вычисляется из файла')
+    parser.add_argument('--base-url')
+    args = parser.parse_args()
+
+    with Zojnik(base_url=args.base_url, pool_maxsize=args.workers, verbosity='silent') as client:
+        importer = BulkImporter(client, workers=args.workers, checkpoint_path=args.checkpoint, run_id=args.run_id)
+        summary = importer.run(args.source, args.output)
+    print(json.dumps(summary, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheEntry:
+    '''Сохранённый ответ и заголовки для условной перепроверки'''
+
+    __slots__ = ('status', 'result', 'etag', 'last_modified', 'stored_at')
+
+    def __init__(self, status: int, result, etag: str = None, last_modified: str = None, stored_at: float = None):
+        self.status = status
+        self.result = result
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = time.time() if stored_at is None else stored_at
+
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class ResponseCache:
+    '''Двухуровневый кэш GET-ответов для справочников: LRU в памяти и, при указании directory,
+    файлы на диске, общие для нескольких процессов.
+
+    Запись считается свежей ttl секунд. Устаревшая, но не старше stale_ttl, отдаётся сразу, а клиент
+    перепроверяет её в фоне запросом с If-None-Match / If-Modified-Since'''
+
+    def __init__(self, max_entries: int = 128, ttl: float = 300.0, stale_ttl: float = 24 * 3600,
+                 directory: str = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.directory = directory
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._revalidating = set()
+        self._stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'stale_served': 0, 'revalidated': 0, 'stores': 0}
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, key: str):
+        """Возвращает запись из памяти или с диска (без учёта свежести) либо None"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+        if not self.directory:
+            return None
+        try:
+            with open(self._file(key), encoding='utf-8') as cache_file:
+                entry = CacheEntry(**json.load(cache_file))
+        except (FileNotFoundError, ValueError, TypeError):
+            return None
+        self._remember(key, entry)
+        self.record('disk_hits')
+        return entry
+
+    def put(self, key: str, entry: CacheEntry):
+        self._remember(key, entry)
+        self.record('stores')
+        if self.directory:
+            fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+            with os.fdopen(fd, 'w', encoding='utf-8') as temp_file:
+                json.dump(entry.as_dict(), temp_file, ensure_ascii=False)
+            os.replace(temp_path, self._file(key))
+
+    def _remember(self, key: str, entry: CacheEntry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return entry.age() < self.ttl
+
+    def is_usable_stale(self, entry: CacheEntry) -> bool:
+        return entry.age() < self.ttl + self.stale_ttl
+
+    def start_revalidation(self, key: str) -> bool:
+        """Отмечает, что ключ перепроверяется. False, если перепроверка уже идёт"""
+        with self._lock:
+            if key in self._revalidating:
+                return False
+            self._revalidating.add(key)
+            return True
+
+    def finish_revalidation(self, key: str):
+        with self._lock:
+            self._revalidating.discard(key)
+
+    def record(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> dict:
+        """Счётчики попаданий и промахов. hit_ratio - доля запросов, обслуженных без загрузки тела ответа"""
+        with self._lock:
+            stats = dict(self._stats)
+        served = stats['hits'] + stats['stale_served'] + stats['revalidated']
+        total = served + stats['misses']
+        stats['hit_ratio'] = served / total if total else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.directory:
+            for name in os.listdir(self.directory):
+                if name.endswith('.json'):
+                    os.remove(os.path.join(self.directory, name))
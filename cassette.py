@@ -0,0 +1,217 @@
+import base64
+import hashlib
+import io
+import json
+import os
+import threading
+from datetime import timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from requests import Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3 import HTTPResponse
+
+CASSETTE_VERSION = 1
+MATCH_FIELDS = ('method', 'path', 'query', 'body')
+# Поля JSON в запросах и ответах, значения которых не попадают в файл
+REDACTED_FIELDS = ('access', 'refresh', 'token', 'password', 'old_password', 'new_password')
+REDACTED = 'REDACTED'
+# Заголовки ответа, которые не сохраняются: они описывают конкретное соединение, а не ответ API
+_SKIPPED_HEADERS = {'connection', 'keep-alive', 'transfer-encoding', 'content-encoding', 'date', 'server'}
+
+
+class UnmatchedRequestError(LookupError):
+    """Строгий режим воспроизведения: запроса нет в кассете"""
+
+
+def _redact(value, fields: tuple):
+    if isinstance(value, dict):
+        return {key: REDACTED if key in fields and value[key] else _redact(item, fields)
+                for key, item in value.items()}
+    if isinstance(value, list):
+        return [_redact(item, fields) for item in value]
+    return value
+
+
+def _redact_body(body: bytes, fields: tuple) -> bytes:
+    """Заменяет секреты в JSON-теле; остальные тела не меняются"""
+    if not body or not fields:
+        return body
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return body
+    redacted = _redact(data, fields)
+    if redacted == data:
+        return body
+    return json.dumps(redacted, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class Cassette:
+    '''Запись и воспроизведение HTTP-обменов клиента Zojnik: Zojnik(cassette=Cassette(path, mode)).
+
+    mode='record' отправляет запросы на сервер и дописывает каждую пару запрос/ответ в файл JSON lines,
+    mode='replay' отвечает из файла без сети. Запросы сопоставляются по полям match_on: method, path,
+    query (параметры в отсортированном виде) и body (JSON с отсортированными ключами). Одинаковые запросы
+    воспроизводятся в порядке записи, последний ответ повторяется. При strict=True запрос, которого нет в
+    кассете, вызывает UnmatchedRequestError, иначе уходит на сервер.
+
+    Токены и пароли (REDACTED_FIELDS) в файл не попадают: заголовки запросов не сохраняются, а такие поля JSON
+    заменяются на REDACTED и в телах ответов, и в телах запросов перед сопоставлением'''
+
+    def __init__(self, path: str, mode: str = 'replay', match_on: tuple = MATCH_FIELDS, strict: bool = True,
+                 redact: tuple = REDACTED_FIELDS):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Неизвестный режим кассеты {mode!r}: ожидается 'record' или 'replay'")
+        unknown = set(match_on) - set(MATCH_FIELDS)
+        if unknown:
+            raise ValueError(f"Неизвестные поля сопоставления: {', '.join(sorted(unknown))}")
+        self.path = path
+        self.mode = mode
+        self.match_on = tuple(match_on)
+        self.strict = strict
+        self.redact = tuple(redact)
+        self.stats = {'recorded': 0, 'played': 0, 'passed_through': 0}
+        self._lock = threading.Lock()
+        self._index = {}     # ключ запроса -> список ответов в порядке записи
+        self._played = {}    # ключ запроса -> сколько ответов уже отдано
+        self._file = None
+        if mode == 'record':
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._file = open(path, 'w', encoding='utf-8', newline='\n')
+            self._write({'version': CASSETTE_VERSION, 'match_on': list(self.match_on)})
+        else:
+            self._load()
+
+    def __len__(self) -> int:
+        return sum(len(responses) for responses in self._index.values())
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def adapter(self, transport: BaseAdapter) -> 'CassetteAdapter':
+        """Транспорт для requests.Session: transport используется для записи и для непойманных запросов"""
+        return CassetteAdapter(self, transport)
+
+    # ---- Файл ----
+
+    def _write(self, record: dict):
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self._file.flush()
+
+    def _load(self):
+        with open(self.path, encoding='utf-8') as source:
+            header = json.loads(source.readline())
+            if header.get('version') != CASSETTE_VERSION:
+                raise ValueError(f"Неподдерживаемая версия кассеты {self.path}: {header.get('version')}")
+            for line in source:
+                record = json.loads(line)
+                key = self._key(record['request'])
+                self._index.setdefault(key, []).append(record['response'])
+
+    # ---- Сопоставление ----
+
+    def describe(self, request) -> dict:
+        """Поля запроса, по которым он сопоставляется, после удаления секретов"""
+        url = urlsplit(request.url)
+        body = request.body
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        if body is not None and not isinstance(body, bytes):
+            # Потоковое тело (например, multipart с файлом) не читается: сопоставляется по методу и адресу
+            canonical = 'stream'
+        else:
+            body = _redact_body(body or b'', self.redact)
+            try:
+                canonical = json.dumps(json.loads(body), ensure_ascii=False, sort_keys=True) if body else ''
+            except ValueError:
+                canonical = 'sha1:' + hashlib.sha1(body).hexdigest()
+        return {'method': request.method.upper(), 'path': url.path.rstrip('/') or '/',
+                'query': urlencode(sorted(parse_qsl(url.query, keep_blank_values=True))), 'body': canonical}
+
+    def _key(self, described: dict) -> tuple:
+        return tuple(described[field] for field in self.match_on)
+
+    # ---- Запись и воспроизведение ----
+
+    def record(self, request, response: Response):
+        # Тело читается целиком и в потоковом режиме: дальше requests отдаёт его из памяти
+        described = self.describe(request)
+        body = _redact_body(response.content, self.redact)
+        try:
+            stored_body = {'text': body.decode('utf-8')}
+        except UnicodeDecodeError:
+            stored_body = {'base64': base64.b64encode(body).decode('ascii')}
+        headers = {name: value for name, value in response.headers.items() if name.lower() not in _SKIPPED_HEADERS}
+        headers['Content-Length'] = str(len(body))
+        stored = {'status': response.status_code, 'reason': response.reason, 'headers': headers, **stored_body}
+        with self._lock:
+            self._index.setdefault(self._key(described), []).append(stored)
+            self._write({'request': described, 'response': stored})
+            self.stats['recorded'] += 1
+
+    def play(self, request):
+        """Записанный ответ на request или None, если такого запроса в кассете нет"""
+        key = self._key(self.describe(request))
+        with self._lock:
+            responses = self._index.get(key)
+            if not responses:
+                return None
+            played = self._played.get(key, 0)
+            self._played[key] = played + 1
+            self.stats['played'] += 1
+        return responses[min(played, len(responses) - 1)]
+
+
+class CassetteAdapter(BaseAdapter):
+    '''Транспорт requests поверх кассеты: в режиме записи передаёт запрос дальше в transport и сохраняет
+    ответ, в режиме воспроизведения собирает requests.Response из файла'''
+
+    def __init__(self, cassette: Cassette, transport: BaseAdapter):
+        super().__init__()
+        self.cassette = cassette
+        self.transport = transport
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        cassette = self.cassette
+        if cassette.mode == 'replay':
+            stored = cassette.play(request)
+            if stored is not None:
+                return self._build_response(request, stored)
+            if cassette.strict:
+                described = cassette.describe(request)
+                raise UnmatchedRequestError(f"Запроса нет в кассете {cassette.path}: "
+                                            f"{described['method']} {described['path']}?{described['query']}")
+            cassette.stats['passed_through'] += 1
+            return self.transport.send(request, stream=stream, timeout=timeout, verify=verify, cert=cert,
+                                       proxies=proxies)
+
+        response = self.transport.send(request, stream=stream, timeout=timeout, verify=verify, cert=cert,
+                                       proxies=proxies)
+        cassette.record(request, response)
+        return response
+
+    @staticmethod
+    def _build_response(request, stored: dict) -> Response:
+        body = stored['text'].encode('utf-8') if 'text' in stored else base64.b64decode(stored['base64'])
+        response = Response()
+        response.status_code = stored['status']
+        response.reason = stored.get('reason')
+        response.headers = CaseInsensitiveDict(stored['headers'])
+        response.raw = HTTPResponse(body=io.BytesIO(body), headers=stored['headers'], status=stored['status'],
+                                    preload_content=False, decode_content=False)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(0)
+        return response
+
+    def close(self):
+        self.transport.close()
+        self.cassette.close()
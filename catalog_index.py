@@ -0,0 +1,214 @@
+import random
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from api import Zojnik
+
+
+def _split(values) -> tuple:
+    """Фильтр как у сервера: строка через % или запятую либо список значений"""
+    if not values:
+        return ()
+    if isinstance(values, str):
+        return tuple(filter(None, re.split(r'[%,]', values)))
+    return tuple(values)
+
+
+def _join(values) -> str:
+    return ','.join(_split(values))
+
+
+class CatalogIndex:
+    '''Локальный индекс каталога блюд для запросов меню с фильтрами без обращения к серверу.
+
+    Для каждого тега, антитега и категории хранится битовая маска (int) по позициям блюд. Запрос
+    query(tags, antitags, category) отвечает так же, как /api/food: блюда хотя бы с одним из tags, без единого
+    из antitags и из категории category (имя или название). Каталог загружается через sync(); повторный sync()
+    переиндексирует только изменившиеся блюда, а upsert()/remove() применяют известные изменения без запроса.
+
+    sample_rate - доля запросов, которые дополнительно проверяются на сервере в фоне; расхождения
+    накапливаются в mismatches'''
+
+    def __init__(self, client: Zojnik, page_size: int = 500, sample_rate: float = 0.0, seed: int = None):
+        self.client = client
+        self.page_size = page_size
+        self.sample_rate = sample_rate
+        self.mismatches = []
+        self.stats = {'queries': 0, 'sampled': 0, 'syncs': 0}
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._dishes = {}      # id -> блюдо
+        self._positions = {}   # id -> номер бита
+        self._ids = []         # номер бита -> id (None для удалённых)
+        self._all = 0
+        self._tags = {}
+        self._antitags = {}
+        self._categories = {}
+        self._category_titles = {}
+        self._verifier = None
+
+    def __len__(self) -> int:
+        return len(self._dishes)
+
+    def close(self):
+        if self._verifier is not None:
+            self._verifier.shutdown(wait=True)
+            self._verifier = None
+
+    # ---- Синхронизация ----
+
+    def sync(self) -> dict:
+        """Загружает каталог с сервера и применяет разницу с индексом.
+        Возвращает число добавленных, изменённых и удалённых блюд"""
+        status, categories = self.client.get_food_categories(verbosity='silent')
+        if status == 200 and isinstance(categories, list):
+            titles = {item['title']: item['name'] for item in categories
+                      if isinstance(item, dict) and 'title' in item and 'name' in item}
+        else:
+            titles = None
+        dishes = {dish['id']: dish for dish in self.client.iter_dishes(page_size=self.page_size)}
+
+        with self._lock:
+            if titles is not None:
+                self._category_titles = titles
+            changes = {'added': 0, 'updated': 0, 'removed': 0}
+            for dish_id in [dish_id for dish_id in self._dishes if dish_id not in dishes]:
+                self._remove(dish_id)
+                changes['removed'] += 1
+            for dish_id, dish in dishes.items():
+                current = self._dishes.get(dish_id)
+                if current is None:
+                    changes['added'] += 1
+                elif current != dish:
+                    changes['updated'] += 1
+                else:
+                    continue
+                self._upsert(dish)
+            self.stats['syncs'] += 1
+        return changes
+
+    def upsert(self, dish: dict):
+        """Добавляет или обновляет блюдо, например результат create_dish или change_dish"""
+        with self._lock:
+            self._upsert(dish)
+
+    def remove(self, dish_id: int):
+        with self._lock:
+            if dish_id in self._dishes:
+                self._remove(dish_id)
+
+    def _upsert(self, dish: dict):
+        dish_id = dish['id']
+        position = self._positions.get(dish_id)
+        if position is None:
+            position = self._positions[dish_id] = len(self._ids)
+            self._ids.append(dish_id)
+        else:
+            self._unindex(self._dishes[dish_id], position)
+        self._dishes[dish_id] = dish
+        bit = 1 << position
+        self._all |= bit
+        for key, index in (('tags', self._tags), ('antitags', self._antitags)):
+            for value in dish.get(key) or ():
+                index[value] = index.get(value, 0) | bit
+        if dish.get('category') is not None:
+            self._categories[dish['category']] = self._categories.get(dish['category'], 0) | bit
+
+    def _unindex(self, dish: dict, position: int):
+        mask = ~(1 << position)
+        self._all &= mask
+        for key, index in (('tags', self._tags), ('antitags', self._antitags)):
+            for value in dish.get(key) or ():
+                index[value] &= mask
+        if dish.get('category') is not None:
+            self._categories[dish['category']] &= mask
+
+    def _remove(self, dish_id: int):
+        position = self._positions.pop(dish_id)
+        self._unindex(self._dishes.pop(dish_id), position)
+        self._ids[position] = None
+        # Освободившиеся биты не переиспользуются; когда их больше половины, индекс пересобирается
+        if len(self._ids) > 64 and len(self._dishes) * 2 < len(self._ids):
+            self._rebuild()
+
+    def _rebuild(self):
+        dishes = sorted(self._dishes.values(), key=lambda dish: self._positions[dish['id']])
+        self._dishes, self._positions, self._ids = {}, {}, []
+        self._all, self._tags, self._antitags, self._categories = 0, {}, {}, {}
+        for dish in dishes:
+            self._upsert(dish)
+
+    # ---- Запросы ----
+
+    def _mask(self, tags, antitags, category) -> int:
+        mask = self._all
+        tags, antitags = _split(tags), _split(antitags)
+        if tags:
+            include = 0
+            for tag in tags:
+                include |= self._tags.get(tag, 0)
+            mask &= include
+        for antitag in antitags:
+            mask &= ~self._antitags.get(antitag, 0)
+        if category:
+            mask &= self._categories.get(self._category_titles.get(category, category), 0)
+        return mask
+
+    def _positions_of(self, mask: int) -> np.ndarray:
+        if not mask:
+            return np.empty(0, dtype=np.int64)
+        raw = np.frombuffer(mask.to_bytes((mask.bit_length() + 7) // 8, 'little'), dtype=np.uint8)
+        return np.flatnonzero(np.unpackbits(raw, bitorder='little'))
+
+    def query_ids(self, tags=None, antitags=None, category=None) -> list:
+        """id блюд, подходящих под фильтры, в порядке их загрузки в индекс"""
+        with self._lock:
+            ids = self._ids
+            mask = self._mask(tags, antitags, category)
+            result = [ids[position] for position in self._positions_of(mask).tolist()]
+            self.stats['queries'] += 1
+        if self.sample_rate and self._random.random() < self.sample_rate:
+            self._submit_verification(tags, antitags, category, result)
+        return result
+
+    def query(self, tags=None, antitags=None, category=None) -> list:
+        """Блюда, подходящие под фильтры, в формате ответа /api/food"""
+        ids = self.query_ids(tags, antitags, category)
+        with self._lock:
+            return [self._dishes[dish_id] for dish_id in ids if dish_id in self._dishes]
+
+    # ---- Сверка с сервером ----
+
+    def verify(self, tags=None, antitags=None, category=None, expected: list = None) -> dict:
+        '''Выполняет тот же запрос на сервере и сравнивает состав блюд с индексом.
+        Возвращает None при совпадении, иначе описание расхождения (оно же добавляется в mismatches)'''
+        if expected is None:
+            with self._lock:
+                expected = [self._ids[position]
+                            for position in self._positions_of(self._mask(tags, antitags, category)).tolist()]
+        server = [dish['id'] for dish in self.client.iter_dishes(page_size=self.page_size, tags=_join(tags),
+                                                                  antitags=_join(antitags), category=category)]
+        missing, extra = sorted(set(server) - set(expected)), sorted(set(expected) - set(server))
+        if not missing and not extra:
+            return None
+        mismatch = {'tags': _split(tags), 'antitags': _split(antitags), 'category': category,
+                    'missing': missing, 'extra': extra}
+        with self._lock:
+            self.mismatches.append(mismatch)
+        return mismatch
+
+    def verify_sample(self, queries: list, size: int = 10) -> list:
+        """Сверяет с сервером случайную выборку из queries - кортежей (tags, antitags, category)"""
+        sample = self._random.sample(list(queries), min(size, len(queries)))
+        return [mismatch for mismatch in (self.verify(*query) for query in sample) if mismatch]
+
+    def _submit_verification(self, tags, antitags, category, result: list):
+        with self._lock:
+            self.stats['sampled'] += 1
+            if self._verifier is None:
+                self._verifier = ThreadPoolExecutor(1, thread_name_prefix='zojnik-index-verify')
+            verifier = self._verifier
+        verifier.submit(self.verify, tags, antitags, category, result)
@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import deque
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error', 'finished_at')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.finished_at = None
+
+
+class _Stats:
+    """Общие счётчики синхронного и асинхронного варианта"""
+
+    def _init_stats(self, window: float):
+        self.window = window
+        self._stats = {'calls': 0, 'executed': 0, 'shared': 0}
+        self._expiry = deque()  # (время завершения, ключ) для очистки по окну
+
+    def stats(self) -> dict:
+        """calls - всего вызовов, executed - реально выполненных запросов, shared (= сэкономлено) - получивших
+        чужой результат"""
+        stats = dict(self._stats)
+        stats['saved_ratio'] = round(stats['shared'] / stats['calls'], 4) if stats['calls'] else 0.0
+        return stats
+
+    def _prune(self, calls: dict, now: float):
+        while self._expiry and now - self._expiry[0][0] > self.window:
+            finished_at, key = self._expiry.popleft()
+            call = calls.get(key)
+            if call is not None and call.finished_at == finished_at:
+                del calls[key]
+
+
+class SingleFlight(_Stats):
+    '''Объединение одинаковых одновременных вызовов: do(key, function) выполняет function один раз на все
+    потоки, которые пришли с тем же key, пока первый вызов не завершился, и отдаёт всем его результат
+    (или исключение).
+
+    window - сколько секунд после завершения результат ещё отдаётся новым вызовам с тем же ключом; 0 объединяет
+    только вызовы, пересекающиеся по времени. Результат общий для всех получателей, менять его нельзя'''
+
+    def __init__(self, window: float = 0.0):
+        self._init_stats(window)
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, function):
+        with self._lock:
+            self._stats['calls'] += 1
+            now = time.monotonic()
+            self._prune(self._calls, now)
+            call = self._calls.get(key)
+            if call is not None and (call.finished_at is None or now - call.finished_at <= self.window):
+                self._stats['shared'] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._stats['executed'] += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+            return call.result
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                call.finished_at = time.monotonic()
+                if self.window and call.error is None:
+                    self._expiry.append((call.finished_at, key))
+                elif self._calls.get(key) is call:
+                    del self._calls[key]
+            call.event.set()
+
+
+class AsyncSingleFlight(_Stats):
+    '''То же, что SingleFlight, для корутин одного event loop: do(key, factory) запускает factory() отдельной
+    задачей, и все ожидающие получают её результат. Отмена одного из ожидающих не отменяет общий запрос'''
+
+    def __init__(self, window: float = 0.0):
+        self._init_stats(window)
+        self._calls = {}
+
+    async def do(self, key, factory):
+        import asyncio  # не импортируется вместе с модулем: синхронному клиенту asyncio не нужен
+
+        self._stats['calls'] += 1
+        now = time.monotonic()
+        self._prune(self._calls, now)
+        call = self._calls.get(key)
+        if call is not None and (call.finished_at is None or now - call.finished_at <= self.window):
+            self._stats['shared'] += 1
+        else:
+            call = self._calls[key] = _AsyncCall(asyncio.ensure_future(factory()))
+            call.task.add_done_callback(lambda task, call=call, key=key: self._finish(key, call))
+            self._stats['executed'] += 1
+        return await asyncio.shield(call.task)
+
+    def _finish(self, key, call: '_AsyncCall'):
+        call.finished_at = time.monotonic()
+        failed = call.task.cancelled() or call.task.exception() is not None
+        if self.window and not failed:
+            self._expiry.append((call.finished_at, key))
+        elif self._calls.get(key) is call:
+            del self._calls[key]
+
+
+class _AsyncCall:
+    __slots__ = ('task', 'finished_at')
+
+    def __init__(self, task: 'asyncio.Future'):
+        self.task = task
+        self.finished_at = None
@@ -0,0 +1,216 @@
+import functools
+import json
+import os
+import re
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+_LINE = re.compile(r'^\s*(?:export\s+)?([A-Za-z_][A-Za-z0-9_.]*)\s*=\s*(.*?)\s*$')
+
+
+def _parse_value(raw: str) -> str:
+    if len(raw) >= 2 and raw[0] == raw[-1] and raw[0] in '\'"':
+        return raw[1:-1].replace('\\' + raw[0], raw[0])
+    return raw.split(' #', 1)[0].strip()
+
+
+def _format_value(value) -> str:
+    # Тот же формат, что и у dotenv.set_key: значение в одинарных кавычках
+    return "'{}'".format(str(value).replace("'", "\\'"))
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Межпроцессная блокировка на отдельном файле рядом с .env"""
+    with open(path, 'a+b') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def default_env_path() -> str:
+    """Путь к .env: переменная окружения ZOJNIK_DOTENV или ближайший .env вверх по дереву каталогов.
+    ZOJNIK_DOTENV (в командной строке - --env) избавляет от поиска совсем"""
+    return os.getenv('ZOJNIK_DOTENV') or _find_env_path()
+
+
+def _cache_path() -> str:
+    """Файл с найденными путями к .env в пользовательском каталоге кэша (ZOJNIK_CACHE_DIR, XDG_CACHE_HOME,
+    %LOCALAPPDATA% или ~/.cache)"""
+    directory = (os.getenv('ZOJNIK_CACHE_DIR') or os.getenv('XDG_CACHE_HOME') or os.getenv('LOCALAPPDATA')
+                 or os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(directory, 'zojnik', 'dotenv_path.json')
+
+
+def _read_cached_paths(cache_path: str) -> dict:
+    try:
+        with open(cache_path, encoding='utf-8') as cache_file:
+            paths = json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+    return paths if isinstance(paths, dict) else {}
+
+
+def _write_cached_paths(cache_path: str, paths: dict):
+    """Атомарная запись кэша; ошибки записи (например, каталог только для чтения) не мешают работе"""
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix='.dotenv_path.', suffix='.tmp', dir=os.path.dirname(cache_path))
+        with os.fdopen(fd, 'w', encoding='utf-8') as temp_file:
+            json.dump(paths, temp_file, ensure_ascii=False)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass
+
+
+@functools.lru_cache(maxsize=None)
+def _find_env_path() -> str:
+    """Поиск .env вверх по каталогам. Результат хранится в памяти процесса и в файле кэша (_cache_path()) для
+    каталога, откуда начинается поиск, поэтому короткие запуски python -m zojnik не повторяют обход и не
+    импортируют dotenv. Запись кэша не используется, если файла по сохранённому пути больше нет.
+    Если .env появился ближе сохранённого, нужно задать ZOJNIK_DOTENV или удалить файл кэша"""
+    key = f'{os.path.dirname(os.path.abspath(__file__))}{os.pathsep}{os.getcwd()}'
+    cache_path = _cache_path()
+    paths = _read_cached_paths(cache_path)
+    cached = paths.get(key)
+    if isinstance(cached, str) and os.path.isfile(cached):
+        return cached
+
+    from dotenv import find_dotenv
+
+    path = find_dotenv()
+    if path:
+        paths[key] = path
+        _write_cached_paths(cache_path, paths)
+    return path
+
+
+class CredentialStore:
+    '''Хранилище учётных данных и токенов в .env файле.
+
+    Значения читаются с диска один раз и дальше отдаются из памяти. Запись нескольких ключей выполняется
+    одной атомарной заменой файла (временный файл + os.replace) под межпроцессной блокировкой, поэтому
+    одновременные запуски тестов не затирают изменения друг друга'''
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self.lock_path = self.path + '.lock'
+        self._lock = threading.Lock()
+        self._values = None
+
+    @classmethod
+    def for_path(cls, path: str) -> 'CredentialStore':
+        """Возвращает общее для процесса хранилище для указанного файла"""
+        key = os.path.realpath(path)
+        with cls._instances_lock:
+            store = cls._instances.get(key)
+            if store is None:
+                store = cls._instances[key] = cls(path)
+            return store
+
+    @classmethod
+    def default(cls):
+        """Хранилище для default_env_path() или None, если .env не найден"""
+        path = default_env_path()
+        return cls.for_path(path) if path else None
+
+    def _read_lines(self) -> list:
+        try:
+            with open(self.path, encoding='utf-8', newline='') as env_file:
+                return env_file.read().splitlines(keepends=True)
+        except FileNotFoundError:
+            return []
+
+    @staticmethod
+    def _parse(lines) -> dict:
+        values = {}
+        for line in lines:
+            match = _LINE.match(line.rstrip('\r\n'))
+            if match and not line.lstrip().startswith('#'):
+                values[match.group(1)] = _parse_value(match.group(2))
+        return values
+
+    def _cache(self) -> dict:
+        if self._values is None:
+            with self._lock:
+                if self._values is None:
+                    self._values = self._parse(self._read_lines())
+        return self._values
+
+    def reload(self):
+        """Перечитывает файл, например после изменения другим процессом"""
+        with self._lock:
+            self._values = self._parse(self._read_lines())
+
+    def get(self, key: str, default=None):
+        return self._cache().get(key, default)
+
+    def __getitem__(self, key: str):
+        return self._cache()[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._cache()
+
+    def as_dict(self) -> dict:
+        return dict(self._cache())
+
+    def export_to_environ(self, override: bool = False):
+        """Копирует значения в os.environ. Как и load_dotenv, по умолчанию не перезаписывает уже заданные"""
+        for key, value in self._cache().items():
+            if override or key not in os.environ:
+                os.environ[key] = value
+
+    def update(self, values: dict):
+        """Записывает несколько ключей одной атомарной операцией. Остальные строки файла сохраняются как есть"""
+        with self._lock, _file_lock(self.lock_path):
+            lines = self._read_lines()
+            newline = '\r\n' if lines and lines[0].endswith('\r\n') else '\n'
+            pending = dict(values)
+            for index, line in enumerate(lines):
+                match = _LINE.match(line.rstrip('\r\n'))
+                if match and match.group(1) in pending and not line.lstrip().startswith('#'):
+                    key = match.group(1)
+                    ending = line[len(line.rstrip('\r\n')):]
+                    lines[index] = f'{key}={_format_value(pending.pop(key))}{ending}'
+            if pending and lines and not lines[-1].endswith('\n'):
+                lines[-1] += newline
+            lines.extend(f'{key}={_format_value(value)}{newline}' for key, value in pending.items())
+
+            directory = os.path.dirname(self.path)
+            fd, temp_path = tempfile.mkstemp(prefix='.env.', suffix='.tmp', dir=directory)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8', newline='') as temp_file:
+                    temp_file.writelines(lines)
+                    temp_file.flush()
+                    os.fsync(temp_file.fileno())
+                # mkstemp создаёт файл с правами 0600: заменённый .env сохраняет права прежнего,
+                # а новый остаётся доступен только владельцу
+                if os.path.exists(self.path):
+                    os.chmod(temp_path, stat.S_IMODE(os.stat(self.path).st_mode))
+                os.replace(temp_path, self.path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            self._values = self._parse(lines)
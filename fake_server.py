@@ -0,0 +1,578 @@
+import argparse
+import base64
+import email.policy
+import hashlib
+import hmac
+import json
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+CATEGORIES = [
+    {'id': 1, 'name': 'PROTEIN_PRODUCTS', 'title': 'Белковое блюдо'},
+    {'id': 2, 'name': 'GARNISH_PRODUCTS', 'title': 'Гарнир'},
+    {'id': 3, 'name': 'VEGETABLE_PRODUCTS', 'title': 'Овощи'},
+]
+TAGS = ['Мясо', 'Рыба', 'Птица', 'Гарнир', 'Овощи', 'Острое', 'Вегетарианское']
+ANTITAGS = ['Куркума', 'Паприка', 'Глютен', 'Лактоза', 'Орехи']
+
+DISH_FIELDS = ('name', 'calories', 'protein', 'fat', 'carbohydrates', 'allergen', 'other', 'price', 'rating',
+               'avatar', 'category', 'tags', 'antitags')
+USER_FIELDS = ('first_name', 'last_name', 'username', 'phone_number', 'email')
+PLATE_SUMS = ('calories', 'protein', 'fat', 'carbohydrates', 'price')
+# В multipart/form-data все поля приходят строками, как и в DRF они приводятся к типам полей модели
+FORM_TYPES = {'calories': float, 'protein': float, 'fat': float, 'carbohydrates': float, 'price': float,
+              'rating': int, 'allergen': lambda value: value.lower() in ('true', '1')}
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+class FakeZojnikServer:
+    '''Локальная замена API Zojnik для тестов, бенчмарков и нагрузочных прогонов без сети.
+
+    Хранит пользователей, блюда и тарелки в памяти и реализует те же эндпоинты, что использует Zojnik.
+    Клиент подключается к нему через base_url, например Zojnik(base_url=server.base_url)'''
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 500, dishes: int = 120, plates: int = 10, seed: int = 0,
+                 access_lifetime: int = 300, refresh_lifetime: int = 86400, retry_after: float = None):
+        """latency - задержка каждого ответа в секундах (число или диапазон (min, max)),
+        error_rate - доля запросов, на которые сервер отвечает error_status,
+        retry_after - значение заголовка Retry-After в таких ответах (None - без заголовка),
+        dishes и plates - сколько блюд и тарелок создать при запуске"""
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self._faults = deque()
+        self.access_lifetime = access_lifetime
+        self.refresh_lifetime = refresh_lifetime
+
+        self._secret = uuid.uuid4().bytes
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._httpd = None
+        self._thread = None
+
+        self.requests_count = 0
+        # Сколько запросов обрабатывается сейчас и наибольшее число одновременных за всё время
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.users = {}
+        self.dishes = {}
+        self.plates = {}
+        self.avatars = {}  # URL загруженной картинки -> её байты
+        # (id пользователя, Idempotency-Key) -> (метод, путь, статус, тело ответа) первого выполнения запроса
+        self.idempotency = {}
+        self.idempotent_replays = 0
+        self._seed_catalog(dishes, plates)
+
+    # ---- Жизненный цикл ----
+
+    def start(self) -> 'FakeZojnikServer':
+        handler = type('Handler', (_Handler,), {'app': self})
+        self._httpd = _Server((self.host, self.port), handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_port
+        self._thread = threading.Thread(target=self._httpd.serve_forever, kwargs={'poll_interval': 0.05},
+                                        name='fake-zojnik', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._thread.join()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def fail_next(self, count: int = 1, status: int = 503, retry_after: float = None, path: str = None):
+        """Следующие count запросов (только к адресам, начинающимся с path, если он задан) получат ответ status,
+        при retry_after - с заголовком Retry-After"""
+        with self._lock:
+            self._faults.extend([(status, retry_after, path)] * count)
+
+    def _take_fault(self, path: str):
+        with self._lock:
+            for fault in self._faults:
+                if fault[2] is None or path.startswith(fault[2]):
+                    self._faults.remove(fault)
+                    return fault[:2]
+            if self.error_rate and self._random.random() < self.error_rate:
+                return self.error_status, self.retry_after
+        return None
+
+    @property
+    def base_url(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    # ---- Данные ----
+
+    def _seed_catalog(self, dishes: int, plates: int):
+        rnd = self._random
+        for dish_id in range(1, dishes + 1):
+            category = CATEGORIES[(dish_id - 1) % len(CATEGORIES)]['name']
+            self.dishes[dish_id] = {
+                'id': dish_id,
+                'name': f'Блюдо {dish_id}',
+                'calories': round(rnd.uniform(20, 600), 1),
+                'protein': round(rnd.uniform(0, 40), 1),
+                'fat': round(rnd.uniform(0, 40), 1),
+                'carbohydrates': round(rnd.uniform(0, 80), 1),
+                'allergen': rnd.random() < 0.2,
+                'other': None,
+                'price': round(rnd.uniform(50, 900)),
+                'rating': rnd.randint(0, 5),
+                'avatar': None,
+                'category': category,
+                'tags': rnd.sample(TAGS, rnd.randint(1, 3)),
+                'antitags': rnd.sample(ANTITAGS, rnd.randint(0, 2)),
+            }
+        ids = list(self.dishes)
+        for plate_id in range(1, plates + 1):
+            self.plates[plate_id] = self._build_plate(plate_id, rnd.choice(ids), rnd.choice(ids), rnd.choice(ids))
+
+    def _build_plate(self, plate_id: int, protein: int, garnish: int, vegetable: int) -> dict:
+        components = [self.dishes[protein], self.dishes[garnish], self.dishes[vegetable]]
+        plate = {'id': plate_id, 'proteinproduct': protein, 'garnishproduct': garnish, 'vegetableproduct': vegetable}
+        for field in PLATE_SUMS:
+            plate[field] = round(sum(dish[field] for dish in components), 2)
+        plate['rating'] = round(sum(dish['rating'] for dish in components) / 3, 2)
+        return plate
+
+    def add_user(self, email: str, password: str, **fields) -> dict:
+        """Регистрирует пользователя напрямую, минуя API"""
+        with self._lock:
+            user_id = len(self.users) + 1
+            user = {'id': user_id, 'first_name': '', 'last_name': '', 'username': '', 'phone_number': '',
+                    'email': email, 'profile': {}}
+            user.update(fields)
+            self.users[user_id] = {'user': user, 'password': password}
+            return dict(user)
+
+    def _find_user(self, login: str):
+        with self._lock:
+            records = list(self.users.values())
+        for record in records:
+            user = record['user']
+            if login and login in (user['email'], user['username']):
+                return record
+        return None
+
+    # ---- JWT ----
+
+    def issue_tokens(self, user_id: int) -> dict:
+        return {'access': self._encode_token(user_id, 'access', self.access_lifetime),
+                'refresh': self._encode_token(user_id, 'refresh', self.refresh_lifetime)}
+
+    def _encode_token(self, user_id: int, token_type: str, lifetime: int) -> str:
+        now = int(time.time())
+        header = _b64encode(json.dumps({'alg': 'HS256', 'typ': 'JWT'}).encode())
+        payload = _b64encode(json.dumps({'token_type': token_type, 'exp': now + lifetime, 'iat': now,
+                                         'jti': uuid.uuid4().hex, 'user_id': user_id}).encode())
+        signature = hmac.new(self._secret, f'{header}.{payload}'.encode(), hashlib.sha256).digest()
+        return f'{header}.{payload}.{_b64encode(signature)}'
+
+    def _decode_token(self, token, token_type: str = None):
+        """Возвращает payload действительного токена или None"""
+        try:
+            header, payload, signature = token.split('.')
+            expected = hmac.new(self._secret, f'{header}.{payload}'.encode(), hashlib.sha256).digest()
+            if not hmac.compare_digest(expected, _b64decode(signature)):
+                return None
+            claims = json.loads(_b64decode(payload))
+        except (AttributeError, ValueError):
+            return None
+        if claims['exp'] < time.time() or claims['user_id'] not in self.users:
+            return None
+        if token_type and claims['token_type'] != token_type:
+            return None
+        return claims
+
+
+class _Server(ThreadingHTTPServer):
+    # Очередь по умолчанию (5) переполняется при пачке одновременных подключений, и клиент ждёт повтора SYN
+    request_queue_size = 128
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    app = None
+
+    ROUTES = [
+        ('POST', r'/api/auth/jwt/create/?', 'jwt_create', False),
+        ('POST', r'/api/auth/jwt/refresh/?', 'jwt_refresh', False),
+        ('POST', r'/api/auth/jwt/verify/?', 'jwt_verify', False),
+        ('POST', r'/api/users/reg/?', 'user_registration', False),
+        ('GET', r'/api/users/me/?', 'user_profile', True),
+        ('PATCH', r'/api/users/me/?', 'change_user_profile', True),
+        ('POST', r'/api/users/change-passwd/?', 'change_password', True),
+        ('GET', r'/api/food/dicts/foodcategory/?', 'food_categories', True),
+        ('GET', r'/api/food/dicts/tag/?', 'tags', True),
+        ('GET', r'/api/food/dicts/antitag/?', 'antitags', True),
+        ('GET', r'/api/food/?', 'list_dishes', True),
+        ('POST', r'/api/food/?', 'create_dish', True),
+        ('GET', r'/api/food/(?P<dish_id>\d+)/?', 'dish_details', True),
+        ('PATCH', r'/api/food/(?P<dish_id>\d+)/?', 'change_dish', True),
+        ('GET', r'/api/plate/?', 'list_plates', True),
+        ('POST', r'/api/plate/?', 'create_plate', True),
+        ('GET', r'/api/plate/(?P<plate_id>\d+)/?', 'plate_details', True),
+    ]
+
+    def setup(self):
+        super().setup()
+        # Заголовки и тело уходят отдельными send: без TCP_NODELAY алгоритм Нейгла вместе с отложенным ACK
+        # клиента добавляет к каждому ответу около 40 мс
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PATCH(self):
+        self._dispatch('PATCH')
+
+    def _dispatch(self, method: str):
+        app = self.app
+        url = urlsplit(self.path)
+        self.route_path = url.path
+        self.query = parse_qsl(url.query, keep_blank_values=True)
+        length = int(self.headers.get('Content-Length') or 0)
+        raw_body = self.rfile.read(length) if length else b''
+
+        with app._lock:
+            app.requests_count += 1
+            app.in_flight += 1
+            app.max_in_flight = max(app.max_in_flight, app.in_flight)
+        try:
+            self._handle(method, url, raw_body)
+        finally:
+            with app._lock:
+                app.in_flight -= 1
+
+    def _handle(self, method: str, url, raw_body: bytes):
+        """Обработка запроса. Общая блокировка берётся только вокруг изменения общих данных: задержка latency,
+        чтение и сериализация ответов у разных запросов идут параллельно, как на настоящем сервере"""
+        app = self.app
+        fault = app._take_fault(url.path)
+        latency = app.latency
+        if isinstance(latency, (tuple, list)):
+            latency = random.uniform(*latency)
+        if latency:
+            time.sleep(latency)
+        if fault is not None:
+            status, retry_after = fault
+            headers = {'Retry-After': f'{retry_after:g}'} if retry_after is not None else None
+            return self._send(status, {'detail': 'Injected error'}, headers=headers)
+
+        for route_method, pattern, name, needs_auth in self.ROUTES:
+            match = re.fullmatch(pattern, url.path)
+            if match and route_method == method:
+                break
+        else:
+            return self._send(404, {'detail': 'Not found.'})
+
+        content_type = self.headers.get('Content-Type', '')
+        try:
+            if content_type.startswith('multipart/form-data'):
+                body = self._parse_form(content_type, raw_body)
+            else:
+                body = json.loads(raw_body) if raw_body else {}
+        except ValueError:
+            return self._send(400, {'detail': 'Multipart form parse error' if content_type.startswith('multipart')
+                                    else 'JSON parse error'})
+
+        self.user = None
+        if needs_auth:
+            claims = app._decode_token(self._bearer_token(), 'access')
+            if claims is None:
+                return self._send(401, {'detail': 'Given token not valid for any token type',
+                                        'code': 'token_not_valid'})
+            self.user = app.users[claims['user_id']]
+        # Как у Stripe и в черновике IETF: повтор изменяющего запроса с тем же Idempotency-Key не выполняется
+        # заново, а получает сохранённый ответ первого
+        idempotency_key = self.headers.get('Idempotency-Key') if method != 'GET' else None
+        scope = (self.user['user']['id'] if self.user else None, idempotency_key)
+        route = getattr(self, 'route_' + name)
+        stored = None
+        if not idempotency_key:
+            status, payload = route(body, **match.groupdict())
+        else:
+            # Проверка ключа и выполнение под одной блокировкой: два одновременных запроса с одним ключом
+            # не должны выполниться оба
+            with app._lock:
+                stored = app.idempotency.get(scope)
+                if stored is not None and stored[:2] == (method, url.path):
+                    app.idempotent_replays += 1
+                elif stored is not None:
+                    stored = None
+                    status, payload = 422, {'detail': 'Idempotency-Key уже использован для другого запроса'}
+                else:
+                    status, payload = route(body, **match.groupdict())
+                    if status < 500:
+                        # Сохраняется тело, а не объект: сам объект могут изменить следующие запросы
+                        app.idempotency[scope] = (method, url.path, status,
+                                                  json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+        if stored is not None:
+            return self._send(stored[2], body=stored[3], headers={'Idempotent-Replayed': 'true'})
+        if method == 'GET' and status == 200:
+            return self._send_with_etag(payload)
+        self._send(status, payload)
+
+    def _parse_form(self, content_type: str, raw_body: bytes) -> dict:
+        """Разбор multipart/form-data: файлы сохраняются в app.avatars, вместо них в поле подставляется URL"""
+        message = BytesParser(policy=email.policy.HTTP).parsebytes(
+            b'Content-Type: ' + content_type.encode('latin-1') + b'\r\n\r\n' + raw_body)
+        if not message.is_multipart():
+            raise ValueError('multipart body expected')
+        body = {}
+        for part in message.iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            payload = part.get_payload(decode=True)
+            filename = part.get_filename()
+            if filename is not None:
+                url = f'{self.app.base_url}/media/avatars/{uuid.uuid4().hex[:8]}_{filename}'
+                with self.app._lock:
+                    self.app.avatars[url] = payload
+                body[name] = url
+            else:
+                body[name] = FORM_TYPES.get(name, str)(payload.decode('utf-8'))
+        return body
+
+    def _bearer_token(self):
+        authorization = self.headers.get('Authorization', '')
+        if authorization.startswith('Bearer '):
+            return authorization[len('Bearer '):]
+        return None
+
+    def _send_with_etag(self, payload):
+        """Ответ с ETag; если клиент прислал тот же ETag в If-None-Match, тело не отправляется"""
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            return self._send(304, headers={'ETag': etag})
+        self._send(200, body=body, headers={'ETag': etag})
+
+    def _send(self, status: int, payload=None, body: bytes = None, headers: dict = None):
+        if body is None:
+            body = b'' if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        if body:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # ---- Авторизация и пользователи ----
+
+    def route_jwt_create(self, body):
+        record = self.app._find_user(body.get('username'))
+        if record is None or record['password'] != body.get('password'):
+            return 401, {'detail': 'No active account found with the given credentials'}
+        return 200, self.app.issue_tokens(record['user']['id'])
+
+    def route_jwt_refresh(self, body):
+        claims = self.app._decode_token(body.get('refresh'), 'refresh')
+        if claims is None:
+            return 401, {'detail': 'Token is invalid or expired', 'code': 'token_not_valid'}
+        return 200, self.app.issue_tokens(claims['user_id'])
+
+    def route_jwt_verify(self, body):
+        if self.app._decode_token(body.get('token')) is None:
+            return 401, {'detail': 'Token is invalid or expired', 'code': 'token_not_valid'}
+        return 200, {}
+
+    def route_user_registration(self, body):
+        email, password = body.get('email'), body.get('password')
+        fields = {key: body.get(key) or '' for key in USER_FIELDS if key != 'email'}
+        # Проверка email и добавление под одной блокировкой (RLock): одновременные регистрации с одним email
+        # не должны пройти обе
+        with self.app._lock:
+            errors = {}
+            if not email:
+                errors['email'] = ['Обязательное поле.']
+            elif self.app._find_user(email):
+                errors['email'] = ['Пользователь с таким email уже существует.']
+            if not password:
+                errors['password'] = ['Обязательное поле.']
+            if errors:
+                return 400, errors
+            return 201, self.app.add_user(email, password, **fields)
+
+    def route_user_profile(self, body):
+        return 200, self.user['user']
+
+    def route_change_user_profile(self, body):
+        user = self.user['user']
+        with self.app._lock:
+            for key in USER_FIELDS + ('profile',):
+                if key in body and body[key] is not None:
+                    user[key] = body[key]
+            return 200, dict(user)
+
+    def route_change_password(self, body):
+        if body.get('old_password') != self.user['password']:
+            return 400, {'old_password': ['Неверный пароль.']}
+        if not body.get('new_password'):
+            return 400, {'new_password': ['Обязательное поле.']}
+        with self.app._lock:
+            self.user['password'] = body['new_password']
+        return 204, None
+
+    # ---- Справочники, блюда и тарелки ----
+
+    def route_food_categories(self, body):
+        return 200, CATEGORIES
+
+    def route_tags(self, body):
+        return 200, [{'id': i, 'name': name} for i, name in enumerate(TAGS, 1)]
+
+    def route_antitags(self, body):
+        return 200, [{'id': i, 'name': name} for i, name in enumerate(ANTITAGS, 1)]
+
+    def route_list_dishes(self, body):
+        params = dict(self.query)
+        tags = set(filter(None, re.split(r'[%,]', params.get('tags', ''))))
+        antitags = set(filter(None, re.split(r'[%,]', params.get('antitags', ''))))
+        category = params.get('category')
+        titles = {item['title']: item['name'] for item in CATEGORIES}
+        category = titles.get(category, category)
+
+        with self.app._lock:
+            dishes = list(self.app.dishes.values())
+        result = []
+        for dish in dishes:
+            if tags and not tags.intersection(dish['tags']):
+                continue
+            if antitags and antitags.intersection(dish['antitags']):
+                continue
+            if category and dish['category'] != category:
+                continue
+            result.append(dish)
+        return 200, self._paginate(result)
+
+    def route_create_dish(self, body):
+        if not body.get('name'):
+            return 400, {'name': ['Обязательное поле.']}
+        with self.app._lock:
+            dish_id = max(self.app.dishes, default=0) + 1
+            dish = {'id': dish_id, 'tags': [], 'antitags': []}
+            dish.update({key: body.get(key) for key in DISH_FIELDS if key in body or key not in dish})
+            self.app.dishes[dish_id] = dish
+            return 201, dict(dish)
+
+    def route_dish_details(self, body, dish_id):
+        dish = self.app.dishes.get(int(dish_id))
+        if dish is None:
+            return 404, {'detail': 'Not found.'}
+        # Копия: ответ сериализуется без блокировки, пока другой запрос может менять блюдо
+        with self.app._lock:
+            return 200, dict(dish)
+
+    def route_change_dish(self, body, dish_id):
+        dish = self.app.dishes.get(int(dish_id))
+        if dish is None:
+            return 404, {'detail': 'Not found.'}
+        with self.app._lock:
+            dish.update({key: value for key, value in body.items() if key in DISH_FIELDS})
+            return 200, dict(dish)
+
+    def route_list_plates(self, body):
+        with self.app._lock:
+            plates = list(self.app.plates.values())
+        return 200, self._paginate(plates)
+
+    def _paginate(self, items: list):
+        """Без page_size отдаёт весь список, с ним - страницу в формате DRF со ссылкой next"""
+        params = dict(self.query)
+        if not params.get('page_size'):
+            return items
+        page_size = int(params['page_size'])
+        page = int(params.get('page') or 1)
+        start = (page - 1) * page_size
+
+        def link(number):
+            query = [(key, value) for key, value in self.query if key != 'page'] + [('page', number)]
+            return f"http://{self.headers['Host']}{self.route_path}?{urlencode(query)}"
+
+        return {
+            'count': len(items),
+            'next': link(page + 1) if start + page_size < len(items) else None,
+            'previous': link(page - 1) if page > 1 else None,
+            'results': items[start:start + page_size],
+        }
+
+    def route_create_plate(self, body):
+        ids = [body.get('proteinproduct'), body.get('garnishproduct'), body.get('vegetableproduct')]
+        missing = [dish_id for dish_id in ids if dish_id not in self.app.dishes]
+        if missing:
+            return 400, {'detail': f'Блюда не найдены: {missing}'}
+        with self.app._lock:
+            plate_id = max(self.app.plates, default=0) + 1
+            plate = self.app._build_plate(plate_id, *ids)
+            self.app.plates[plate_id] = plate
+        return 201, plate
+
+    def route_plate_details(self, body, plate_id):
+        plate = self.app.plates.get(int(plate_id))
+        if plate is None:
+            return 404, {'detail': 'Not found.'}
+        return 200, plate
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Локальный сервер, имитирующий API Zojnik')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=float, default=None, help='Retry-After в ответах с ошибкой')
+    parser.add_argument('--dishes', type=int, default=120)
+    parser.add_argument('--plates', type=int, default=10)
+    parser.add_argument('--user', action='append', default=[], metavar='EMAIL:PASSWORD',
+                        help='пользователь, созданный при запуске')
+    args = parser.parse_args()
+
+    server = FakeZojnikServer(args.host, args.port, latency=args.latency, error_rate=args.error_rate,
+                              dishes=args.dishes, plates=args.plates, retry_after=args.retry_after)
+    for credentials in args.user:
+        email, password = credentials.split(':', 1)
+        server.add_user(email, password)
+    server.start()
+    print(f'Fake Zojnik API: {server.base_url}')
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import math
+
+_SUB_BUCKET_BITS = 7
+_SUB_BUCKETS = 1 << _SUB_BUCKET_BITS
+_HALF = _SUB_BUCKETS // 2
+
+
+def _bucket_index(value: int) -> int:
+    """Логарифмически-линейная корзина, как в HdrHistogram: значения до 128 хранятся точно,
+    дальше ширина корзины растёт вдвое на каждую степень двойки (относительная ошибка не больше 1/64)"""
+    if value < _SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - _SUB_BUCKET_BITS
+    return _SUB_BUCKETS + (shift - 1) * _HALF + ((value >> shift) - _HALF)
+
+
+def _bucket_bounds(index: int):
+    """Нижняя и верхняя (не включительно) граница значений корзины"""
+    if index < _SUB_BUCKETS:
+        return index, index + 1
+    shift = (index - _SUB_BUCKETS) // _HALF + 1
+    mantissa = (index - _SUB_BUCKETS) % _HALF + _HALF
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+class LatencyHistogram:
+    '''Гистограмма задержек с точностью около 1.5% в диапазоне от микросекунд до часов.
+
+    Хранит только непустые корзины, поэтому компактна и сливается сложением: гистограммы из разных потоков
+    и процессов объединяются через merge или to_dict/from_dict'''
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds: float):
+        value = max(int(seconds * 1_000_000), 0)
+        index = _bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: 'LatencyHistogram') -> 'LatencyHistogram':
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def percentile(self, percent: float) -> float:
+        """Значение в секундах, не меньше которого percent процентов измерений"""
+        if not self.count:
+            return 0.0
+        rank = max(math.ceil(self.count * percent / 100), 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                low, high = _bucket_bounds(index)
+                value = min((low + high - 1) / 2, self.max)
+                return max(value, self.min) / 1_000_000
+        return self.max / 1_000_000
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count / 1_000_000 if self.count else 0.0
+
+    def summary(self) -> dict:
+        """Основные перцентили в миллисекундах"""
+        return {
+            'count': self.count,
+            'mean_ms': round(self.mean * 1000, 3),
+            'p50_ms': round(self.percentile(50) * 1000, 3),
+            'p95_ms': round(self.percentile(95) * 1000, 3),
+            'p99_ms': round(self.percentile(99) * 1000, 3),
+            'max_ms': round((self.max or 0) / 1000, 3),
+        }
+
+    def to_dict(self) -> dict:
+        return {'counts': self.counts, 'count': self.count, 'total': self.total, 'min': self.min, 'max': self.max}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'LatencyHistogram':
+        histogram = cls()
+        histogram.counts = {int(index): count for index, count in data['counts'].items()}
+        histogram.count, histogram.total = data['count'], data['total']
+        histogram.min, histogram.max = data['min'], data['max']
+        return histogram
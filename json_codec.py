@@ -0,0 +1,80 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+class JSONCodec:
+    '''Кодирование тел запросов и разбор ответов. loads принимает bytes (или str) и разбирает их без
+    промежуточного декодирования в текст; errors - исключения, которые loads бросает на не-JSON'''
+
+    name = None
+    errors = (ValueError,)
+
+    def dumps(self, obj) -> bytes:
+        raise NotImplementedError
+
+    def loads(self, data):
+        raise NotImplementedError
+
+
+class StdlibCodec(JSONCodec):
+    name = 'json'
+    # Для bytes json.loads сам определяет кодировку; битый UTF-8 даёт UnicodeDecodeError (подкласс ValueError)
+    errors = (ValueError,)
+
+    def dumps(self, obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonCodec(JSONCodec):
+    name = 'orjson'
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("Кодек 'orjson' требует пакет orjson")
+        self.errors = (orjson.JSONDecodeError,)
+        # Функции библиотеки привязываются напрямую, без лишнего вызова Python-метода на каждый ответ
+        self.dumps = orjson.dumps
+        self.loads = orjson.loads
+
+
+class MsgspecCodec(JSONCodec):
+    name = 'msgspec'
+
+    def __init__(self):
+        if msgspec is None:
+            raise ImportError("Кодек 'msgspec' требует пакет msgspec")
+        self.errors = (msgspec.DecodeError,)
+        self.dumps = msgspec.json.Encoder().encode
+        self.loads = msgspec.json.Decoder().decode
+
+
+CODECS = {'orjson': OrjsonCodec, 'msgspec': MsgspecCodec, 'json': StdlibCodec}
+# Порядок выбора для 'auto': первый установленный
+PREFERRED = ('orjson', 'msgspec', 'json')
+
+
+def available_codecs() -> list:
+    return [name for name in PREFERRED if name == 'json' or globals()[name] is not None]
+
+
+def get_codec(codec='auto') -> JSONCodec:
+    """Возвращает кодек по имени ('auto', 'orjson', 'msgspec', 'json') или сам переданный JSONCodec"""
+    if isinstance(codec, JSONCodec):
+        return codec
+    if codec in (None, 'auto'):
+        codec = available_codecs()[0]
+    if codec not in CODECS:
+        raise ValueError(f"Неизвестный кодек {codec!r}: ожидается один из {', '.join(CODECS)} или 'auto'")
+    return CODECS[codec]()
@@ -0,0 +1,275 @@
+import argparse
+import json
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import requests
+
+from api import Zojnik
+from histogram import LatencyHistogram
+
+
+class Scenario:
+    '''Пользовательский сценарий: последовательность шагов, выбираемая с вероятностью пропорциональной weight.
+
+    Шаг - функция step(client, context), вызывающая методы Zojnik и возвращающая их результат (статус или пару
+    статус/результат). Имя функции используется как имя эндпоинта в отчёте. Функции должны быть определены на
+    уровне модуля, чтобы их можно было передать в дочерние процессы'''
+
+    def __init__(self, name: str, weight: float, steps: list):
+        self.name = name
+        self.weight = weight
+        self.steps = steps
+
+
+# ---- Шаги сценариев по умолчанию ----
+
+def login(client: Zojnik, context: dict):
+    return client.get_access_and_refresh_token_pair(context['username'], context['password'], verbosity='silent')
+
+
+def open_user_profile(client: Zojnik, context: dict):
+    return client.open_user_profile(verbosity='silent')
+
+
+def get_food_categories(client: Zojnik, context: dict):
+    return client.get_food_categories(verbosity='silent')
+
+
+def get_list_of_tags(client: Zojnik, context: dict):
+    return client.get_list_of_tags(verbosity='silent')
+
+
+def get_menu_with_filters(client: Zojnik, context: dict):
+    status, result = client.get_menu_with_filters(context['random'].choice(['Мясо', 'Рыба', 'Овощи']),
+                                                  'Куркума', 'Белковое блюдо', verbosity='silent')
+    if isinstance(result, list) and result:
+        context['dish_ids'] = [dish['id'] for dish in result]
+    return status, result
+
+
+def get_dish_details(client: Zojnik, context: dict):
+    dish_id = context['random'].choice(context.get('dish_ids') or [1])
+    return client.get_dish_details(dish_id, verbosity='silent')
+
+
+def create_plate(client: Zojnik, context: dict):
+    ids = context.get('dish_ids') or [1, 2, 3]
+    choice = context['random'].choice
+    return client.create_plate(choice(ids), choice(ids), choice(ids), verbosity='silent')
+
+
+def get_list_of_plates(client: Zojnik, context: dict):
+    return client.get_list_of_plates(verbosity='silent')
+
+
+DEFAULT_SCENARIOS = [
+    Scenario('new_plate', 1, [login, open_user_profile, get_food_categories, get_menu_with_filters, create_plate]),
+    Scenario('browse_menu', 3, [get_list_of_tags, get_menu_with_filters, get_dish_details, get_dish_details]),
+    Scenario('plate_history', 1, [get_list_of_plates]),
+]
+
+
+class _Stats:
+    """Счётчики одного виртуального пользователя: по ним не бывает конкуренции потоков.
+
+    first_started и last_finished - время (time.time) начала первого и конца последнего запроса, по ним
+    считается пропускная способность без учёта запуска процессов и входа пользователей"""
+
+    def __init__(self):
+        self.histograms = {}
+        self.errors = {}
+        self.requests = {}
+        self.first_started = None
+        self.last_finished = None
+
+    @property
+    def elapsed(self) -> float:
+        if self.first_started is None:
+            return 0.0
+        return self.last_finished - self.first_started
+
+    def record(self, endpoint: str, seconds: float, failed: bool, started_at: float):
+        if self.first_started is None or started_at < self.first_started:
+            self.first_started = started_at
+        if self.last_finished is None or started_at + seconds > self.last_finished:
+            self.last_finished = started_at + seconds
+        histogram = self.histograms.get(endpoint)
+        if histogram is None:
+            histogram = self.histograms[endpoint] = LatencyHistogram()
+        histogram.record(seconds)
+        self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+        if failed:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def merge(self, other: '_Stats'):
+        for endpoint, histogram in other.histograms.items():
+            self.histograms.setdefault(endpoint, LatencyHistogram()).merge(histogram)
+        for endpoint, count in other.requests.items():
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + count
+        for endpoint, count in other.errors.items():
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + count
+        if other.first_started is not None:
+            if self.first_started is None:
+                self.first_started, self.last_finished = other.first_started, other.last_finished
+            else:
+                self.first_started = min(self.first_started, other.first_started)
+                self.last_finished = max(self.last_finished, other.last_finished)
+
+    def to_dict(self) -> dict:
+        return {'histograms': {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+                'requests': self.requests, 'errors': self.errors,
+                'first_started': self.first_started, 'last_finished': self.last_finished}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> '_Stats':
+        stats = cls()
+        stats.histograms = {name: LatencyHistogram.from_dict(histogram)
+                            for name, histogram in data['histograms'].items()}
+        stats.requests, stats.errors = data['requests'], data['errors']
+        stats.first_started, stats.last_finished = data['first_started'], data['last_finished']
+        return stats
+
+
+def _is_failure(result) -> bool:
+    status = result[0] if isinstance(result, tuple) else result
+    return not isinstance(status, int) or status >= 400
+
+
+def _virtual_user(base_url: str, scenarios: list, context: dict, start_at: float, deadline: float,
+                  stats: _Stats):
+    time.sleep(max(start_at - time.time(), 0))
+    weights = [scenario.weight for scenario in scenarios]
+    rnd = context['random']
+    with Zojnik(base_url=base_url, pool_maxsize=1, verbosity='silent') as client:
+        # Первый вход до начала измерений, чтобы у пользователя были токены. Если он не удался,
+        # шаги сценариев получат 401 и будут посчитаны как ошибки
+        try:
+            login(client, context)
+        except requests.RequestException:
+            pass
+        while time.time() < deadline:
+            scenario = rnd.choices(scenarios, weights)[0]
+            for step in scenario.steps:
+                started_at, started = time.time(), time.perf_counter()
+                try:
+                    failed = _is_failure(step(client, context))
+                except Exception:
+                    # Любое исключение шага (сеть, разбор ответа, ошибка в самом сценарии) - неудачный запрос,
+                    # виртуальный пользователь продолжает работу
+                    failed = True
+                stats.record(step.__name__, time.perf_counter() - started, failed, started_at)
+                if time.time() >= deadline:
+                    break
+
+
+def _run_worker(base_url: str, scenarios: list, users: int, first_user: int, total_users: int, username: str,
+                password: str, started: float, duration: float, ramp_up: float, seed: int) -> dict:
+    """Процесс нагрузки: запускает users виртуальных пользователей в потоках и возвращает их статистику"""
+    deadline = started + ramp_up + duration
+    threads, all_stats = [], []
+    for offset in range(users):
+        number = first_user + offset
+        stats = _Stats()
+        context = {'username': username, 'password': password, 'random': random.Random(seed + number)}
+        start_at = started + ramp_up * number / total_users
+        thread = threading.Thread(target=_virtual_user,
+                                  args=(base_url, scenarios, context, start_at, deadline, stats), daemon=True)
+        thread.start()
+        threads.append(thread)
+        all_stats.append(stats)
+    merged = _Stats()
+    for thread, stats in zip(threads, all_stats):
+        thread.join()
+        merged.merge(stats)
+    return merged.to_dict()
+
+
+def run_load(base_url: str, username: str, password: str, scenarios: list = None, users: int = 10,
+             processes: int = 1, duration: float = 10.0, ramp_up: float = 0.0, seed: int = 0) -> dict:
+    '''Запускает нагрузку: users виртуальных пользователей, распределённых по processes процессам.
+    Пользователи стартуют равномерно в течение ramp_up секунд и работают ещё duration секунд.
+
+    Возвращает отчёт: пропускная способность, доля ошибок и перцентили задержек по каждому эндпоинту'''
+    scenarios = scenarios or DEFAULT_SCENARIOS
+    processes = max(min(processes, users), 1)
+    started = time.time() + 0.5  # запас на запуск процессов
+    shares = [users // processes + (1 if index < users % processes else 0) for index in range(processes)]
+    merged = _Stats()
+    with ProcessPoolExecutor(processes) as executor:
+        futures, first_user = [], 0
+        for share in shares:
+            futures.append(executor.submit(_run_worker, base_url, scenarios, share, first_user, users, username,
+                                           password, started, duration, ramp_up, seed))
+            first_user += share
+        for future in futures:
+            merged.merge(_Stats.from_dict(future.result()))
+    # От начала первого запроса до конца последнего: ожидание запуска процессов и первые входы не учитываются
+    return build_report(merged, max(merged.elapsed, 1e-9))
+
+
+def build_report(stats: _Stats, elapsed: float) -> dict:
+    endpoints = {}
+    total = LatencyHistogram()
+    for endpoint in sorted(stats.histograms):
+        histogram = stats.histograms[endpoint]
+        total.merge(histogram)
+        requests_count = stats.requests[endpoint]
+        errors = stats.errors.get(endpoint, 0)
+        endpoints[endpoint] = {'requests': requests_count, 'errors': errors,
+                               'error_rate': round(errors / requests_count, 4),
+                               'rps': round(requests_count / elapsed, 2), **histogram.summary()}
+    total_errors = sum(stats.errors.values())
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'requests': total.count,
+        'rps': round(total.count / elapsed, 2),
+        'error_rate': round(total_errors / total.count, 4) if total.count else 0.0,
+        'latency': total.summary(),
+        'endpoints': endpoints,
+    }
+
+
+def format_report(report: dict) -> str:
+    lines = [f"Запросов: {report['requests']} за {report['elapsed_s']} с, {report['rps']} rps, "
+             f"ошибок {report['error_rate']:.2%}",
+             f"{'эндпоинт':<24}{'запросов':>10}{'rps':>10}{'ошибки':>9}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}"]
+    for endpoint, row in report['endpoints'].items():
+        lines.append(f"{endpoint:<24}{row['requests']:>10}{row['rps']:>10}{row['error_rate']:>9.2%}"
+                     f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}{row['max_ms']:>10}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный прогон сценариев Zojnik')
+    parser.add_argument('--base-url', help='адрес API; без него запускается локальный fake_server')
+    parser.add_argument('--username', default='load@example.com')
+    parser.add_argument('--password', default='Loadpass1')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--ramp-up', type=float, default=0.0)
+    parser.add_argument('--latency', type=float, default=0.0, help='задержка fake_server в секундах')
+    parser.add_argument('--json', action='store_true', help='вывести отчёт в JSON')
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        from fake_server import FakeZojnikServer
+        server = FakeZojnikServer(latency=args.latency).start()
+        server.add_user(args.username, args.password)
+        base_url = server.base_url
+    try:
+        report = run_load(base_url, args.username, args.password, users=args.users, processes=args.processes,
+                          duration=args.duration, ramp_up=args.ramp_up)
+    finally:
+        if server is not None:
+            server.stop()
+    print(json.dumps(report, ensure_ascii=False, indent=2) if args.json else format_report(report))
+
+
+if __name__ == '__main__':
+    main()
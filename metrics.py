@@ -0,0 +1,184 @@
+import json
+import re
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from histogram import LatencyHistogram
+
+_connect_timing = threading.local()
+_ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _connect_timing.seconds = getattr(_connect_timing, 'seconds', 0.0) + time.perf_counter() - started
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    # Для HTTPS время соединения включает TLS-рукопожатие
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _connect_timing.seconds = getattr(_connect_timing, 'seconds', 0.0) + time.perf_counter() - started
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    '''HTTPAdapter, который замеряет время установки новых соединений. Переиспользованное keep-alive
+    соединение даёт нулевое время'''
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': _TimedHTTPConnectionPool,
+                                                   'https': _TimedHTTPSConnectionPool}
+
+
+def reset_connect_time():
+    _connect_timing.seconds = 0.0
+
+
+def connect_time() -> float:
+    """Время установки соединений в текущем потоке с последнего reset_connect_time()"""
+    return getattr(_connect_timing, 'seconds', 0.0)
+
+
+def endpoint_label(method: str, path: str) -> str:
+    """Имя эндпоинта для метрик: без адреса сервера и параметров запроса, id заменены на {id}"""
+    path = re.sub(r'^https?://[^/]+', '', path).split('?', 1)[0]
+    return f'{method} {_ID_SEGMENT.sub("/{id}", path)}'
+
+
+class RequestTiming:
+    '''Замеры одного запроса в секундах. ttfb - время до получения заголовков ответа,
+    total - до получения всего тела, decode - разбор JSON (None, если тело не разбиралось)'''
+
+    FIELDS = ('endpoint', 'status', 'connect', 'ttfb', 'total', 'response_bytes', 'decode', 'error')
+    __slots__ = FIELDS + ('started',)
+
+    def __init__(self, endpoint: str, status: int = None, connect: float = 0.0, ttfb: float = None,
+                 total: float = None, response_bytes: int = 0, decode: float = None, error: str = None,
+                 started: float = None):
+        self.endpoint = endpoint
+        self.status = status
+        self.connect = connect
+        self.ttfb = ttfb
+        self.total = total
+        self.response_bytes = response_bytes
+        self.decode = decode
+        self.error = error
+        self.started = started  # time.perf_counter() в момент отправки
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+
+class _EndpointMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.response_bytes = 0
+        self.statuses = {}
+        self.histograms = {'total': LatencyHistogram(), 'ttfb': LatencyHistogram(), 'connect': LatencyHistogram(),
+                           'decode': LatencyHistogram()}
+
+
+class MetricsRegistry:
+    '''Метрики запросов клиента Zojnik по эндпоинтам: счётчики запросов, ошибок и байт, гистограммы
+    задержек. Экспорт в текстовом формате Prometheus или JSON lines, свои обработчики - через add_sink'''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._sinks = []
+
+    def add_sink(self, callback):
+        """callback(timing: RequestTiming) вызывается после каждого запроса"""
+        self._sinks.append(callback)
+
+    def remove_sink(self, callback):
+        self._sinks.remove(callback)
+
+    def observe(self, timing: RequestTiming):
+        with self._lock:
+            metrics = self._endpoints.get(timing.endpoint)
+            if metrics is None:
+                metrics = self._endpoints[timing.endpoint] = _EndpointMetrics()
+            metrics.requests += 1
+            status = str(timing.status) if timing.status is not None else 'error'
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+            if timing.error or timing.status is None or timing.status >= 400:
+                metrics.errors += 1
+            metrics.response_bytes += timing.response_bytes
+            for name, histogram in metrics.histograms.items():
+                value = getattr(timing, name)
+                if value is not None:
+                    histogram.record(value)
+        for sink in self._sinks:
+            sink(timing)
+
+    def snapshot(self) -> dict:
+        """Текущие значения по эндпоинтам; задержки в миллисекундах"""
+        with self._lock:
+            return {endpoint: {'requests': metrics.requests, 'errors': metrics.errors,
+                               'response_bytes': metrics.response_bytes, 'statuses': dict(metrics.statuses),
+                               **{name: histogram.summary() for name, histogram in metrics.histograms.items()}}
+                    for endpoint, metrics in sorted(self._endpoints.items())}
+
+    def to_json_lines(self) -> str:
+        return ''.join(json.dumps({'endpoint': endpoint, **values}, ensure_ascii=False) + '\n'
+                       for endpoint, values in self.snapshot().items())
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+
+            lines += ['# HELP zojnik_requests_total Количество запросов к API Zojnik',
+                      '# TYPE zojnik_requests_total counter']
+            for endpoint, metrics in endpoints:
+                for status, count in sorted(metrics.statuses.items()):
+                    lines.append(f'zojnik_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+
+            lines += ['# HELP zojnik_request_errors_total Запросы с ошибкой сети или статусом 4xx/5xx',
+                      '# TYPE zojnik_request_errors_total counter']
+            lines += [f'zojnik_request_errors_total{{endpoint="{endpoint}"}} {metrics.errors}'
+                      for endpoint, metrics in endpoints]
+
+            lines += ['# HELP zojnik_response_bytes_total Объём тел ответов в байтах',
+                      '# TYPE zojnik_response_bytes_total counter']
+            lines += [f'zojnik_response_bytes_total{{endpoint="{endpoint}"}} {metrics.response_bytes}'
+                      for endpoint, metrics in endpoints]
+
+            for name, title in (('total', 'Полное время запроса'), ('ttfb', 'Время до первого байта ответа'),
+                                ('connect', 'Время установки соединения'), ('decode', 'Время разбора JSON')):
+                metric = f'zojnik_request_{name}_seconds'
+                lines += [f'# HELP {metric} {title}', f'# TYPE {metric} summary']
+                for endpoint, metrics in endpoints:
+                    histogram = metrics.histograms[name]
+                    for quantile in (0.5, 0.95, 0.99):
+                        lines.append(f'{metric}{{endpoint="{endpoint}",quantile="{quantile}"}} '
+                                     f'{histogram.percentile(quantile * 100):.6f}')
+                    lines.append(f'{metric}_sum{{endpoint="{endpoint}"}} {histogram.total / 1_000_000:.6f}')
+                    lines.append(f'{metric}_count{{endpoint="{endpoint}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
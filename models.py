@@ -0,0 +1,114 @@
+import sys
+
+
+def _interned(value):
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list):
+        return tuple(sys.intern(item) if isinstance(item, str) else item for item in value)
+    return value
+
+
+class Model:
+    '''Компактная запись ответа API со __slots__ вместо словаря.
+
+    FIELDS - поля записи; поля из ответа, которых нет в FIELDS, отбрасываются, а отсутствующие равны None.
+    Строки из INTERNED (категории, теги) интернируются: одинаковые значения у тысяч записей хранятся один раз,
+    а списки из них превращаются в кортежи'''
+
+    __slots__ = ()
+    FIELDS = ()
+    INTERNED = ()
+
+    def __init__(self, **values):
+        for field in self.FIELDS:
+            setattr(self, field, values.get(field))
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Как в dataclasses, from_dict генерируется под поля класса: прямые присваивания слотам
+        # в несколько раз быстрее цикла по setattr, а записей в каталоге десятки тысяч
+        lines = ['def from_dict(cls, data):', '    get = data.get', '    record = new(cls)']
+        for field in cls.FIELDS:
+            value = f'interned(get({field!r}))' if field in cls.INTERNED else f'get({field!r})'
+            lines.append(f'    record.{field} = {value}')
+        lines.append('    return record')
+        namespace = {'new': object.__new__, 'interned': _interned}
+        exec('\n'.join(lines), namespace)
+        from_dict = namespace['from_dict']
+        from_dict.__doc__ = Model.from_dict.__doc__
+        cls.from_dict = classmethod(from_dict)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Model':
+        """Запись из словаря ответа API"""
+        record = cls.__new__(cls)
+        for field in cls.FIELDS:
+            value = data.get(field)
+            setattr(record, field, _interned(value) if field in cls.INTERNED else value)
+        return record
+
+    def as_dict(self) -> dict:
+        """Словарь в формате ответа API"""
+        result = {field: getattr(self, field) for field in self.FIELDS}
+        for field in self.INTERNED:
+            if isinstance(result[field], tuple):
+                result[field] = list(result[field])
+        return result
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.FIELDS)
+
+    def __repr__(self):
+        values = ', '.join(f'{field}={getattr(self, field)!r}' for field in self.FIELDS)
+        return f'{type(self).__name__}({values})'
+
+
+class Dish(Model):
+    """Блюдо: поля create_dish, id и теги"""
+    FIELDS = ('id', 'name', 'calories', 'protein', 'fat', 'carbohydrates', 'allergen', 'other', 'price', 'rating',
+              'avatar', 'category', 'tags', 'antitags')
+    INTERNED = ('category', 'tags', 'antitags')
+    __slots__ = FIELDS
+
+
+class Plate(Model):
+    """Тарелка: три компонента create_plate и рассчитанные сервером КБЖУ, цена и рейтинг"""
+    FIELDS = ('id', 'proteinproduct', 'garnishproduct', 'vegetableproduct', 'calories', 'protein', 'fat',
+              'carbohydrates', 'price', 'rating')
+    __slots__ = FIELDS
+
+
+class Category(Model):
+    FIELDS = ('id', 'name', 'title')
+    INTERNED = ('name', 'title')
+    __slots__ = FIELDS
+
+
+class Tag(Model):
+    FIELDS = ('id', 'name')
+    INTERNED = ('name',)
+    __slots__ = FIELDS
+
+
+class Antitag(Tag):
+    __slots__ = ()
+
+
+class User(Model):
+    """Профиль пользователя: поля change_user_profile и id"""
+    FIELDS = ('id', 'first_name', 'last_name', 'username', 'phone_number', 'email', 'profile')
+    __slots__ = FIELDS
+
+
+def to_models(result, model: type):
+    '''Переводит результат метода Zojnik в модели: список словарей - в список моделей, словарь - в одну модель.
+    Остальное (например, текст ошибки) возвращается как есть. Предназначена для успешных ответов: словарь
+    с ошибкой тоже превратится в модель с пустыми полями'''
+    if isinstance(result, list):
+        return [model.from_dict(item) if isinstance(item, dict) else item for item in result]
+    if isinstance(result, dict):
+        return model.from_dict(result)
+    return result
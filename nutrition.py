@@ -0,0 +1,121 @@
+import argparse
+import json
+
+import numpy as np
+
+from api import Zojnik
+
+# Поля тарелки, которые сервер считает как сумму трёх компонентов; rating - их среднее
+NUTRIENTS = ('calories', 'protein', 'fat', 'carbohydrates', 'price')
+PLATE_FIELDS = NUTRIENTS + ('rating',)
+COMPONENTS = ('proteinproduct', 'garnishproduct', 'vegetableproduct')
+
+
+def _number(value) -> float:
+    return float(value) if value is not None else np.nan
+
+
+class DishTable:
+    '''Каталог блюд в виде массивов NumPy: отсортированные id и по столбцу на каждое поле из NUTRIENTS и rating.
+    Отсутствующие значения хранятся как NaN'''
+
+    def __init__(self, ids: np.ndarray, values: np.ndarray):
+        order = np.argsort(ids, kind='stable')
+        self.ids = ids[order]
+        self.values = values[order]  # shape (n, len(PLATE_FIELDS))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_dishes(cls, dishes) -> 'DishTable':
+        """Строит таблицу из словарей блюд в формате API (список или генератор)"""
+        ids, rows = [], []
+        for dish in dishes:
+            ids.append(dish['id'])
+            rows.append([_number(dish.get(field)) for field in PLATE_FIELDS])
+        values = np.array(rows, dtype=np.float64).reshape(len(rows), len(PLATE_FIELDS))
+        return cls(np.array(ids, dtype=np.int64), values)
+
+    @classmethod
+    def from_client(cls, client: Zojnik, page_size: int = 500) -> 'DishTable':
+        """Загружает весь каталог через client.iter_dishes"""
+        return cls.from_dishes(client.iter_dishes(page_size=page_size))
+
+    def positions(self, dish_ids) -> np.ndarray:
+        """Строки таблицы для переданных id; -1 для неизвестных блюд"""
+        dish_ids = np.asarray(dish_ids, dtype=np.int64)
+        if not len(self.ids):
+            return np.full(dish_ids.shape, -1, dtype=np.int64)
+        found = np.minimum(np.searchsorted(self.ids, dish_ids), len(self.ids) - 1)
+        return np.where(self.ids[found] == dish_ids, found, -1)
+
+    def column(self, field: str) -> np.ndarray:
+        return self.values[:, PLATE_FIELDS.index(field)]
+
+
+def plate_totals(table: DishTable, triples) -> tuple:
+    '''Считает тарелки для массива троек (proteinproduct, garnishproduct, vegetableproduct) формы (m, 3)
+    одним векторным проходом.
+
+    Возвращает массив формы (m, len(PLATE_FIELDS)) - суммы NUTRIENTS и средний rating - и маску тарелок,
+    у которых все три блюда найдены в каталоге. Для остальных значения NaN'''
+    triples = np.asarray(triples, dtype=np.int64).reshape(-1, 3)
+    positions = table.positions(triples)
+    known = (positions >= 0).all(axis=1)
+    components = table.values[np.where(positions >= 0, positions, 0)]  # shape (m, 3, fields)
+    totals = components.sum(axis=1)
+    totals[:, PLATE_FIELDS.index('rating')] /= 3
+    totals[~known] = np.nan
+    return totals, known
+
+
+def verify_plates(table: DishTable, plates, tolerance: float = 0.01) -> dict:
+    '''Сравнивает КБЖУ, цену и рейтинг тарелок сервера с расчётом по каталогу table.
+
+    plates - словари тарелок в формате API (список или генератор, например client.iter_plates()).
+    Значения считаются совпадающими, если отличаются не больше чем на tolerance. Возвращает отчёт:
+    сколько тарелок проверено, расхождения по полям и id тарелок с блюдами, которых нет в каталоге'''
+    plate_ids, triples, server = [], [], []
+    for plate in plates:
+        plate_ids.append(plate['id'])
+        triples.append([plate[component] for component in COMPONENTS])
+        server.append([_number(plate.get(field)) for field in PLATE_FIELDS])
+    server = np.array(server, dtype=np.float64).reshape(len(server), len(PLATE_FIELDS))
+    expected, known = plate_totals(table, triples)
+
+    # NaN с обеих сторон (поле не заполнено ни у сервера, ни в каталоге) расхождением не считается
+    matches = np.isclose(server, expected, rtol=0, atol=tolerance, equal_nan=True)
+    mismatched = ~matches & known[:, np.newaxis]
+    mismatches = [{'plate': plate_ids[row], 'field': PLATE_FIELDS[column],
+                   'server': None if np.isnan(server[row, column]) else float(server[row, column]),
+                   'expected': None if np.isnan(expected[row, column]) else round(float(expected[row, column]), 4)}
+                  for row, column in zip(*np.nonzero(mismatched))]
+    return {
+        'checked': int(known.sum()),
+        'mismatched_plates': int(mismatched.any(axis=1).sum()),
+        'mismatches': mismatches,
+        'unknown_dishes': [plate_ids[row] for row in np.flatnonzero(~known)],
+    }
+
+
+def verify_server_plates(client: Zojnik, tolerance: float = 0.01, page_size: int = 500) -> dict:
+    """Загружает каталог и все тарелки пользователя с сервера и сверяет их"""
+    table = DishTable.from_client(client, page_size)
+    return verify_plates(table, client.iter_plates(page_size=page_size), tolerance)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сверка КБЖУ и цен тарелок сервера с расчётом по каталогу блюд')
+    parser.add_argument('--base-url', help='адрес API, по умолчанию ZOJNIK_BASE_URL или dev-сервер')
+    parser.add_argument('--tolerance', type=float, default=0.01)
+    args = parser.parse_args()
+
+    with Zojnik(base_url=args.base_url, verbosity='silent') as client:
+        report = verify_server_plates(client, args.tolerance)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    raise SystemExit(1 if report['mismatches'] else 0)
+
+
+if __name__ == '__main__':
+    main()
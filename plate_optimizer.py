@@ -0,0 +1,258 @@
+import argparse
+import heapq
+import json
+
+import numpy as np
+
+from api import Zojnik
+from nutrition import COMPONENTS, NUTRIENTS, PLATE_FIELDS, DishTable
+
+# Категория блюд для каждого компонента тарелки, в порядке аргументов create_plate
+CATEGORIES = dict(zip(COMPONENTS, ('PROTEIN_PRODUCTS', 'GARNISH_PRODUCTS', 'VEGETABLE_PRODUCTS')))
+MACROS = ('calories', 'protein', 'fat', 'carbohydrates')
+PAIR_CHUNK = 1 << 16      # пар белок x гарнир за один векторный проход
+EXPAND_LIMIT = 1 << 20    # троек, разворачиваемых за один проход
+_COLUMNS = {field: PLATE_FIELDS.index(field) for field in PLATE_FIELDS}
+
+
+def _bounds(value) -> tuple:
+    """(min, max) из пары, где любую границу можно опустить через None"""
+    if value is None:
+        return -np.inf, np.inf
+    low, high = value
+    return (-np.inf if low is None else float(low)), (np.inf if high is None else float(high))
+
+
+class _Category:
+    """Блюда одной категории: DishTable и множества тегов и антитегов в порядке строк таблицы"""
+
+    def __init__(self, dishes: list):
+        self.table = DishTable.from_dishes(dishes)
+        by_id = {dish['id']: dish for dish in dishes}
+        self.tags = [frozenset(by_id[dish_id].get('tags') or ()) for dish_id in self.table.ids.tolist()]
+        self.antitags = [frozenset(by_id[dish_id].get('antitags') or ()) for dish_id in self.table.ids.tolist()]
+
+
+class PlateOptimizer:
+    '''Подбор тарелок (белковое блюдо, гарнир, овощи) под диапазоны КБЖУ, цену и теги без запросов к серверу.
+
+    Каталог делится по категориям и хранится в nutrition.DishTable. search перебирает всё произведение
+    категорий векторно: сначала отбрасывает блюда и пары белок x гарнир, которые не укладываются в диапазоны
+    ни с каким третьим блюдом, затем для каждой пары бинарным поиском находит подходящие овощи по самому
+    узкому ограничению, а лучшие k тарелок держит в куче размера k. Тарелка считается как на сервере: суммы
+    КБЖУ и цены, средний рейтинг'''
+
+    def __init__(self, dishes):
+        dishes = list(dishes)
+        # Сколько пар и троек проверил последний search: по ним видно, насколько сработали отсечки
+        self.last_stats = {'pairs': 0, 'triples': 0}
+        self.categories = {component: _Category([dish for dish in dishes if dish.get('category') == category])
+                           for component, category in CATEGORIES.items()}
+
+    @classmethod
+    def from_client(cls, client: Zojnik, page_size: int = 500) -> 'PlateOptimizer':
+        """Загружает весь каталог через client.iter_dishes"""
+        return cls(client.iter_dishes(page_size=page_size))
+
+    def search(self, *, calories=None, protein=None, fat=None, carbohydrates=None, max_price: float = None,
+               tags=(), antitags=(), k: int = 10, price_weight: float = 0.5) -> list:
+        '''Лучшие k тарелок по возрастанию score.
+
+        calories, protein, fat, carbohydrates - диапазоны (min, max) для суммы по тарелке, границу можно
+        опустить через None; max_price - предельная цена тарелки; tags - теги, каждый из которых должен быть
+        хотя бы у одного блюда тарелки; antitags - ни у одного блюда тарелки их быть не должно.
+
+        score - средний квадрат отклонения от середины диапазона (в долях полуширины, 0..1 внутри диапазона)
+        по нутриентам, у которых заданы обе границы, плюс price_weight * цена / max_price. Каждая тарелка -
+        словарь с id трёх блюд (ключи как у create_plate в API), КБЖУ, ценой, рейтингом и score'''
+        stats = self.last_stats = {'pairs': 0, 'triples': 0}
+        limits = np.array([_bounds(value) for value in (calories, protein, fat, carbohydrates)] +
+                          [_bounds((None, max_price))])
+        columns = [_COLUMNS[field] for field in NUTRIENTS]
+        required, forbidden = frozenset(tags), frozenset(antitags)
+        tag_bits = {tag: 1 << bit for bit, tag in enumerate(sorted(required))}
+        required_mask = (1 << len(tag_bits)) - 1
+
+        # Блюда с запрещёнными антитегами и без нужных значений исключаются сразу
+        parts = []
+        for component in COMPONENTS:
+            category = self.categories[component]
+            keep = np.array([not (antitags_ & forbidden) for antitags_ in category.antitags], dtype=bool)
+            keep &= ~np.isnan(category.table.values[:, columns]).any(axis=1)
+            rows = np.flatnonzero(keep)
+            masks = np.array([sum(tag_bits[tag] for tag in category.tags[row] & required) for row in rows],
+                             dtype=np.int64)
+            parts.append((category.table.ids[rows], category.table.values[rows], masks))
+        if any(not len(ids) for ids, _, _ in parts):
+            return []
+
+        # Отсечка отдельных блюд: блюдо не подходит, если даже с самыми удобными двумя другими выходит за границы
+        lows = [values[:, columns].min(axis=0) for _, values, _ in parts]
+        highs = [values[:, columns].max(axis=0) for _, values, _ in parts]
+        for index, (ids, values, masks) in enumerate(parts):
+            others_low = sum(lows[other] for other in range(3) if other != index)
+            others_high = sum(highs[other] for other in range(3) if other != index)
+            selected = values[:, columns]
+            keep = ((selected + others_low <= limits[:, 1]) & (selected + others_high >= limits[:, 0])).all(axis=1)
+            parts[index] = (ids[keep], values[keep], masks[keep])
+            if not keep.any():
+                return []
+
+        (protein_ids, protein_values, protein_masks), (garnish_ids, garnish_values, garnish_masks), \
+            (vegetable_ids, vegetable_values, vegetable_masks) = parts
+
+        # Окно подходящих овощей ищется бинарным поиском по самому избирательному ограничению: с наименьшей
+        # шириной диапазона относительно разброса этого нутриента у овощей. Остальные проверяются по столбцу
+        # в том же порядке, так что до следующих проверок доходит всё меньше троек
+        vegetable_columns = vegetable_values[:, columns]
+        vegetable_low, vegetable_high = vegetable_columns.min(axis=0), vegetable_columns.max(axis=0)
+        spans = limits[:, 1] - limits[:, 0]
+        selectivity = spans / np.maximum(vegetable_high - vegetable_low, 1e-9)
+        key = int(np.argmin(selectivity))
+        order = np.argsort(vegetable_columns[:, key], kind='stable')
+        vegetable_ids, vegetable_masks = vegetable_ids[order], vegetable_masks[order]
+        vegetable_columns = np.ascontiguousarray(vegetable_columns[order].T)
+        vegetable_key = vegetable_columns[key]
+        vegetable_tags = int(np.bitwise_or.reduce(vegetable_masks))
+        checks = [int(column) for column in np.argsort(selectivity, kind='stable')
+                  if column != key and np.isfinite(limits[column]).any()] + [key]
+
+        finite = np.isfinite(spans)
+        middle = np.zeros(len(spans))
+        middle[finite] = limits[finite].sum(axis=1) / 2
+        half = np.full(len(spans), np.inf)
+        half[finite & (spans > 0)] = spans[finite & (spans > 0)] / 2
+        two_sided = int(finite[:len(MACROS)].sum())
+        price_scale = price_weight / max_price if max_price else 0.0
+
+        heap = []  # (-score, (белок, гарнир, овощи)) - худшая из лучших k на вершине
+
+        def consider(chunk, rows, vegetables):
+            pairs, pair_protein, pair_garnish, pair_masks = chunk
+            for column in checks:
+                value = pairs[rows, column] + vegetable_columns[column, vegetables]
+                feasible = (value >= limits[column, 0]) & (value <= limits[column, 1])
+                rows, vegetables = rows[feasible], vegetables[feasible]
+            if required_mask:
+                feasible = (pair_masks[rows] | vegetable_masks[vegetables]) == required_mask
+                rows, vegetables = rows[feasible], vegetables[feasible]
+            if not len(rows):
+                return
+            totals = pairs[rows] + vegetable_columns[:, vegetables].T
+            scores = totals[:, len(MACROS)] * price_scale
+            if two_sided:
+                scores = scores + (((totals[:, :len(MACROS)] - middle[:len(MACROS)]) / half[:len(MACROS)]) ** 2
+                                   ).sum(axis=1) / two_sided
+            candidates = np.flatnonzero(scores < -heap[0][0]) if len(heap) >= k else np.arange(len(scores))
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(scores[candidates], k - 1)[:k]]
+            for index in candidates.tolist():
+                entry = (-float(scores[index]), (int(pair_protein[rows[index]]), int(pair_garnish[rows[index]]),
+                                                 int(vegetables[index])))
+                if len(heap) < k:
+                    heapq.heappush(heap, entry)
+                elif entry[0] > heap[0][0]:
+                    heapq.heapreplace(heap, entry)
+
+        def lower_bound(pairs):
+            """Оценка снизу для score любой тарелки с парой: каждый нутриент берётся как можно ближе к середине
+            диапазона, цена - с самыми дешёвыми овощами"""
+            bound = (pairs[:, len(MACROS)] + vegetable_low[len(MACROS)]) * price_scale
+            if two_sided:
+                best = pairs + np.clip(middle - pairs, vegetable_low, vegetable_high)
+                bound = bound + (((best[:, :len(MACROS)] - middle[:len(MACROS)]) / half[:len(MACROS)]) ** 2
+                                 ).sum(axis=1) / two_sided
+            return bound
+
+        def expand(chunk, rows, bounds):
+            """Развёртывает пары в тройки с овощами из окна [нижняя граница - пара, верхняя граница - пара].
+            Пары упорядочены по оценке снизу; те, что уже не могут попасть в лучшие k, пропускаются"""
+            if len(heap) >= k:
+                rows = rows[bounds < -heap[0][0]]
+                bounds = bounds[:len(rows)]
+            if not len(rows):
+                return
+            pair_key = chunk[0][rows, key]
+            starts = np.searchsorted(vegetable_key, limits[key, 0] - pair_key, side='left')
+            ends = np.searchsorted(vegetable_key, limits[key, 1] - pair_key, side='right')
+            counts = ends - starts
+            total = int(counts.sum())
+            if not total:
+                return
+            if total > EXPAND_LIMIT and len(rows) > 1:
+                half_rows = len(rows) // 2
+                expand(chunk, rows[:half_rows], bounds[:half_rows])
+                expand(chunk, rows[half_rows:], bounds[half_rows:])
+                return
+            stats['triples'] += total
+            pair_index = np.repeat(np.arange(len(rows)), counts)
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            consider(chunk, rows[pair_index], starts[pair_index] + offsets)
+
+        garnish_count = len(garnish_ids)
+        rows_per_chunk = max(1, PAIR_CHUNK // garnish_count)
+        for first in range(0, len(protein_ids), rows_per_chunk):
+            pair_protein = np.repeat(np.arange(first, min(first + rows_per_chunk, len(protein_ids))), garnish_count)
+            pair_garnish = np.tile(np.arange(garnish_count), len(pair_protein) // garnish_count)
+            pairs = (protein_values[pair_protein] + garnish_values[pair_garnish])[:, columns]
+            pair_masks = protein_masks[pair_protein] | garnish_masks[pair_garnish]
+            # Пара отбрасывается, если никакие овощи не вернут её в диапазоны
+            keep = ((pairs + vegetable_low <= limits[:, 1]) & (pairs + vegetable_high >= limits[:, 0])).all(axis=1)
+            if required_mask:
+                keep &= (pair_masks | vegetable_tags) == required_mask
+            rows = np.flatnonzero(keep)
+            stats['pairs'] += len(rows)
+            bounds = lower_bound(pairs[rows])
+            order_by_bound = np.argsort(bounds, kind='stable')
+            expand((pairs, pair_protein, pair_garnish, pair_masks), rows[order_by_bound], bounds[order_by_bound])
+
+        plates = []
+        for negative_score, (protein_row, garnish_row, vegetable_row) in sorted(heap, reverse=True):
+            totals = protein_values[protein_row] + garnish_values[garnish_row] + \
+                vegetable_values[order[vegetable_row]]
+            plate = {'proteinproduct': int(protein_ids[protein_row]), 'garnishproduct': int(garnish_ids[garnish_row]),
+                     'vegetableproduct': int(vegetable_ids[vegetable_row])}
+            plate.update({field: round(float(totals[_COLUMNS[field]]), 4) for field in NUTRIENTS})
+            plate['rating'] = round(float(totals[_COLUMNS['rating']]) / 3, 4)
+            plate['score'] = round(-negative_score, 6)
+            plates.append(plate)
+        return plates
+
+
+def create_plate(client: Zojnik, plate: dict, **kwargs) -> tuple:
+    """Создаёт на сервере тарелку из результата PlateOptimizer.search; kwargs передаются в client.create_plate"""
+    return client.create_plate(*(plate[component] for component in COMPONENTS), **kwargs)
+
+
+def _range(text: str) -> tuple:
+    """'400:700', ':700' или '400:' -> (min, max)"""
+    low, _, high = text.partition(':')
+    return (float(low) if low else None), (float(high) if high else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Подбор тарелок под КБЖУ, цену и теги по каталогу блюд')
+    parser.add_argument('--base-url', help='адрес API, по умолчанию ZOJNIK_BASE_URL или dev-сервер')
+    for field in MACROS:
+        parser.add_argument('--' + field, type=_range, metavar='MIN:MAX')
+    parser.add_argument('--max-price', type=float)
+    parser.add_argument('--tag', action='append', default=[], help='тег, который должен быть в тарелке')
+    parser.add_argument('--antitag', action='append', default=[], help='антитег, которого не должно быть')
+    parser.add_argument('-k', type=int, default=10, help='сколько тарелок показать')
+    parser.add_argument('--create', action='store_true', help='создать на сервере лучшую тарелку')
+    args = parser.parse_args()
+
+    with Zojnik(base_url=args.base_url, verbosity='silent') as client:
+        optimizer = PlateOptimizer.from_client(client)
+        plates = optimizer.search(calories=args.calories, protein=args.protein, fat=args.fat,
+                                  carbohydrates=args.carbohydrates, max_price=args.max_price, tags=args.tag,
+                                  antitags=args.antitag, k=args.k)
+        report = {'plates': plates}
+        if args.create and plates:
+            report['created'] = create_plate(client, plates[0])[1]
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    raise SystemExit(0 if plates else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+import logging
+import sys
+
+
+class Renderer:
+    '''Вывод ответа API. enabled=False означает, что клиент вообще не вызывает render и не тратит время
+    на форматирование'''
+
+    enabled = True
+
+    def render(self, status: int, result, method: str = None, path: str = None):
+        raise NotImplementedError
+
+
+class SilentRenderer(Renderer):
+    '''Ничего не выводит'''
+
+    enabled = False
+
+    def render(self, status: int, result, method: str = None, path: str = None):
+        pass
+
+
+class FullRenderer(Renderer):
+    '''Печатает статус и каждую пару ключ-значение ответа, как раньше делал каждый метод Zojnik.
+
+    max_items - сколько элементов списка вывести, max_bytes - сколько байт текста вывести в сумме.
+    None снимает ограничение'''
+
+    def __init__(self, max_items: int = 50, max_bytes: int = 64 * 1024, stream=None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.stream = stream
+
+    def _lines(self, result):
+        if isinstance(result, list):
+            for index, item in enumerate(result):
+                if self.max_items is not None and index >= self.max_items:
+                    yield f'... ещё {len(result) - index} элементов'
+                    return
+                if isinstance(item, dict):
+                    for key, value in item.items():
+                        yield f'{key}: {value}'
+                    yield ''
+                else:
+                    yield str(item)
+        elif isinstance(result, dict):
+            for key, value in result.items():
+                yield f'{key}: {value}'
+        else:
+            yield str(result)
+
+    def render(self, status: int, result, method: str = None, path: str = None):
+        stream = self.stream or sys.stdout
+        stream.write(f'\nStatus Code: {status}\n\nResponse:\n')
+        budget = self.max_bytes
+        for line in self._lines(result):
+            if budget is not None:
+                budget -= len(line.encode('utf-8')) + 1
+                if budget < 0:
+                    stream.write(f'... вывод обрезан до {self.max_bytes} байт\n')
+                    break
+            stream.write(line + '\n')
+
+
+class SummaryRenderer(Renderer):
+    '''Печатает одну строку: статус, запрос и размер ответа'''
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def render(self, status: int, result, method: str = None, path: str = None):
+        stream = self.stream or sys.stdout
+        request = f'{method} {path} ' if method else ''
+        stream.write(f'\n{request}Status Code: {status}, Response: {describe(result)}\n')
+
+
+class LogRenderer(Renderer):
+    '''Пишет ответ в logging со структурированными полями в extra['zojnik']'''
+
+    def __init__(self, logger: logging.Logger = None, level: int = logging.INFO):
+        self.logger = logger or logging.getLogger('zojnik')
+        self.level = level
+
+    def render(self, status: int, result, method: str = None, path: str = None):
+        if not self.logger.isEnabledFor(self.level):
+            return
+        fields = {'method': method, 'path': path, 'status': status, 'response': describe(result)}
+        if isinstance(result, list):
+            fields['items'] = len(result)
+        self.logger.log(self.level, '%s %s -> %s (%s)', method, path, status, fields['response'],
+                        extra={'zojnik': fields})
+
+
+def describe(result) -> str:
+    """Короткое описание ответа без форматирования всего содержимого"""
+    if isinstance(result, list):
+        return f'список из {len(result)} элементов'
+    if isinstance(result, dict):
+        keys = list(result)
+        suffix = ', ...' if len(keys) > 10 else ''
+        return 'объект {' + ', '.join(map(str, keys[:10])) + suffix + '}'
+    text = str(result)
+    return text if len(text) <= 200 else text[:200] + '...'
+
+
+# Общие экземпляры: рендереры не хранят состояния между вызовами, поток вывода берётся в момент вывода
+RENDERERS = {
+    'silent': SilentRenderer(),
+    'summary': SummaryRenderer(),
+    'full': FullRenderer(),
+    'log': LogRenderer(),
+}
+
+
+def get_renderer(verbosity) -> Renderer:
+    """Возвращает рендерер по имени ('silent', 'summary', 'full', 'log') или сам переданный Renderer"""
+    if isinstance(verbosity, Renderer):
+        return verbosity
+    try:
+        return RENDERERS[verbosity]
+    except KeyError:
+        raise ValueError(f"Неизвестный режим вывода {verbosity!r}, ожидается один из: {', '.join(RENDERERS)}")
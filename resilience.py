@@ -0,0 +1,257 @@
+import email.utils
+import random
+import threading
+import time
+
+import requests
+
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+# 500 тоже повторяется: для идемпотентных методов повтор безопасен, а у бэкенда 500 бывает и временным
+# (перезапуск воркера, потеря соединения с БД). Изменяющие запросы после 500 не повторяются: сервер мог их выполнить
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(RuntimeError):
+    """Запрос не отправлен: цепь эндпоинта разомкнута после серии ошибок сервера"""
+
+    def __init__(self, endpoint: str, retry_in: float):
+        super().__init__(f'Эндпоинт {endpoint} временно недоступен, следующая попытка через {retry_in:.1f} с')
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+def parse_retry_after(value: str, now: float = None) -> float:
+    """Переводит заголовок Retry-After (секунды или HTTP-дата) в секунды ожидания; None, если заголовка нет
+    или он не разбирается"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        moment = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(moment.timestamp() - (time.time() if now is None else now), 0.0)
+
+
+class RetryPolicy:
+    '''Повтор запросов с экспоненциальной задержкой и полным джиттером: перед попыткой n ожидание выбирается
+    случайно из [0, min(max_backoff, backoff * 2 ** n)].
+
+    attempts - всего попыток, включая первую,
+    statuses - статусы, после которых запрос повторяется. 429 повторяется для любого метода (сервер запрос
+    не выполнял), остальные статусы и сетевые ошибки - только для идемпотентных methods,
+    max_retry_after - если сервер в Retry-After просит ждать дольше, ответ отдаётся вызывающему без повтора'''
+
+    def __init__(self, attempts: int = 3, backoff: float = 0.1, max_backoff: float = 10.0,
+                 max_retry_after: float = 60.0, statuses=RETRY_STATUSES, methods=IDEMPOTENT_METHODS,
+                 seed: int = None):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.statuses = frozenset(statuses)
+        self.methods = frozenset(methods)
+        self._random = random.Random(seed)
+
+    def should_retry(self, method: str, response: requests.Response = None, error: Exception = None) -> bool:
+        if error is not None:
+            return isinstance(error, (requests.ConnectionError, requests.Timeout)) and method in self.methods
+        status = response.status_code
+        return status in self.statuses and (status == 429 or method in self.methods)
+
+    def delay(self, attempt: int, response: requests.Response = None) -> float:
+        """Сколько ждать перед попыткой attempt (с 1). None - не повторять"""
+        retry_after = parse_retry_after(response.headers.get('Retry-After')) if response is not None else None
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_retry_after else None
+        return self._random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+
+class AIMDLimiter:
+    '''Адаптивное ограничение числа одновременных запросов (additive increase, multiplicative decrease).
+
+    Каждый успешный ответ увеличивает limit на increase / limit (примерно +increase за «окно» из limit
+    запросов), а ошибка, 429 или ответ дольше latency_target умножает limit на decrease. Снижение происходит
+    не чаще раза на поколение запросов: ответы на запросы, отправленные до последнего снижения, его не повторяют'''
+
+    def __init__(self, initial: int = 10, minimum: int = 1, maximum: int = 100, increase: float = 1.0,
+                 decrease: float = 0.5, latency_target: float = None):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.decreases = 0
+        self._in_flight = 0
+        self._cut_at = float('-inf')
+        self._condition = threading.Condition()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self) -> float:
+        """Ждёт свободного места и возвращает момент начала запроса для release"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._in_flight < max(int(self.limit), self.minimum))
+            self._in_flight += 1
+        return time.monotonic()
+
+    def release(self, started: float, ok: bool):
+        now = time.monotonic()
+        congested = not ok or (self.latency_target is not None and now - started > self.latency_target)
+        with self._condition:
+            self._in_flight -= 1
+            if not congested:
+                self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+            elif started >= self._cut_at:
+                self.limit = max(self.minimum, self.limit * self.decrease)
+                self._cut_at = now
+                self.decreases += 1
+            self._condition.notify_all()
+
+
+class _Circuit:
+    __slots__ = ('state', 'failures', 'opened_at', 'trial')
+
+    def __init__(self):
+        self.state = CircuitBreaker.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial = False
+
+
+class CircuitBreaker:
+    '''Размыкатель цепи по эндпоинтам: после failure_threshold ошибок подряд (5xx или сетевая ошибка) запросы
+    к эндпоинту recovery_time секунд не отправляются, а сразу завершаются CircuitOpenError. Затем пропускается
+    один пробный запрос: успех замыкает цепь, ошибка снова размыкает'''
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, recovery_time: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def before(self, endpoint: str):
+        """Проверяет, можно ли отправить запрос к endpoint; если нет - вызывает CircuitOpenError"""
+        with self._lock:
+            circuit = self._circuits.get(endpoint)
+            if circuit is None or circuit.state == self.CLOSED:
+                return
+            retry_in = circuit.opened_at + self.recovery_time - time.monotonic()
+            if circuit.state == self.OPEN and retry_in <= 0:
+                circuit.state = self.HALF_OPEN
+            if circuit.state == self.HALF_OPEN and not circuit.trial:
+                circuit.trial = True
+                return
+        raise CircuitOpenError(endpoint, max(retry_in, 0.0))
+
+    def record(self, endpoint: str, ok: bool):
+        with self._lock:
+            circuit = self._circuits.setdefault(endpoint, _Circuit())
+            circuit.trial = False
+            if ok:
+                circuit.state, circuit.failures = self.CLOSED, 0
+                return
+            circuit.failures += 1
+            if circuit.state == self.HALF_OPEN or circuit.failures >= self.failure_threshold:
+                circuit.state, circuit.opened_at = self.OPEN, time.monotonic()
+
+    def state(self, endpoint: str) -> str:
+        circuit = self._circuits.get(endpoint)
+        return circuit.state if circuit is not None else self.CLOSED
+
+    def states(self) -> dict:
+        with self._lock:
+            return {endpoint: circuit.state for endpoint, circuit in self._circuits.items()}
+
+
+class Resilience:
+    '''Слой устойчивости под всеми запросами Zojnik: Zojnik(resilience=Resilience()).
+
+    retry - RetryPolicy (None - без повторов), limiter - AIMDLimiter (None - без ограничения),
+    breaker - CircuitBreaker (None - без размыкания). stats() показывает счётчики и текущее состояние'''
+
+    def __init__(self, retry: RetryPolicy = None, limiter: AIMDLimiter = None, breaker: CircuitBreaker = None,
+                 sleep=time.sleep):
+        self.retry = retry
+        self.limiter = limiter
+        self.breaker = breaker
+        self._sleep = sleep
+        self._stats = {'requests': 0, 'attempts': 0, 'retries': 0, 'retry_after_waits': 0, 'short_circuited': 0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default(cls) -> 'Resilience':
+        return cls(RetryPolicy(), AIMDLimiter(), CircuitBreaker())
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        if self.limiter is not None:
+            stats['limit'] = round(self.limiter.limit, 2)
+            stats['in_flight'] = self.limiter.in_flight
+        if self.breaker is not None:
+            stats['circuits'] = self.breaker.states()
+        return stats
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def send(self, endpoint: str, method: str, send, discard=None) -> requests.Response:
+        """Выполняет send() с повторами, ограничением и размыканием. discard(response) вызывается для ответов,
+        которые заменяются повтором"""
+        self._count('requests')
+        attempts = self.retry.attempts if self.retry is not None else 1
+        attempt = 0
+        while True:
+            if self.breaker is not None:
+                try:
+                    self.breaker.before(endpoint)
+                except CircuitOpenError:
+                    if attempt == 0:
+                        self._count('short_circuited')
+                        raise
+                    break  # цепь разомкнулась между попытками: отдаётся последний ответ
+            if attempt:
+                if discard is not None and response is not None:
+                    discard(response)
+                self._count('retries')
+            response, error = self._attempt(endpoint, send)
+            attempt += 1
+            if attempt >= attempts or not self.retry.should_retry(method, response, error):
+                break
+            delay = self.retry.delay(attempt, response)
+            if delay is None:
+                break
+            if response is not None and 'Retry-After' in response.headers:
+                self._count('retry_after_waits')
+            self._sleep(delay)
+
+        if error is not None:
+            raise error
+        return response
+
+    def _attempt(self, endpoint: str, send):
+        self._count('attempts')
+        started = self.limiter.acquire() if self.limiter is not None else None
+        response = error = None
+        try:
+            response = send()
+        except requests.RequestException as exception:
+            error = exception
+        finally:
+            # Без ответа (в том числе при исключении не из requests) попытка считается ошибкой
+            healthy = response is not None and response.status_code < 500
+            if self.limiter is not None:
+                self.limiter.release(started, healthy and response.status_code != 429)
+            if self.breaker is not None:
+                self.breaker.record(endpoint, healthy)
+        return response, error
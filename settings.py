@@ -1,7 +1,10 @@
 import os
-from dotenv import load_dotenv
+from credentials import CredentialStore
 
-load_dotenv()
+# Значения из .env читаются один раз через общее хранилище и не перезаписывают уже заданные переменные окружения
+credentials = CredentialStore.default()
+if credentials is not None:
+    credentials.export_to_environ()
 
 admin_username = os.getenv('admin_username')
 admin_password = os.getenv('admin_password')
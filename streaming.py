@@ -0,0 +1,115 @@
+import codecs
+import json
+
+_WHITESPACE = ' \t\r\n'
+_decoder = json.JSONDecoder()
+
+
+class _ItemParser:
+    """Разбор JSON по кускам байтов: feed возвращает элементы, которые стали готовы после очередного куска,
+    close - оставшиеся. Общая часть iter_json_items и aiter_json_items"""
+
+    def __init__(self, envelope: dict = None, loads=json.loads):
+        self.envelope = envelope
+        self.loads = loads
+        self.done = False
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._position = 0
+        self._array = None
+        self._page_parts = []
+
+    def feed(self, chunk: bytes) -> list:
+        return self._add(self._text.decode(chunk), finished=False)
+
+    def close(self) -> list:
+        return self._add(self._text.decode(b'', final=True), finished=True)
+
+    def _add(self, text: str, finished: bool) -> list:
+        if self._array is False:
+            # Страница копится кусками и склеивается один раз
+            self._page_parts.append(text)
+        else:
+            self._buffer += text
+        return self._parse(finished)
+
+    def _parse(self, finished: bool) -> list:
+        if self.done:
+            return []
+        if self._array is None:
+            # Первый значащий символ определяет формат ответа
+            self._buffer = self._buffer.lstrip(_WHITESPACE)
+            if not self._buffer:
+                self.done = finished
+                return []
+            self._array = self._buffer[0] == '['
+            self._position = 1
+            if not self._array:
+                self._page_parts.insert(0, self._buffer)
+
+        if not self._array:
+            # Страница или одиночный объект разбираются целиком
+            if not finished:
+                return []
+            self.done = True
+            page = self.loads(''.join(self._page_parts))
+            if isinstance(page, dict) and 'results' in page:
+                if self.envelope is not None:
+                    self.envelope.update((key, value) for key, value in page.items() if key != 'results')
+                return page['results']
+            return [page]
+
+        items = []
+        buffer, position = self._buffer, self._position
+        while True:
+            # Пропуск пробелов и запятых между элементами
+            while position < len(buffer) and (buffer[position] in _WHITESPACE or buffer[position] == ','):
+                position += 1
+            if position >= len(buffer):
+                break
+            if buffer[position] == ']':
+                self.done = True
+                return items
+            try:
+                item, end = _decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if finished:
+                    raise
+                break
+            # Число в конце буфера может продолжиться в следующем куске (в том числе после точки или экспоненты)
+            if not finished and not isinstance(item, (dict, list, str)) and (
+                    end == len(buffer) or buffer[end] not in _WHITESPACE + ',]'):
+                break
+            items.append(item)
+            position = end
+
+        if finished:
+            raise json.JSONDecodeError('Неожиданный конец массива', buffer, position)
+        self._buffer, self._position = buffer[position:], 0
+        return items
+
+
+def iter_json_items(chunks, envelope: dict = None, loads=json.loads):
+    """Разбирает JSON по мере поступления кусков байтов и отдаёт элементы верхнего массива по одному.
+
+    Если в ответе не массив, а объект-страница вида {"count": ..., "next": ..., "results": [...]},
+    отдаются элементы results, а остальные поля страницы (например next) записываются в envelope.
+    Страница читается целиком и разбирается функцией loads (например, loads кодека клиента)"""
+    parser = _ItemParser(envelope, loads)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+        if parser.done:
+            return
+    yield from parser.close()
+
+
+async def aiter_json_items(chunks, envelope: dict = None, loads=json.loads):
+    """Асинхронный вариант iter_json_items для асинхронного итератора кусков (например, httpx aiter_bytes)"""
+    parser = _ItemParser(envelope, loads)
+    async for chunk in chunks:
+        for item in parser.feed(chunk):
+            yield item
+        if parser.done:
+            return
+    for item in parser.close():
+        yield item
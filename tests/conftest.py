@@ -0,0 +1,123 @@
+import os
+import shutil
+import tempfile
+import uuid
+
+import pytest
+from dotenv import find_dotenv
+
+from api import Zojnik
+from fake_server import FakeZojnikServer
+
+
+def pytest_configure(config):
+    """Запускает локальный fake_server, если адрес API не задан через ZOJNIK_BASE_URL.
+
+    Под pytest-xdist свой сервер поднимает каждый воркер, а управляющий процесс тестов не выполняет и сервер
+    не запускает. Запись в .env идёт во временную копию, чтобы прогон не менял файл в репозитории"""
+    is_xdist_controller = (getattr(config, 'workerinput', None) is None
+                           and config.getoption('numprocesses', default=None))
+    if os.getenv('ZOJNIK_BASE_URL') or is_xdist_controller:
+        return
+
+    server = FakeZojnikServer().start()
+    env_dir = tempfile.mkdtemp(prefix='zojnik-')
+    dotenv_path = find_dotenv(usecwd=True)
+    if dotenv_path:
+        shutil.copyfile(dotenv_path, os.path.join(env_dir, '.env'))
+    else:
+        open(os.path.join(env_dir, '.env'), 'w').close()
+
+    os.environ['ZOJNIK_BASE_URL'] = server.base_url
+    os.environ['ZOJNIK_DOTENV'] = os.path.join(env_dir, '.env')
+    config._zojnik_fake_server = server
+    config._zojnik_env_dir = env_dir
+
+
+def pytest_unconfigure(config):
+    server = getattr(config, '_zojnik_fake_server', None)
+    if server is not None:
+        server.stop()
+        shutil.rmtree(config._zojnik_env_dir, ignore_errors=True)
+
+
+@pytest.fixture(scope='session')
+def unique_email():
+    """Фабрика адресов, уникальных для воркера pytest-xdist и прогона"""
+    worker = os.getenv('PYTEST_XDIST_WORKER', 'main')
+    return lambda prefix='zojnik': f'{prefix}-{worker}-{uuid.uuid4().hex[:12]}@example.com'
+
+
+@pytest.fixture(scope='session')
+def register_account(unique_email):
+    """Фабрика: регистрирует нового пользователя через new_user_registration и возвращает email, пароль и id"""
+    with Zojnik(verbosity='silent') as zf:
+        def register() -> dict:
+            email, password = unique_email(), f'Zj{uuid.uuid4().hex[:10]}1'
+            status, result = zf.new_user_registration('', '', '', '', email, password)
+            assert 200 <= status < 300, result
+            return {'email': email, 'password': password, 'id': result.get('id')}
+
+        yield register
+
+
+@pytest.fixture(scope='session')
+def account(register_account) -> dict:
+    """Свой пользователь на каждый воркер: тесты разных воркеров не мешают друг другу"""
+    return register_account()
+
+
+@pytest.fixture(scope='session')
+def zf(account):
+    """Клиент, вошедший под account. Токены хранятся только в памяти клиента, .env не меняется"""
+    with Zojnik() as client:
+        status, result = client.get_access_and_refresh_token_pair(account['email'], account['password'],
+                                                                  verbosity='silent')
+        assert 200 <= status < 300, result
+        yield client
+
+
+@pytest.fixture(scope='session')
+def authorize(zf):
+    """Передаёт новому клиенту токены пользователя воркера: with authorize(Zojnik(...)) as client"""
+    def authorize(client: Zojnik) -> Zojnik:
+        client.tokens.set_tokens(zf.tokens.access_token, zf.tokens.refresh_token)
+        return client
+
+    return authorize
+
+
+@pytest.fixture(scope='session')
+def dish(zf) -> dict:
+    status, result = zf.create_dish('Тестовое блюдо', 120.0, 10.0, 5.0, 8.0, False, None, 300, 0, None,
+                                    'PROTEIN_PRODUCTS', verbosity='silent')
+    assert 200 <= status < 300, result
+    return result
+
+
+@pytest.fixture(scope='session')
+def plate_dishes(zf, dish) -> tuple:
+    """id белкового блюда, гарнира и овощей для create_plate: у каждого компонента тарелки своя категория"""
+    ids = [dish['id']]
+    for name, category in (('Тестовый гарнир', 'GARNISH_PRODUCTS'), ('Тестовые овощи', 'VEGETABLE_PRODUCTS')):
+        status, result = zf.create_dish(name, 80.0, 3.0, 1.0, 15.0, False, None, 150, 0, None, category,
+                                        verbosity='silent')
+        assert 200 <= status < 300, result
+        ids.append(result['id'])
+    return tuple(ids)
+
+
+@pytest.fixture(scope='session')
+def plate(zf, plate_dishes) -> dict:
+    status, result = zf.create_plate(*plate_dishes, verbosity='silent')
+    assert 200 <= status < 300, result
+    return result
+
+
+@pytest.fixture
+def zojnik_server():
+    """Отдельный fake_server с зарегистрированным пользователем и выданными ему токенами"""
+    with FakeZojnikServer(dishes=30, plates=5) as server:
+        server.user = server.add_user('client@example.com', 'Clientpass1')
+        server.tokens = server.issue_tokens(server.user['id'])
+        yield server
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from async_api import AsyncZojnik
+
+
+class _DetailsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(0.02)
+        with server.lock:
+            server.in_flight -= 1
+        item_id = int(self.path.rstrip('/').rsplit('/', 1)[-1])
+        body = json.dumps({'id': item_id}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _DetailsHandler)
+    server.lock = threading.Lock()
+    server.in_flight = 0
+    server.max_in_flight = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_gather_dish_details_keeps_order_and_shape(local_server):
+    """Проверка, что асинхронный клиент возвращает те же пары (статус, результат) в порядке запроса"""
+    async def scenario():
+        async with AsyncZojnik(base_url=f'http://127.0.0.1:{local_server.server_port}') as zf:
+            return await zf.gather_dish_details([3, 1, 2])
+
+    results = asyncio.run(scenario())
+    assert [status for status, _ in results] == [200, 200, 200]
+    assert [result['id'] for _, result in results] == [3, 1, 2]
+
+
+def test_gather_respects_concurrency_limit(local_server):
+    """Проверка, что gather не выполняет больше limit запросов одновременно"""
+    async def scenario():
+        async with AsyncZojnik(base_url=f'http://127.0.0.1:{local_server.server_port}') as zf:
+            return await zf.gather_plate_details(range(12), limit=3)
+
+    results = asyncio.run(scenario())
+    assert len(results) == 12
+    assert local_server.max_in_flight <= 3
+
+
+def test_mutations_send_idempotency_key(zojnik_server):
+    """Проверка, что изменяющие методы асинхронного клиента передают Idempotency-Key и повтор не создаёт дублей"""
+    dish = dict(calories=100, protein=5, fat=2, carbohydrates=10, allergen=False, other='', price=150, rating=5,
+                avatar='', category='GARNISH_PRODUCTS')
+
+    async def scenario():
+        async with AsyncZojnik(base_url=zojnik_server.base_url) as zf:
+            zf.tokens.set_tokens(zojnik_server.tokens['access'], zojnik_server.tokens['refresh'])
+            plates = [await zf.create_plate(1, 2, 3, idempotency_key='async-plate') for _ in range(2)]
+            dishes = [await zf.create_dish('Суп', **dish, idempotency_key='async-dish') for _ in range(2)]
+            changed = [await zf.change_dish(1, 'Борщ', **dish, idempotency_key='async-change') for _ in range(2)]
+            profiles = [await zf.change_user_profile('Анна', '', 'client@example.com', '', 'anna', {},
+                                                     idempotency_key='async-profile') for _ in range(2)]
+            return plates, dishes, changed, profiles
+
+    plates_before, dishes_before = len(zojnik_server.plates), len(zojnik_server.dishes)
+    results = asyncio.run(scenario())
+    for first, second in results:
+        assert first == second and 200 <= first[0] < 300
+    assert len(zojnik_server.plates) - plates_before == 1 and len(zojnik_server.dishes) - dishes_before == 1
+    assert zojnik_server.idempotent_replays == 4
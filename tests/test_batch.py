@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+import requests
+
+from api import Zojnik
+from async_api import AsyncZojnik
+from batch import Batch
+
+LATENCY = 0.2
+
+
+def test_get_dishes_concurrently(zojnik_server):
+    """Проверка, что пакет из 20 блюд загружается примерно за время одного запроса, а дубли не запрашиваются"""
+    zojnik_server.latency = LATENCY
+    ids = list(range(1, 17)) + [3, 5, 9999, 10000]
+    with Zojnik(base_url=zojnik_server.base_url, verbosity='silent', pool_maxsize=20) as zf:
+        zf.tokens.set_tokens(zojnik_server.tokens['access'], zojnik_server.tokens['refresh'])
+        before = zojnik_server.requests_count
+        batch = zf.get_dishes(ids).wait()
+
+    assert zojnik_server.requests_count - before == 18
+    # Все 18 запросов сервер обрабатывал одновременно
+    assert zojnik_server.max_in_flight == 18
+    assert sorted(batch.results) == list(range(1, 17))
+    assert batch.results[7] == zojnik_server.dishes[7]
+    assert batch.errors == {9999: (404, {'detail': 'Not found.'}), 10000: (404, {'detail': 'Not found.'})}
+
+
+def test_results_stream_as_completed(zojnik_server):
+    """Проверка, что ответы приходят по мере готовности, а сетевые ошибки попадают в errors"""
+    zojnik_server.latency = LATENCY
+    with Zojnik(base_url=zojnik_server.base_url, verbosity='silent') as zf:
+        zf.tokens.set_tokens(zojnik_server.tokens['access'], zojnik_server.tokens['refresh'])
+        before = zojnik_server.requests_count
+        batch = zf.get_plates([1, 2, 3], concurrency=1)
+        first = next(iter(batch))
+        # Первый ответ отдан, пока второй запрос ещё выполняется; третий после close не отправляется
+        assert zojnik_server.requests_count - before <= 2
+        batch.close()
+        assert first[:2] == (1, 200) and first[2]['id'] == 1 and batch.results == {1: first[2]}
+    assert zojnik_server.requests_count - before <= 2
+
+    def fetch(item_id):
+        if item_id == 2:
+            raise requests.ConnectionError('нет связи')
+        if item_id == 3:
+            raise ValueError('ошибка в коде')
+        return 200, item_id
+
+    batch = Batch(fetch, [1, 2], concurrency=2, errors=(requests.RequestException,)).wait()
+    assert batch.results == {1: 1}
+    status, error = batch.errors[2]
+    assert status is None and isinstance(error, requests.ConnectionError)
+    # Исключения не из errors не подавляются
+    with pytest.raises(ValueError):
+        Batch(fetch, [3], concurrency=1, errors=(requests.RequestException,)).wait()
+    assert list(Batch(fetch, [], concurrency=4)) == []
+
+
+def test_async_get_plates(zojnik_server):
+    """Проверка пакетной загрузки тарелок асинхронным клиентом"""
+    zojnik_server.latency = LATENCY
+
+    async def scenario():
+        async with AsyncZojnik(base_url=zojnik_server.base_url, concurrency=20) as zf:
+            zf.tokens.set_tokens(zojnik_server.tokens['access'], zojnik_server.tokens['refresh'])
+            seen = [item async for item in zf.get_plates([1, 2, 3, 4, 5, 1, 2, 404])]
+            batch = await zf.get_dishes(range(1, 21)).wait()
+            return seen, batch
+
+    seen, batch = asyncio.run(scenario())
+    assert zojnik_server.max_in_flight == 20
+    assert sorted(item_id for item_id, _, _ in seen) == [1, 2, 3, 4, 5, 404]
+    assert [status for item_id, status, _ in seen if item_id == 404] == [404]
+    assert len(batch.results) == 20 and not batch.errors
@@ -0,0 +1,151 @@
+import csv
+import json
+
+import pytest
+
+from api import Zojnik
+from bulk_import import BulkImporter, DISH_FIELDS, validate_row
+from fake_server import FakeZojnikServer
+
+
+def _dish(number: int) -> dict:
+    return {'name': f'Импорт {number}', 'calories': '120.5', 'protein': '10', 'fat': '3.5', 'carbohydrates': '12',
+            'allergen': 'нет', 'other': '', 'price': '250', 'rating': '4', 'avatar': '', 'category': 'GARNISH_PRODUCTS'}
+
+
+@pytest.fixture
+def server():
+    with FakeZojnikServer(dishes=0, plates=0, latency=0.01) as server:
+        server.tokens = server.issue_tokens(server.add_user('import@example.com', 'Importpass1')['id'])
+        yield server
+
+
+@pytest.fixture
+def client(server):
+    with Zojnik(base_url=server.base_url, pool_maxsize=16, verbosity='silent') as zf:
+        zf.tokens.set_tokens(server.tokens['access'], server.tokens['refresh'])
+        yield zf
+
+
+def test_validate_row_uses_create_dish_fields():
+    """Проверка приведения типов и сообщений об ошибках по полям create_dish"""
+    kwargs, errors = validate_row(_dish(1))
+    assert errors == []
+    assert set(kwargs) == set(DISH_FIELDS)
+    assert kwargs['calories'] == 120.5 and kwargs['allergen'] is False and kwargs['other'] is None
+
+    _, errors = validate_row({'name': 'Без калорий', 'calories': 'много', 'colour': 'red'})
+    assert 'неизвестные поля: colour' in errors
+    assert any(error.startswith('calories:') for error in errors)
+    assert 'category: обязательное поле' in errors
+
+
+def test_validate_row_reports_malformed_rows():
+    """Проверка строк, которые раньше прерывали импорт исключением или проходили проверку"""
+    _, errors = validate_row({**_dish(1), 'colour': 'red', None: ['лишнее']})
+    assert errors == ['лишние значения в строке', 'неизвестные поля: colour']
+
+    _, errors = validate_row({**_dish(1), 'name': '  ', 'category': ''})
+    assert errors == ['name: пустое значение', 'category: пустое значение']
+    assert validate_row({**_dish(1), 'other': ''})[1] == []
+
+    assert validate_row(['не', 'объект'])[1] == ['ожидается объект JSON, получено list']
+
+
+def test_malformed_jsonl_lines_are_invalid(tmp_path, server, client):
+    """Проверка, что неразобранная строка JSONL отмечается invalid, а импорт продолжается"""
+    source = tmp_path / 'menu.jsonl'
+    lines = [json.dumps(_dish(number), ensure_ascii=False) for number in range(5)]
+    lines[1], lines[3] = '{"name": "Обрыв', '[1, 2]'
+    source.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    output = tmp_path / 'results.jsonl'
+
+    summary = BulkImporter(client, workers=2).run(str(source), str(output))
+
+    assert summary['created'] == 3 and summary['invalid'] == 2
+    invalid = {record['row']: record['error'] for record in map(json.loads, output.read_text('utf-8').splitlines())
+               if record['status'] is None}
+    assert invalid[2][0].startswith('ошибка разбора JSON') and invalid[4] == ['ожидается объект JSON, получено list']
+
+
+def test_import_csv_concurrently(tmp_path, server, client):
+    """Проверка параллельного импорта CSV с результатом по каждой строке"""
+    source = tmp_path / 'menu.csv'
+    with open(source, 'w', encoding='utf-8', newline='') as menu:
+        writer = csv.DictWriter(menu, fieldnames=DISH_FIELDS)
+        writer.writeheader()
+        writer.writerows(_dish(number) for number in range(300))
+        writer.writerow({**_dish(300), 'price': 'бесплатно'})
+    output = tmp_path / 'results.jsonl'
+
+    summary = BulkImporter(client, workers=16).run(str(source), str(output))
+
+    assert summary['created'] == 300 and summary['invalid'] == 1 and summary['failed'] == 0
+    # Запросы шли параллельно, но не больше числа воркеров
+    assert 1 < server.max_in_flight <= 16
+    assert server.requests_count == 300
+    records = [json.loads(line) for line in output.read_text(encoding='utf-8').splitlines()]
+    assert sorted(record['row'] for record in records) == list(range(1, 302))
+    assert len(server.dishes) == 300
+
+
+def test_import_resumes_from_checkpoint(tmp_path, server, client):
+    """Проверка, что повторный запуск пропускает строки из checkpoint"""
+    source = tmp_path / 'menu.jsonl'
+    source.write_text(''.join(json.dumps(_dish(number), ensure_ascii=False) + '\n' for number in range(50)),
+                      encoding='utf-8')
+    checkpoint = tmp_path / 'menu.ckpt'
+    checkpoint.write_text(''.join(f'{row}\n' for row in range(1, 21)))
+
+    importer = BulkImporter(client, workers=8, checkpoint_path=str(checkpoint))
+    summary = importer.run(str(source), str(tmp_path / 'results.jsonl'))
+    assert summary['skipped'] == 20 and summary['created'] == 30
+    assert len(server.dishes) == 30
+
+    summary = importer.run(str(source), str(tmp_path / 'results.jsonl'))
+    assert summary['skipped'] == 50 and summary['created'] == 0
+
+
+def test_unexpected_error_is_recorded_as_failed_row(tmp_path, server, client):
+    """Проверка, что исключение не из requests не теряет строку и не занимает место в очереди навсегда"""
+    source = tmp_path / 'menu.jsonl'
+    rows = [_dish(number) for number in range(10)]
+    rows[3]['avatar'] = str(tmp_path / 'missing.jpg')
+    source.write_text(''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows), encoding='utf-8')
+    create_dish = client.create_dish
+
+    def flaky_create_dish(**kwargs):
+        if kwargs['avatar']:
+            raise FileNotFoundError(kwargs['avatar'])
+        return create_dish(**kwargs)
+
+    client.create_dish = flaky_create_dish
+    checkpoint = tmp_path / 'menu.ckpt'
+    output = tmp_path / 'results.jsonl'
+    # Одно место в очереди: если его не вернуть после ошибки, импорт зависнет на следующей строке
+    summary = BulkImporter(client, workers=1, max_pending=1, checkpoint_path=str(checkpoint)).run(str(source),
+                                                                                                 str(output))
+
+    assert summary['created'] == 9 and summary['failed'] == 1
+    failed = [json.loads(line) for line in output.read_text(encoding='utf-8').splitlines()
+              if not json.loads(line)['ok']]
+    assert failed[0]['row'] == 4 and failed[0]['error'].startswith('FileNotFoundError')
+    assert '4' not in checkpoint.read_text().split()
+
+
+def test_rows_are_sent_with_idempotency_keys(tmp_path, server, client):
+    """Проверка, что повторный импорт без checkpoint не создаёт дубли: ключи строк те же"""
+    source = tmp_path / 'menu.jsonl'
+    source.write_text(''.join(json.dumps(_dish(number), ensure_ascii=False) + '\n' for number in range(20)),
+                      encoding='utf-8')
+    importer = BulkImporter(client, workers=4)
+    first = importer.run(str(source), str(tmp_path / 'first.jsonl'))
+    second = importer.run(str(source), str(tmp_path / 'second.jsonl'))
+
+    assert first['created'] == 20 and second['created'] == 20
+    assert len(server.dishes) == 20 and server.idempotent_replays == 20
+    scopes = {key for _, key in server.idempotency}
+    assert scopes == {f'{BulkImporter.default_run_id(str(source))}:{number}' for number in range(1, 21)}
+
+    BulkImporter(client, workers=4, run_id='second-import').run(str(source), str(tmp_path / 'third.jsonl'))
+    assert len(server.dishes) == 40
@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+from api import Zojnik
+from cache import ResponseCache
+
+
+@pytest.fixture
+def make_client(zojnik_server):
+    clients = []
+
+    def make(cache):
+        zf = Zojnik(base_url=zojnik_server.base_url, verbosity='silent', cache=cache)
+        zf.tokens.set_tokens(zojnik_server.tokens['access'], zojnik_server.tokens['refresh'])
+        clients.append(zf)
+        return zf
+
+    yield make
+    for zf in clients:
+        zf.close()
+
+
+def test_fresh_entry_served_without_request(zojnik_server, make_client):
+    """Проверка, что свежая запись отдаётся из памяти без запроса к серверу"""
+    cache = ResponseCache(ttl=60)
+    zf = make_client(cache)
+    first = zf.get_list_of_tags()
+    requests_before = zojnik_server.requests_count
+    assert zf.get_list_of_tags() == first
+    assert zojnik_server.requests_count == requests_before
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_expired_entry_revalidated_with_etag(zojnik_server, make_client):
+    """Проверка условного запроса: сервер отвечает 304, и клиент возвращает сохранённые данные"""
+    cache = ResponseCache(ttl=0, stale_ttl=0)
+    zf = make_client(cache)
+    status, categories = zf.get_food_categories()
+    assert zf.get_food_categories() == (status, categories)
+    assert cache.stats()['revalidated'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_stale_entry_served_while_revalidating(make_client):
+    """Проверка, что устаревшая запись отдаётся сразу, а перепроверка идёт в фоне"""
+    cache = ResponseCache(ttl=0, stale_ttl=60)
+    zf = make_client(cache)
+    expected = zf.get_list_of_antitags()
+    assert zf.get_list_of_antitags() == expected
+    assert cache.stats()['stale_served'] == 1
+
+    deadline = time.time() + 2
+    while cache.stats()['revalidated'] == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    assert cache.stats()['revalidated'] == 1
+
+
+def test_disk_cache_shared_between_clients(tmp_path, zojnik_server, make_client):
+    """Проверка, что второй клиент с тем же каталогом кэша получает запись с диска"""
+    make_client(ResponseCache(ttl=60, directory=str(tmp_path))).get_list_of_tags()
+
+    cache = ResponseCache(ttl=60, directory=str(tmp_path))
+    requests_before = zojnik_server.requests_count
+    status, tags = make_client(cache).get_list_of_tags()
+    assert status == 200 and len(tags) > 0
+    assert zojnik_server.requests_count == requests_before
+    assert cache.stats()['disk_hits'] == 1
+
+
+def test_memory_tier_is_bounded_lru(make_client):
+    """Проверка вытеснения давно не использованных записей из памяти"""
+    cache = ResponseCache(max_entries=2, ttl=60)
+    zf = make_client(cache)
+    zf.get_food_categories()
+    zf.get_list_of_tags()
+    zf.get_food_categories()
+    zf.get_list_of_antitags()
+    assert cache.get(zf._cache_key('/api/food/dicts/tag/')) is None
+    assert cache.get(zf._cache_key('/api/food/dicts/foodcategory/')) is not None
+
+
+def test_cache_key_includes_user(tmp_path, zojnik_server, make_client):
+    """Проверка, что запись одного пользователя не отдаётся другому, а обновление токена её не сбрасывает"""
+    cache = ResponseCache(ttl=60, directory=str(tmp_path))
+    zf = make_client(cache)
+    expected = zf.get_list_of_tags()
+
+    other = zojnik_server.add_user('other-cache@example.com', 'Otherpass1')
+    tokens = zojnik_server.issue_tokens(other['id'])
+    other_client = make_client(ResponseCache(ttl=60, directory=str(tmp_path)))
+    other_client.tokens.set_tokens(tokens['access'], tokens['refresh'])
+    requests_before = zojnik_server.requests_count
+    assert other_client.get_list_of_tags() == expected
+    assert zojnik_server.requests_count == requests_before + 1
+
+    # Новый access токен того же пользователя
+    zf.tokens.set_tokens(zojnik_server.issue_tokens(zojnik_server.user['id'])['access'])
+    requests_before = zojnik_server.requests_count
+    assert zf.get_list_of_tags() == expected
+    assert zojnik_server.requests_count == requests_before
+    assert cache.stats()['hits'] == 1
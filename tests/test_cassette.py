@@ -0,0 +1,73 @@
+import pytest
+
+from api import Zojnik
+from cassette import Cassette, UnmatchedRequestError
+
+
+def _session(zf: Zojnik) -> list:
+    """Набор вызовов, который записывается и воспроизводится"""
+    return [
+        zf.get_access_and_refresh_token_pair('client@example.com', 'Clientpass1'),
+        zf.get_list_of_tags(),
+        zf.get_dish_details(3),
+        zf.create_plate(1, 2, 3),
+        list(zf.iter_plates(page_size=4)),
+        zf.get_dish_details(100000),
+    ]
+
+
+def test_record_then_replay_without_network(tmp_path, zojnik_server):
+    """Проверка, что воспроизведение повторяет записанные ответы без сервера и без токенов в файле"""
+    path = tmp_path / 'session.jsonl'
+    with Zojnik(base_url=zojnik_server.base_url, verbosity='silent',
+                cassette=Cassette(str(path), mode='record')) as zf:
+        recorded = _session(zf)
+        tokens = (zf.tokens.access_token, zf.tokens.refresh_token)
+    zojnik_server.stop()
+
+    content = path.read_text(encoding='utf-8')
+    assert all(token not in content for token in tokens)
+    assert 'Clientpass1' not in content
+
+    cassette = Cassette(str(path))
+    with Zojnik(base_url=zojnik_server.base_url, verbosity='silent', cassette=cassette) as zf:
+        replayed = _session(zf)
+    assert replayed[1:] == recorded[1:]
+    assert replayed[0][1] == {'access': 'REDACTED', 'refresh': 'REDACTED'}
+    assert cassette.stats['played'] == len(cassette) == 7  # список тарелок - две страницы
+
+    # Повторное воспроизведение даёт те же байты
+    with Zojnik(base_url=zojnik_server.base_url, verbosity='silent', cassette=Cassette(str(path))) as zf:
+        assert _session(zf) == replayed
+
+
+def test_strict_and_lenient_matching(tmp_path, zojnik_server):
+    """Проверка строгого режима и выбора полей сопоставления"""
+    path = tmp_path / 'plates.jsonl'
+    with Zojnik(base_url=zojnik_server.base_url, verbosity='silent',
+                cassette=Cassette(str(path), mode='record')) as zf:
+        zf.tokens.set_tokens(zojnik_server.tokens['access'], zojnik_server.tokens['refresh'])
+        status, plate = zf.create_plate(1, 2, 3)
+    assert status == 201
+
+    with Zojnik(base_url=zojnik_server.base_url, verbosity='silent', cassette=Cassette(str(path))) as zf:
+        zf.tokens.set_tokens('any', 'any')
+        assert zf.create_plate(1, 2, 3) == (201, plate)
+        with pytest.raises(UnmatchedRequestError, match='/api/plate'):
+            zf.create_plate(4, 5, 6)
+
+    cassette = Cassette(str(path), match_on=('method', 'path'))
+    with Zojnik(base_url=zojnik_server.base_url, verbosity='silent', cassette=cassette) as zf:
+        zf.tokens.set_tokens('any', 'any')
+        assert zf.create_plate(4, 5, 6) == (201, plate)
+
+    # Нестрогий режим отправляет незаписанный запрос на сервер
+    cassette = Cassette(str(path), strict=False)
+    with Zojnik(base_url=zojnik_server.base_url, verbosity='silent', cassette=cassette) as zf:
+        zf.tokens.set_tokens(zojnik_server.tokens['access'], zojnik_server.tokens['refresh'])
+        status, result = zf.get_dish_details(2)
+    assert status == 200 and result['id'] == 2
+    assert cassette.stats['passed_through'] == 1
+
+    with pytest.raises(ValueError):
+        Cassette(str(path), match_on=('headers',))
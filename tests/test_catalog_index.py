@@ -0,0 +1,68 @@
+import itertools
+
+import pytest
+
+from api import Zojnik
+from catalog_index import CatalogIndex
+from fake_server import ANTITAGS, TAGS
+
+
+@pytest.fixture
+def index(zojnik_server):
+    with Zojnik(base_url=zojnik_server.base_url, verbosity='silent') as zf:
+        zf.tokens.set_tokens(zojnik_server.tokens['access'], zojnik_server.tokens['refresh'])
+        index = CatalogIndex(zf, page_size=8, seed=0)
+        assert index.sync() == {'added': 30, 'updated': 0, 'removed': 0}
+        yield index
+        index.close()
+
+
+def test_local_queries_match_server(index, zojnik_server):
+    """Проверка, что локальные ответы совпадают с /api/food для разных сочетаний фильтров"""
+    queries = [(','.join(tags), antitag, category)
+               for tags in itertools.combinations(TAGS[:4], 2)
+               for antitag in ('', ANTITAGS[0])
+               for category in ('', 'Гарнир', 'PROTEIN_PRODUCTS')]
+    for query in queries:
+        assert index.verify(*query) is None, query
+    assert index.query_ids() == list(range(1, 31))
+    assert all(dish['category'] == 'GARNISH_PRODUCTS' for dish in index.query(category='Гарнир'))
+    assert index.query(tags=['Нет такого тега']) == []
+
+    # Запросы обслуживаются из локального индекса: сервер не получает ни одного запроса
+    query = ('Мясо%Рыба', 'Куркума', 'Белковое блюдо')
+    assert index.verify(*query) is None
+    expected = index.query_ids(*query)
+    requests_before = zojnik_server.requests_count
+    assert all(index.query_ids(*query) == expected for _ in range(1000))
+    assert zojnik_server.requests_count == requests_before
+
+
+def test_incremental_sync(index, zojnik_server):
+    """Проверка, что повторная синхронизация переиндексирует только изменения"""
+    assert index.sync() == {'added': 0, 'updated': 0, 'removed': 0}
+
+    zojnik_server.dishes[5]['tags'] = ['Новый тег']
+    del zojnik_server.dishes[6]
+    zojnik_server.dishes[31] = {**zojnik_server.dishes[1], 'id': 31, 'tags': ['Новый тег']}
+    assert index.sync() == {'added': 1, 'updated': 1, 'removed': 1}
+    assert index.query_ids(tags='Новый тег') == [5, 31]
+    assert 6 not in index.query_ids()
+    assert index.verify(tags='Новый тег') is None
+
+    index.upsert({**zojnik_server.dishes[2], 'tags': ['Новый тег']})
+    assert index.query_ids(tags='Новый тег') == [2, 5, 31]
+    index.remove(31)
+    assert index.query_ids(tags='Новый тег') == [2, 5]
+
+
+def test_sampled_verification_reports_mismatches(index, zojnik_server):
+    """Проверка фоновой сверки выборки запросов с сервером"""
+    zojnik_server.dishes[7]['antitags'] = ['Орехи']  # индекс об этом не знает
+    index.sample_rate = 1.0
+    index.query_ids(antitags='Орехи')
+    index.close()
+    assert index.stats['sampled'] == 1
+    assert index.mismatches == [{'tags': (), 'antitags': ('Орехи',), 'category': None, 'missing': [],
+                                 'extra': [7]}]
+    assert index.verify_sample([('', 'Орехи', None), ('Мясо', '', None)], size=2) == [index.mismatches[1]]
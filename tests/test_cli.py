@@ -0,0 +1,73 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import zojnik
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def run(zojnik_server, monkeypatch, capsys):
+    """Запуск CLI в этом процессе от имени пользователя zojnik_server. Возвращает код выхода и строки вывода"""
+    monkeypatch.setenv('valid_access_token', zojnik_server.tokens['access'])
+    monkeypatch.setenv('valid_refresh_token', zojnik_server.tokens['refresh'])
+
+    def run(*argv):
+        with pytest.raises(SystemExit) as exit_info:
+            zojnik.main(['--base-url', zojnik_server.base_url, *argv])
+        return exit_info.value.code, [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+    return run
+
+
+def test_commands_mirror_client_methods(zojnik_server, run):
+    """Проверка команд, построенных по сигнатурам методов Zojnik, и кодов выхода"""
+    assert run('verify-token', zojnik_server.tokens['access']) == (0, [{'status': 200}])
+    assert run('verify-token', 'garbage')[0] == 1
+
+    code, [output] = run('get-plate-details', '2')
+    assert code == 0 and output['status'] == 200 and output['result']['id'] == 2
+
+    code, lines = run('get-dishes', '1', '2', '2', '999')
+    assert code == 1 and sorted(line['id'] for line in lines) == [1, 2, 999]
+    assert [line['status'] for line in lines if line['id'] == 999] == [404]
+
+    code, lines = run('iter-dishes', '--page-size', '7', '--category', 'Гарнир')
+    assert code == 0 and lines and all(line['category'] == 'GARNISH_PRODUCTS' for line in lines)
+
+    code, [output] = run('change-user-profile', 'Анна', 'Иванова', 'client@example.com', '+79990000000', 'anna',
+                         '{"height": 170}')
+    assert code == 0 and output['result']['first_name'] == 'Анна'
+
+
+def test_create_dish_uploads_file(zojnik_server, run, tmp_path):
+    """Проверка типов аргументов и загрузки файла через @путь"""
+    photo = tmp_path / 'soup.png'
+    photo.write_bytes(b'\x89PNG' + b'0' * 1000)
+    code, [output] = run('create-dish', 'Суп', '120.5', '6', '3', '14', 'false', '', '210', '4', f'@{photo}',
+                         'VEGETABLE_PRODUCTS')
+    dish = output['result']
+    assert code == 0 and output['status'] == 201
+    assert dish['allergen'] is False and dish['rating'] == 4
+    assert zojnik_server.avatars[dish['avatar']] == photo.read_bytes()
+
+    with pytest.raises(SystemExit):
+        zojnik.main(['create-plate', '1', 'два', '3'])
+
+
+def test_heavy_modules_are_not_imported_on_start():
+    """Проверка, что клиент и CLI не загружают при старте httpx, asyncio, requests_toolbelt, dotenv и pillow"""
+    code = ('import sys, zojnik, api; api.Zojnik(verbosity="silent").close(); '
+            'print([name for name in ("httpx", "asyncio", "requests_toolbelt", "dotenv", "PIL", "numpy") '
+            'if name in sys.modules])')
+    env = dict(os.environ, ZOJNIK_DOTENV=os.path.join(ROOT, '.env'))
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True,
+                            check=True)
+    assert result.stdout.strip() == '[]'
+
+    result = subprocess.run([sys.executable, '-m', 'zojnik', '--help'], cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0 and 'get-plate-details' in result.stdout
@@ -0,0 +1,108 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from api import Zojnik
+from async_api import AsyncZojnik
+from coalescing import AsyncSingleFlight, SingleFlight
+
+
+@pytest.fixture
+def slow_server(zojnik_server):
+    zojnik_server.latency = 0.1
+    return zojnik_server
+
+
+def test_concurrent_identical_gets_share_one_request(slow_server):
+    """Проверка, что одновременные одинаковые GET из разных потоков уходят на сервер один раз"""
+    flight = SingleFlight()
+    with Zojnik(base_url=slow_server.base_url, verbosity='silent', pool_maxsize=20, coalescing=flight) as zf:
+        zf.tokens.set_tokens(slow_server.tokens['access'], slow_server.tokens['refresh'])
+        barrier = threading.Barrier(20)
+
+        def fetch(dish_id):
+            barrier.wait()
+            return zf.get_dish_details(dish_id)
+
+        before = slow_server.requests_count
+        with ThreadPoolExecutor(20) as executor:
+            results = list(executor.map(fetch, [5] * 15 + [6] * 5))
+
+    assert slow_server.requests_count - before == 2
+    assert {result[1]['id'] for result in results} == {5, 6}
+    assert all(result[0] == 200 for result in results)
+    assert flight.stats() == {'calls': 20, 'executed': 2, 'shared': 18, 'saved_ratio': 0.9}
+
+    # Последовательные вызовы без окна не объединяются
+    flight = SingleFlight()
+    with Zojnik(base_url=slow_server.base_url, verbosity='silent', coalescing=flight) as zf:
+        zf.tokens.set_tokens(slow_server.tokens['access'], slow_server.tokens['refresh'])
+        zf.get_dish_details(5)
+        zf.get_dish_details(5)
+        zf.create_plate(1, 2, 3)
+    assert flight.stats()['executed'] == 2 and flight.stats()['calls'] == 2
+
+
+def test_window_and_errors():
+    """Проверка окна повторного использования результата и передачи исключения всем ожидающим"""
+    flight = SingleFlight(window=0.2)
+    calls = []
+    assert flight.do('a', lambda: calls.append(1) or 'first') == 'first'
+    assert flight.do('a', lambda: calls.append(2) or 'second') == 'first'
+    time.sleep(0.25)
+    assert flight.do('a', lambda: calls.append(3) or 'third') == 'third'
+    assert calls == [1, 3]
+
+    started = threading.Event()
+
+    def failing():
+        started.set()
+        time.sleep(0.1)
+        raise ConnectionError('сеть недоступна')
+
+    with ThreadPoolExecutor(2) as executor:
+        leader = executor.submit(flight.do, 'b', failing)
+        started.wait()
+        follower = executor.submit(flight.do, 'b', lambda: 'не вызывается')
+        for future in (leader, follower):
+            with pytest.raises(ConnectionError):
+                future.result()
+    # Ошибка не запоминается на время окна
+    assert flight.do('b', lambda: 'ok') == 'ok'
+
+
+def test_users_are_not_mixed(slow_server):
+    """Проверка, что запросы разных пользователей не объединяются"""
+    other = slow_server.issue_tokens(slow_server.add_user('other@example.com', 'Otherpass1')['id'])
+    flight = SingleFlight()
+    first = Zojnik(base_url=slow_server.base_url, verbosity='silent', coalescing=flight)
+    second = Zojnik(base_url=slow_server.base_url, verbosity='silent', coalescing=flight)
+    with first, second:
+        first.tokens.set_tokens(slow_server.tokens['access'], slow_server.tokens['refresh'])
+        second.tokens.set_tokens(other['access'], other['refresh'])
+        with ThreadPoolExecutor(2) as executor:
+            profiles = list(executor.map(lambda zf: zf.open_user_profile()[1]['email'], [first, second]))
+    assert profiles == ['client@example.com', 'other@example.com']
+    assert flight.stats()['shared'] == 0
+
+
+def test_async_client_coalesces(slow_server):
+    """Проверка объединения одинаковых запросов в асинхронном клиенте"""
+    flight = AsyncSingleFlight()
+
+    async def scenario():
+        async with AsyncZojnik(base_url=slow_server.base_url, coalescing=flight) as zf:
+            zf.tokens.set_tokens(slow_server.tokens['access'], slow_server.tokens['refresh'])
+            waiter = asyncio.ensure_future(zf.get_plate_details(1))
+            await asyncio.sleep(0.01)
+            waiter.cancel()  # отмена одного ожидающего не отменяет общий запрос
+            return await asyncio.gather(*(zf.get_plate_details(plate_id) for plate_id in [1] * 10 + [2] * 10))
+
+    before = slow_server.requests_count
+    results = asyncio.run(scenario())
+    assert slow_server.requests_count - before == 2
+    assert [result[1]['id'] for result in results] == [1] * 10 + [2] * 10
+    assert flight.stats()['calls'] == 21 and flight.stats()['executed'] == 2
@@ -0,0 +1,68 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from api import Zojnik
+
+
+class _CountingHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.server.client_ports.add(self.client_address[1])
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = json.dumps({'access': 'a', 'refresh': 'r'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _CountingHandler)
+    server.client_ports = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_requests_reuse_keep_alive_connection(local_server):
+    """Проверка, что последовательные запросы идут через одно keep-alive соединение"""
+    with Zojnik(base_url=f'http://127.0.0.1:{local_server.server_port}') as zf:
+        for _ in range(5):
+            status, result = zf.get_access_and_refresh_token_pair('user', 'pass')
+            assert status == 200
+    assert len(local_server.client_ports) == 1
+
+
+def test_threads_share_limited_pool(local_server):
+    """Проверка, что потоки используют общий пул, ограниченный pool_maxsize"""
+    with Zojnik(base_url=f'http://127.0.0.1:{local_server.server_port}', pool_maxsize=2, pool_block=True) as zf:
+        def worker():
+            for _ in range(5):
+                zf.get_access_token_by_refresh_token('r')
+
+        threads = [threading.Thread(target=worker) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert len(local_server.client_ports) <= 2
+
+
+def test_closed_client_rejects_requests(local_server):
+    """Проверка, что после close() клиент не открывает новых соединений"""
+    zf = Zojnik(base_url=f'http://127.0.0.1:{local_server.server_port}')
+    zf.close()
+    assert zf.closed
+    with pytest.raises(RuntimeError):
+        zf.verify_token('token')
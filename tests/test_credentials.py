@@ -0,0 +1,112 @@
+import multiprocessing
+import os
+import stat
+import subprocess
+import sys
+
+import pytest
+
+import credentials
+from credentials import CredentialStore
+
+
+def _write_many(path, worker, count):
+    store = CredentialStore(path)
+    for i in range(count):
+        store.update({f'worker_{worker}': str(i), f'worker_{worker}_done': str(i + 1)})
+
+
+def test_update_writes_several_keys_and_keeps_other_lines(tmp_path):
+    """Проверка, что несколько ключей записываются за раз, а остальные строки и переводы строк сохраняются"""
+    env_path = tmp_path / '.env'
+    env_path.write_bytes(b"# comment\r\nadmin_username='devuser'\r\nvalid_password='old'\r\n\r\nuser_id=22\r\n")
+
+    store = CredentialStore(str(env_path))
+    store.update({'valid_password': "new'pass", 'valid_access_token': 'abc'})
+
+    assert env_path.read_bytes() == (b"# comment\r\nadmin_username='devuser'\r\nvalid_password='new\\'pass'\r\n"
+                                     b"\r\nuser_id=22\r\nvalid_access_token='abc'\r\n")
+    assert store.get('valid_password') == "new'pass"
+    assert CredentialStore(str(env_path)).as_dict() == {'admin_username': 'devuser', 'valid_password': "new'pass",
+                                                        'user_id': '22', 'valid_access_token': 'abc'}
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='права доступа POSIX')
+def test_update_keeps_file_mode(tmp_path):
+    """Проверка, что атомарная замена .env не меняет его права доступа"""
+    env_path = tmp_path / '.env'
+    env_path.write_text("user_id=22\n")
+    env_path.chmod(0o640)
+    CredentialStore(str(env_path)).update({'user_id': '23'})
+    assert stat.S_IMODE(env_path.stat().st_mode) == 0o640
+
+    new_path = tmp_path / 'new.env'
+    CredentialStore(str(new_path)).update({'user_id': '1'})
+    assert stat.S_IMODE(new_path.stat().st_mode) == 0o600
+
+
+def test_reads_are_served_from_memory(tmp_path):
+    """Проверка, что чтение идёт из кэша, пока хранилище не перечитано явно"""
+    env_path = tmp_path / '.env'
+    env_path.write_text("valid_email='a@example.com'\n")
+    store = CredentialStore(str(env_path))
+    assert store['valid_email'] == 'a@example.com'
+
+    env_path.write_text("valid_email='b@example.com'\n")
+    assert store['valid_email'] == 'a@example.com'
+    store.reload()
+    assert store['valid_email'] == 'b@example.com'
+
+
+def test_parallel_processes_do_not_lose_updates(tmp_path):
+    """Проверка, что одновременная запись из нескольких процессов не теряет изменения"""
+    env_path = tmp_path / '.env'
+    env_path.write_text("admin_username='devuser'\n")
+
+    processes = [multiprocessing.Process(target=_write_many, args=(str(env_path), worker, 20)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    values = CredentialStore(str(env_path)).as_dict()
+    assert values['admin_username'] == 'devuser'
+    for worker in range(4):
+        assert values[f'worker_{worker}'] == '19'
+        assert values[f'worker_{worker}_done'] == '20'
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['.env', '.env.lock']
+
+
+def test_found_env_path_is_cached_between_processes(tmp_path, monkeypatch):
+    """Проверка, что найденный .env запоминается в файле кэша: следующий процесс не ищет его и не импортирует
+    dotenv, а пропавший файл ищется заново"""
+    env = {key: value for key, value in os.environ.items() if key != 'ZOJNIK_DOTENV'}
+    env['ZOJNIK_CACHE_DIR'] = str(tmp_path / 'cache')
+    code = 'import sys, credentials; print(credentials.default_env_path()); print("dotenv" in sys.modules)'
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def run():
+        result = subprocess.run([sys.executable, '-c', code], cwd=root, env=env, capture_output=True, text=True,
+                                check=True)
+        return result.stdout.split()
+
+    first, second = run(), run()
+    assert first[1] == 'True' and second == [first[0], 'False']
+
+    # Запись с путём к удалённому файлу не используется
+    monkeypatch.chdir(root)
+    monkeypatch.delenv('ZOJNIK_DOTENV', raising=False)
+    monkeypatch.setenv('ZOJNIK_CACHE_DIR', str(tmp_path / 'cache'))
+    found = tmp_path / 'found' / '.env'
+    found.parent.mkdir()
+    found.write_text('')
+    monkeypatch.setattr('dotenv.find_dotenv', lambda: str(found))
+    key = next(iter(credentials._read_cached_paths(credentials._cache_path())))
+    credentials._write_cached_paths(credentials._cache_path(), {key: str(tmp_path / 'missing' / '.env')})
+    credentials._find_env_path.cache_clear()
+    try:
+        assert credentials.default_env_path() == str(found)
+        assert credentials._read_cached_paths(credentials._cache_path()) == {key: str(found)}
+    finally:
+        credentials._find_env_path.cache_clear()
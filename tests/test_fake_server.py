@@ -0,0 +1,96 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from api import Zojnik
+from batch import Batch
+from fake_server import FakeZojnikServer
+
+
+@pytest.fixture
+def server():
+    with FakeZojnikServer(dishes=30, plates=3) as server:
+        server.add_user('fake@example.com', 'Fakepass1')
+        yield server
+
+
+def test_tokens_issued_by_fake_server_are_verified(server):
+    """Проверка выдачи, обновления и проверки JWT локальным сервером"""
+    with Zojnik(base_url=server.base_url) as zf:
+        status, tokens = zf.get_access_and_refresh_token_pair('fake@example.com', 'Fakepass1')
+        assert status == 200
+        assert zf.verify_token(tokens['access']) == 200
+        assert zf.verify_token(tokens['access'] + 'x') == 401
+
+        status, result = zf.get_access_token_by_refresh_token(tokens['refresh'])
+        assert status == 200
+        assert 'access' in result
+
+        status, result = zf.get_access_token_by_refresh_token(tokens['access'])
+        assert status == 401
+
+
+def test_plate_is_calculated_from_components(server):
+    """Проверка, что созданная тарелка содержит сумму КБЖУ и цены компонентов"""
+    with Zojnik(base_url=server.base_url) as zf:
+        _, tokens = zf.get_access_and_refresh_token_pair('fake@example.com', 'Fakepass1')
+        headers = {'Authorization': f"Bearer {tokens['access']}"}
+        response = zf._request('POST', '/api/plate/', headers=headers,
+                               json={'proteinproduct': 1, 'garnishproduct': 2, 'vegetableproduct': 3})
+    assert response.status_code == 201
+    plate = response.json()
+    for field in ('calories', 'protein', 'fat', 'carbohydrates', 'price'):
+        expected = sum(server.dishes[dish_id][field] for dish_id in (1, 2, 3))
+        assert plate[field] == pytest.approx(expected)
+
+
+def test_authorized_endpoints_require_token(server):
+    """Проверка, что без токена защищённые эндпоинты возвращают 401"""
+    with Zojnik(base_url=server.base_url) as zf:
+        response = zf._request('GET', '/api/plate/')
+    assert response.status_code == 401
+
+
+def test_injected_latency_and_errors():
+    """Проверка внедрения задержки и ошибок"""
+    with FakeZojnikServer(latency=0.05, error_rate=1.0, error_status=503) as server:
+        with Zojnik(base_url=server.base_url) as zf:
+            started = time.perf_counter()
+            assert zf.verify_token('token') == 503
+            assert time.perf_counter() - started >= 0.05
+
+
+def test_requests_are_handled_concurrently(server):
+    """Проверка, что медленные запросы обрабатываются параллельно, а одновременные повторы с одним
+    Idempotency-Key создают одну тарелку"""
+    server.latency = 0.2
+    with Zojnik(base_url=server.base_url, verbosity='silent', pool_maxsize=8) as zf:
+        zf.get_access_and_refresh_token_pair('fake@example.com', 'Fakepass1')
+        batch = zf.get_dishes(range(1, 9), concurrency=8).wait()
+        assert len(batch.results) == 8
+        assert server.max_in_flight == 8
+
+        plates_before = len(server.plates)
+        batch = Batch(lambda number: zf.create_plate(1, 2, 3, idempotency_key='same-plate'), range(4),
+                      concurrency=4).wait()
+    assert len({plate['id'] for plate in batch.results.values()}) == 1
+    assert len(server.plates) - plates_before == 1 and server.idempotent_replays == 3
+
+
+def test_concurrent_registrations_with_same_email(server):
+    """Проверка, что из одновременных регистраций с одним email проходит одна, остальные получают 400"""
+    add_user = server.add_user
+
+    def slow_add_user(*args, **kwargs):
+        # Расширяет окно между проверкой email и добавлением пользователя
+        time.sleep(0.05)
+        return add_user(*args, **kwargs)
+
+    server.add_user = slow_add_user
+    with Zojnik(base_url=server.base_url, verbosity='silent', pool_maxsize=8) as zf:
+        with ThreadPoolExecutor(8) as executor:
+            statuses = list(executor.map(
+                lambda number: zf.new_user_registration('Имя', 'Фамилия', f'twin{number}', '+70000000000',
+                                                        'twin@example.com', 'Twinpass1')[0], range(8)))
+    assert sorted(statuses) == [201] + [400] * 7
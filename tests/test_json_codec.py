@@ -0,0 +1,65 @@
+import pytest
+
+from api import Zojnik
+from json_codec import JSONCodec, StdlibCodec, available_codecs, get_codec
+
+
+class _CountingCodec(StdlibCodec):
+    name = 'counting'
+
+    def __init__(self):
+        self.calls = {'dumps': 0, 'loads': 0}
+
+    def dumps(self, obj) -> bytes:
+        self.calls['dumps'] += 1
+        return super().dumps(obj)
+
+    def loads(self, data):
+        assert isinstance(data, bytes)
+        self.calls['loads'] += 1
+        return super().loads(data)
+
+
+@pytest.mark.parametrize('name', available_codecs())
+def test_codecs_round_trip_from_bytes(name):
+    """Проверка кодирования в байты и разбора из байтов без декодирования в текст"""
+    codec = get_codec(name)
+    payload = {'name': 'Шашлык', 'tags': ['Мясо'], 'price': 800, 'fat': 40.8, 'other': None}
+    data = codec.dumps(payload)
+    assert isinstance(data, bytes)
+    assert codec.loads(data) == payload
+    with pytest.raises(codec.errors):
+        codec.loads(b'<html>502</html>')
+
+
+def test_get_codec():
+    """Проверка выбора кодека по имени"""
+    assert get_codec('auto').name == available_codecs()[0]
+    codec = _CountingCodec()
+    assert get_codec(codec) is codec
+    with pytest.raises(ValueError, match='ujson'):
+        get_codec('ujson')
+    assert isinstance(get_codec('json'), JSONCodec)
+
+
+@pytest.mark.parametrize('name', available_codecs())
+def test_client_uses_codec_both_ways(zojnik_server, name):
+    """Проверка, что клиент кодирует тела запросов и разбирает ответы выбранным кодеком"""
+    with Zojnik(base_url=zojnik_server.base_url, verbosity='silent', codec=name) as zf:
+        zf.tokens.set_tokens(zojnik_server.tokens['access'], zojnik_server.tokens['refresh'])
+        status, dish = zf.create_dish('Шашлык из говядины', 465.5, 22.1, 40.8, 2.7, True, None, 800, 0, None,
+                                      'PROTEIN_PRODUCTS')
+        assert status == 201 and dish['name'] == 'Шашлык из говядины'
+        assert zf.get_dish_details(dish['id']) == (200, dish)
+        assert [plate['id'] for plate in zf.iter_plates(page_size=2)] == [1, 2, 3, 4, 5]
+
+
+def test_non_json_body_returned_as_text(zojnik_server):
+    """Проверка, что тело, которое не является JSON, по-прежнему возвращается текстом"""
+    codec = _CountingCodec()
+    with Zojnik(base_url=zojnik_server.base_url, verbosity='silent', codec=codec) as zf:
+        response = zf._request('GET', '/no-such-endpoint/')
+        response._content = b'Bad Gateway'
+        assert zf._parse(response) == 'Bad Gateway'
+        zf.get_access_and_refresh_token_pair('client@example.com', 'Clientpass1')
+    assert codec.calls == {'dumps': 1, 'loads': 2}
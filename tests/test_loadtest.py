@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+from fake_server import FakeZojnikServer
+from histogram import LatencyHistogram
+from loadtest import DEFAULT_SCENARIOS, Scenario, _Stats, format_report, get_list_of_tags, run_load
+
+
+def test_histogram_percentiles_are_accurate_and_mergeable():
+    """Проверка точности перцентилей и объединения гистограмм"""
+    rnd = random.Random(1)
+    values = [rnd.expovariate(1 / 0.05) for _ in range(20000)]
+    first, second, combined = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for index, value in enumerate(values):
+        (first if index % 2 else second).record(value)
+        combined.record(value)
+
+    merged = LatencyHistogram.from_dict(first.to_dict()).merge(second)
+    ordered = sorted(values)
+    for percent in (50, 95, 99):
+        exact = ordered[int(len(ordered) * percent / 100) - 1]
+        assert merged.percentile(percent) == pytest.approx(exact, rel=0.02)
+        assert merged.percentile(percent) == combined.percentile(percent)
+    assert merged.count == 20000
+    assert merged.max == combined.max
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_load_run_reports_every_endpoint(processes):
+    """Проверка короткого нагрузочного прогона против fake_server"""
+    with FakeZojnikServer(latency=0.002) as server:
+        server.add_user('load@example.com', 'Loadpass1')
+        report = run_load(server.base_url, 'load@example.com', 'Loadpass1', users=4, processes=processes,
+                          duration=1.0, ramp_up=0.2)
+
+    expected = {step.__name__ for scenario in DEFAULT_SCENARIOS for step in scenario.steps}
+    assert set(report['endpoints']) <= expected
+    assert 'get_menu_with_filters' in report['endpoints']
+    assert report['requests'] > 20
+    assert report['error_rate'] == 0
+    for row in report['endpoints'].values():
+        assert 0 < row['p50_ms'] <= row['p95_ms'] <= row['p99_ms'] <= row['max_ms']
+    assert 'get_menu_with_filters' in format_report(report)
+
+
+def broken_step(client, context):
+    """Шаг, падающий не сетевой ошибкой: такие исключения раньше останавливали виртуального пользователя"""
+    context['calls'] = context.get('calls', 0) + 1
+    if context['calls'] % 2:
+        raise KeyError('dish_ids')
+    return 200
+
+
+def test_step_exception_is_counted_and_user_continues():
+    """Проверка, что исключение шага считается ошибкой запроса, а пользователь продолжает сценарий"""
+    scenarios = [Scenario('broken', 1, [broken_step, get_list_of_tags])]
+    with FakeZojnikServer() as server:
+        server.add_user('load@example.com', 'Loadpass1')
+        report = run_load(server.base_url, 'load@example.com', 'Loadpass1', scenarios=scenarios, users=1,
+                          duration=0.5)
+
+    broken, tags = report['endpoints']['broken_step'], report['endpoints']['get_list_of_tags']
+    assert broken['requests'] > 2 and broken['errors'] == (broken['requests'] + 1) // 2
+    assert tags['requests'] >= broken['requests'] - 1 and tags['errors'] == 0
+
+
+def test_rps_is_measured_between_first_and_last_request():
+    """Проверка, что длительность для rps считается от начала первого до конца последнего запроса"""
+    first, second = _Stats(), _Stats()
+    first.record('login', 0.5, False, started_at=1000.0)
+    first.record('login', 0.5, False, started_at=1001.0)
+    second.record('tags', 1.0, True, started_at=1000.5)
+    merged = _Stats.from_dict(first.to_dict())
+    merged.merge(_Stats.from_dict(second.to_dict()))
+    assert merged.elapsed == 1.5
+    assert _Stats().elapsed == 0.0
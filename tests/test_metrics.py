@@ -0,0 +1,81 @@
+import json
+
+import pytest
+import requests
+
+from api import Zojnik
+from metrics import MetricsRegistry, RequestTiming, endpoint_label
+
+
+@pytest.fixture
+def metrics():
+    return MetricsRegistry()
+
+
+@pytest.fixture
+def client(zojnik_server, metrics):
+    with Zojnik(base_url=zojnik_server.base_url, verbosity='silent', metrics=metrics) as zf:
+        zf.tokens.set_tokens(zojnik_server.tokens['access'], zojnik_server.tokens['refresh'])
+        yield zf
+
+
+def test_endpoint_label_groups_ids():
+    """Проверка, что id и параметры запроса не размножают эндпоинты"""
+    assert endpoint_label('GET', 'http://127.0.0.1:8000/api/food/17/?x=1') == 'GET /api/food/{id}/'
+    assert endpoint_label('GET', '/api/food/17') == 'GET /api/food/{id}'
+    assert endpoint_label('GET', '/api/food/dicts/tag/') == 'GET /api/food/dicts/tag/'
+
+
+def test_every_call_is_timed(client, metrics):
+    """Проверка замеров соединения, первого байта, полного времени, объёма и разбора JSON"""
+    timings = []
+    metrics.add_sink(timings.append)
+    client.get_dish_details(1)
+    client.get_dish_details(2)
+    client.get_list_of_tags()
+    assert client.verify_token(client.tokens.access_token) == 200
+
+    assert [timing.endpoint for timing in timings] == ['GET /api/food/{id}', 'GET /api/food/{id}',
+                                                       'GET /api/food/dicts/tag/', 'POST /api/auth/jwt/verify/']
+    first, second = timings[0], timings[1]
+    assert first.status == 200 and first.response_bytes > 0
+    assert first.connect > 0 and second.connect == 0  # второй запрос идёт по keep-alive соединению
+    assert 0 < first.ttfb <= first.total
+    assert first.decode is not None and timings[3].decode is None
+
+    snapshot = metrics.snapshot()
+    assert snapshot['GET /api/food/{id}']['requests'] == 2
+    assert snapshot['GET /api/food/{id}']['total']['count'] == 2
+
+
+def test_streaming_and_errors_are_counted(client, metrics, zojnik_server):
+    """Проверка замеров потокового чтения и сетевых ошибок"""
+    assert len(list(client.iter_plates(page_size=2))) == 5
+    client.get_dish_details(100000)
+    snapshot = metrics.snapshot()
+    assert snapshot['GET /api/plate/']['requests'] == 3
+    assert snapshot['GET /api/plate/']['response_bytes'] > 0
+    assert snapshot['GET /api/food/{id}']['errors'] == 1
+
+    with Zojnik(base_url='http://127.0.0.1:9', verbosity='silent', metrics=metrics) as offline:
+        with pytest.raises(requests.ConnectionError):
+            offline.verify_token('x')
+    assert metrics.snapshot()['POST /api/auth/jwt/verify/']['statuses'] == {'error': 1}
+
+
+def test_exports(metrics):
+    """Проверка экспорта в формате Prometheus и JSON lines"""
+    metrics.observe(RequestTiming('GET /api/food/tags/', 200, 0.001, 0.002, 0.003, 512, 0.0001))
+    metrics.observe(RequestTiming('GET /api/food/tags/', 500, 0.0, 0.002, 0.004, 20))
+
+    text = metrics.to_prometheus()
+    assert 'zojnik_requests_total{endpoint="GET /api/food/tags/",status="500"} 1' in text
+    assert 'zojnik_request_errors_total{endpoint="GET /api/food/tags/"} 1' in text
+    assert 'zojnik_response_bytes_total{endpoint="GET /api/food/tags/"} 532' in text
+    assert 'zojnik_request_total_seconds_count{endpoint="GET /api/food/tags/"} 2' in text
+    assert 'zojnik_request_decode_seconds_count{endpoint="GET /api/food/tags/"} 1' in text
+
+    [line] = metrics.to_json_lines().splitlines()
+    row = json.loads(line)
+    assert row['endpoint'] == 'GET /api/food/tags/' and row['requests'] == 2
+    assert row['statuses'] == {'200': 1, '500': 1}
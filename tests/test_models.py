@@ -0,0 +1,39 @@
+import sys
+
+from api import Zojnik
+from models import Antitag, Category, Dish, Plate, Tag, User, to_models
+
+
+def test_round_trip_and_interning(zojnik_server):
+    """Проверка перевода в модели и обратно без потерь и общих строк тегов"""
+    dishes = list(zojnik_server.dishes.values())
+    models = to_models(dishes, Dish)
+    assert [model.as_dict() for model in models] == dishes
+    assert not hasattr(models[0], '__dict__')
+    assert models[0] == Dish.from_dict(dishes[0]) and models[0] != models[1]
+
+    first, second = Dish.from_dict({'tags': ['Мя' + 'со']}), Dish.from_dict({'tags': ['Мясо']})
+    assert first.tags == ('Мясо',) and first.tags[0] is second.tags[0] is sys.intern('Мясо')
+    assert first.name is None
+
+    plate = Plate.from_dict({**zojnik_server.plates[1], 'unknown': 1})
+    assert plate.as_dict() == zojnik_server.plates[1]
+    assert 'calories=' in repr(plate)
+    assert to_models('Bad Gateway', Plate) == 'Bad Gateway'
+
+
+def test_client_returns_models(zojnik_server):
+    """Проверка моделей из потокового чтения и из обычных методов"""
+    with Zojnik(base_url=zojnik_server.base_url, verbosity='silent') as zf:
+        zf.tokens.set_tokens(zojnik_server.tokens['access'], zojnik_server.tokens['refresh'])
+        plates = list(zf.iter_plates(page_size=2, model=Plate))
+        dishes = list(zf.iter_dishes(model=Dish, category='Гарнир'))
+        status, user = zf.open_user_profile()
+        categories = to_models(zf.get_food_categories()[1], Category)
+        tags = to_models(zf.get_list_of_tags()[1], Tag)
+        antitags = to_models(zf.get_list_of_antitags()[1], Antitag)
+
+    assert [plate.id for plate in plates] == [1, 2, 3, 4, 5]
+    assert all(isinstance(dish, Dish) and dish.category == 'GARNISH_PRODUCTS' for dish in dishes)
+    assert to_models(user, User).email == 'client@example.com'
+    assert categories[1].title == 'Гарнир' and tags[0].name == 'Мясо' and antitags[0].name == 'Куркума'
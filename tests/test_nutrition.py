@@ -0,0 +1,45 @@
+import numpy as np
+
+from api import Zojnik
+from fake_server import FakeZojnikServer
+from nutrition import DishTable, plate_totals, verify_plates, verify_server_plates
+
+
+def test_server_plates_match_catalog(zojnik_server):
+    """Проверка, что расчёт по каталогу совпадает с тарелками fake_server, а подменённые значения находятся"""
+    with Zojnik(base_url=zojnik_server.base_url, verbosity='silent') as zf:
+        zf.tokens.set_tokens(zojnik_server.tokens['access'], zojnik_server.tokens['refresh'])
+        report = verify_server_plates(zf, page_size=7)
+        assert report == {'checked': 5, 'mismatched_plates': 0, 'mismatches': [], 'unknown_dishes': []}
+
+        zojnik_server.plates[2]['fat'] += 1
+        zojnik_server.plates[3]['proteinproduct'] = 100000
+        report = verify_server_plates(zf)
+    assert report['checked'] == 4
+    assert [(row['plate'], row['field']) for row in report['mismatches']] == [(2, 'fat')]
+    assert report['unknown_dishes'] == [3]
+
+
+def test_thousands_of_plates_in_one_pass():
+    """Проверка векторного расчёта на большом числе тарелок"""
+    server = FakeZojnikServer(dishes=3000, plates=0)
+    table = DishTable.from_dishes(server.dishes.values())
+    rnd = np.random.default_rng(0)
+    triples = rnd.integers(1, 3001, size=(20000, 3))
+    plates = [server._build_plate(number, *map(int, triple)) for number, triple in enumerate(triples)]
+
+    report = verify_plates(table, plates)
+    assert report['checked'] == 20000 and report['mismatches'] == []
+
+    # Подменённые значения находятся все и только они
+    for number, field in ((17, 'calories'), (9000, 'price'), (19999, 'rating')):
+        plates[number][field] += 5
+    report = verify_plates(table, plates)
+    assert sorted((row['plate'], row['field']) for row in report['mismatches']) == \
+        [(17, 'calories'), (9000, 'price'), (19999, 'rating')]
+
+    totals, known = plate_totals(table, [[1, 2, 3], [1, 2, 999999]])
+    assert known.tolist() == [True, False]
+    expected = sum(server.dishes[dish_id]['calories'] for dish_id in (1, 2, 3))
+    assert abs(totals[0, 0] - expected) < 1e-9
+    assert np.isnan(totals[1]).all()
@@ -0,0 +1,105 @@
+import itertools
+
+import numpy as np
+
+from api import Zojnik
+from plate_optimizer import CATEGORIES, EXPAND_LIMIT, PlateOptimizer, create_plate
+
+TAGS = ('Веган', 'Острое', 'Без глютена')
+
+
+def catalog(per_category: int, seed: int = 0) -> list:
+    """Синтетический каталог: per_category блюд в каждой категории со случайными КБЖУ, ценой и тегами"""
+    rng = np.random.default_rng(seed)
+    dishes = []
+    for number, category in enumerate(CATEGORIES.values()):
+        for index in range(per_category):
+            dish_id = number * per_category + index + 1
+            dishes.append({'id': dish_id, 'category': category,
+                           'calories': float(rng.integers(20, 500)), 'protein': float(rng.integers(0, 40)),
+                           'fat': float(rng.integers(0, 30)), 'carbohydrates': float(rng.integers(0, 60)),
+                           'price': float(rng.integers(30, 400)), 'rating': float(rng.integers(1, 6)),
+                           'tags': [tag for tag in TAGS if rng.random() < 0.2],
+                           'antitags': ['Орехи'] if rng.random() < 0.1 else []})
+    return dishes
+
+
+def brute_force(dishes, limits, max_price, tags, antitags, price_weight=0.5):
+    """Полный перебор троек на Python для сверки: все подходящие тарелки по возрастанию score"""
+    groups = [[dish for dish in dishes if dish['category'] == category and not set(dish['antitags']) & set(antitags)]
+              for category in CATEGORIES.values()]
+    two_sided = [field for field, (low, high) in limits.items() if low is not None and high is not None]
+    plates = []
+    for triple in itertools.product(*groups):
+        totals = {field: sum(dish[field] for dish in triple) for field in ('calories', 'protein', 'fat',
+                                                                            'carbohydrates', 'price')}
+        if any(low is not None and totals[field] < low or high is not None and totals[field] > high
+               for field, (low, high) in limits.items()):
+            continue
+        if max_price is not None and totals['price'] > max_price:
+            continue
+        if not set(tags) <= set().union(*(dish['tags'] for dish in triple)):
+            continue
+        score = sum(((totals[field] - (limits[field][0] + limits[field][1]) / 2) /
+                     ((limits[field][1] - limits[field][0]) / 2)) ** 2 for field in two_sided) / len(two_sided)
+        score += price_weight * totals['price'] / max_price if max_price else 0
+        plates.append((round(score, 6), tuple(dish['id'] for dish in triple)))
+    return sorted(plates)
+
+
+def test_matches_brute_force():
+    """Проверка, что лучшие тарелки совпадают с полным перебором при разных ограничениях"""
+    dishes = catalog(25)
+    optimizer = PlateOptimizer(dishes)
+    cases = [
+        dict(calories=(500, 800), protein=(30, None), max_price=700, tags=(), antitags=()),
+        dict(calories=(300, 900), fat=(None, 40), carbohydrates=(40, 100), max_price=None, tags=('Веган',),
+             antitags=('Орехи',)),
+        dict(calories=(600, 650), protein=(20, 60), max_price=600, tags=('Острое', 'Без глютена'), antitags=()),
+    ]
+    for case in cases:
+        limits = {field: case.get(field) for field in ('calories', 'protein', 'fat', 'carbohydrates')
+                  if case.get(field)}
+        expected = brute_force(dishes, limits, case['max_price'], case['tags'], case['antitags'])
+        plates = [(plate['score'], (plate['proteinproduct'], plate['garnishproduct'], plate['vegetableproduct']))
+                  for plate in optimizer.search(**case, k=7)]
+        assert len(expected) > 7, case
+        # При равном score порядок тарелок не определён, поэтому сравниваются оценки и сами тарелки
+        assert [score for score, _ in plates] == [score for score, _ in expected[:7]]
+        assert set(plates) <= set(expected)
+
+    # Невыполнимые ограничения
+    assert optimizer.search(calories=(10, 20)) == []
+    assert optimizer.search(tags=('Несуществующий',)) == []
+
+
+def test_large_catalog_is_pruned():
+    """Проверка, что на 2000 блюдах в каждой категории (8 млрд троек) отсечки оставляют для проверки
+    малую долю пар и троек"""
+    optimizer = PlateOptimizer(catalog(2000, seed=1))
+    plates = optimizer.search(calories=(640, 660), protein=(50, 70), fat=(15, 25), carbohydrates=(70, 90),
+                              max_price=500, tags=('Веган',), antitags=('Орехи',), k=5)
+    assert len(plates) == 5
+    assert optimizer.last_stats['pairs'] < 2000 ** 2 * 0.2
+    assert optimizer.last_stats['triples'] < 2000 ** 3 * 0.001
+    assert [plate['score'] for plate in plates] == sorted(plate['score'] for plate in plates)
+    for plate in plates:
+        assert 640 <= plate['calories'] <= 660 and 50 <= plate['protein'] <= 70 and plate['price'] <= 500
+
+    # Без ограничений любая тарелка лучшая: после первых k остальные пары отсекаются оценкой снизу
+    assert len(optimizer.search(k=5)) == 5
+    assert optimizer.last_stats['triples'] <= EXPAND_LIMIT
+
+
+def test_create_best_plate(zojnik_server):
+    """Проверка подбора по каталогу fake_server и создания лучшей тарелки"""
+    with Zojnik(base_url=zojnik_server.base_url, verbosity='silent') as zf:
+        zf.tokens.set_tokens(zojnik_server.tokens['access'], zojnik_server.tokens['refresh'])
+        optimizer = PlateOptimizer.from_client(zf, page_size=7)
+        plates = optimizer.search(k=3)
+        assert len(plates) == 3
+        status, created = create_plate(zf, plates[0], idempotency_key='best-plate')
+    assert status == 201
+    assert created['proteinproduct'] == plates[0]['proteinproduct']
+    assert abs(created['calories'] - plates[0]['calories']) < 0.01
+    assert abs(created['rating'] - plates[0]['rating']) < 0.01
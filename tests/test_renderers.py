@@ -0,0 +1,69 @@
+import io
+import logging
+
+import pytest
+
+from api import Zojnik
+from renderers import FullRenderer, Renderer, SummaryRenderer, get_renderer
+
+
+class _ExplodingRenderer(Renderer):
+    enabled = False
+
+    def render(self, status, result, method=None, path=None):
+        raise AssertionError('Отключённый рендерер не должен вызываться')
+
+
+def test_silent_mode_skips_rendering(capsys, authorize):
+    """Проверка, что в тихом режиме клиент ничего не форматирует и не печатает"""
+    with authorize(Zojnik(verbosity=_ExplodingRenderer())) as zf:
+        status, result = zf.get_list_of_plates()
+    assert status == 200
+    assert capsys.readouterr().out == ''
+
+
+def test_full_renderer_is_bounded_by_items_and_bytes():
+    """Проверка ограничения полного вывода по числу элементов и объёму"""
+    result = [{'id': i, 'name': f'Блюдо {i}'} for i in range(100)]
+
+    stream = io.StringIO()
+    FullRenderer(max_items=3, max_bytes=None, stream=stream).render(200, result)
+    output = stream.getvalue()
+    assert 'id: 2' in output and 'id: 3' not in output
+    assert '... ещё 97 элементов' in output
+
+    stream = io.StringIO()
+    FullRenderer(max_items=None, max_bytes=100, stream=stream).render(200, result)
+    assert len(stream.getvalue().encode('utf-8')) < 200
+    assert 'обрезан до 100 байт' in stream.getvalue()
+
+
+def test_verbosity_selected_per_call(capsys, authorize):
+    """Проверка, что режим вывода можно выбрать для отдельного вызова"""
+    with authorize(Zojnik(verbosity='silent')) as zf:
+        zf.get_list_of_tags()
+        assert capsys.readouterr().out == ''
+
+        zf.get_list_of_tags(verbosity='summary')
+        out = capsys.readouterr().out
+        assert 'GET /api/food/dicts/tag/ Status Code: 200' in out
+        assert 'список из' in out
+
+        zf.get_list_of_tags(verbosity=SummaryRenderer(stream=io.StringIO()))
+        assert capsys.readouterr().out == ''
+
+
+def test_log_renderer_adds_structured_fields(caplog, authorize):
+    """Проверка структурированной записи ответа в лог"""
+    with authorize(Zojnik(verbosity='log')) as zf, caplog.at_level(logging.INFO, logger='zojnik'):
+        zf.get_food_categories()
+    record = caplog.records[-1]
+    assert record.zojnik['status'] == 200
+    assert record.zojnik['path'] == '/api/food/dicts/foodcategory/'
+    assert record.zojnik['items'] == 3
+
+
+def test_unknown_verbosity_is_rejected():
+    """Проверка, что неизвестный режим вывода отклоняется"""
+    with pytest.raises(ValueError):
+        get_renderer('loud')
@@ -0,0 +1,151 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+
+import pytest
+import requests
+
+from api import Zojnik
+from resilience import AIMDLimiter, CircuitBreaker, CircuitOpenError, Resilience, RetryPolicy, parse_retry_after
+
+
+def client(server, resilience: Resilience, **kwargs) -> Zojnik:
+    zf = Zojnik(base_url=server.base_url, verbosity='silent', resilience=resilience, **kwargs)
+    zf.tokens.set_tokens(server.tokens['access'], server.tokens['refresh'])
+    return zf
+
+
+def test_retry_policy_delays():
+    """Проверка разбора Retry-After и границ экспоненциальной задержки"""
+    assert parse_retry_after('2') == 2.0 and parse_retry_after('-1') == 0.0
+    assert parse_retry_after(None) is None and parse_retry_after('скоро') is None
+    assert 9 <= parse_retry_after(formatdate(time.time() + 10, usegmt=True)) <= 10
+
+    policy = RetryPolicy(backoff=0.1, max_backoff=0.3, max_retry_after=5, seed=1)
+    for attempt, bound in ((1, 0.1), (2, 0.2), (3, 0.3), (10, 0.3)):
+        assert all(0 <= policy.delay(attempt) <= bound for _ in range(50))
+    assert policy.should_retry('GET', error=requests.ConnectionError()) is True
+    assert policy.should_retry('POST', error=requests.ConnectionError()) is False
+    assert policy.should_retry('GET', error=ValueError()) is False
+    assert policy.delay(1, requests.Response()) <= 0.1
+
+
+def test_retries_honor_retry_after(zojnik_server):
+    """Проверка повтора GET после 503 с учётом Retry-After; POST повторяется только после 429"""
+    sleeps = []
+    resilience = Resilience(RetryPolicy(attempts=3), sleep=lambda delay: sleeps.append(delay) or time.sleep(delay))
+    with client(zojnik_server, resilience) as zf:
+        zojnik_server.fail_next(2, status=503, retry_after=0.05, path='/api/plate/')
+        before = zojnik_server.requests_count
+        status, plate = zf.get_plate_details(1)
+        assert (status, plate['id']) == (200, 1)
+        assert zojnik_server.requests_count - before == 3
+        assert sleeps == [0.05, 0.05]
+
+        zojnik_server.fail_next(1, status=503, path='/api/plate/')
+        assert zf.create_plate(1, 2, 3)[0] == 503
+        zojnik_server.fail_next(1, status=429, retry_after=0, path='/api/plate/')
+        assert zf.create_plate(1, 2, 3)[0] == 201
+
+        # Попытки кончились - вызывающий получает последний ответ
+        zojnik_server.fail_next(3, status=502, path='/api/food/')
+        assert zf.get_dish_details(1)[0] == 502
+
+    stats = resilience.stats()
+    assert stats['retries'] == 5 and stats['retry_after_waits'] == 3 and stats['short_circuited'] == 0
+
+
+def test_500_is_retried_only_for_idempotent_methods(zojnik_server):
+    """Проверка, что после 500 повторяется GET, но не POST: сервер мог успеть создать тарелку"""
+    resilience = Resilience(RetryPolicy(attempts=3, backoff=0), sleep=lambda delay: None)
+    with client(zojnik_server, resilience) as zf:
+        zojnik_server.fail_next(1, status=500, path='/api/plate/')
+        before = zojnik_server.requests_count
+        assert zf.get_plate_details(1)[0] == 200
+        assert zojnik_server.requests_count - before == 2
+
+        zojnik_server.fail_next(1, status=500, path='/api/plate/')
+        before = zojnik_server.requests_count
+        assert zf.create_plate(1, 2, 3)[0] == 500
+        assert zojnik_server.requests_count - before == 1
+    assert resilience.stats()['retries'] == 1
+
+
+def test_circuit_breaker(zojnik_server):
+    """Проверка размыкания цепи после серии 5xx и пробного запроса после паузы"""
+    breaker = CircuitBreaker(failure_threshold=3, recovery_time=0.2)
+    resilience = Resilience(breaker=breaker)
+    with client(zojnik_server, resilience) as zf:
+        zojnik_server.fail_next(3, status=500, path='/api/food/')
+        assert [zf.get_dish_details(1)[0] for _ in range(3)] == [500] * 3
+
+        before = zojnik_server.requests_count
+        with pytest.raises(CircuitOpenError) as error:
+            zf.get_dish_details(2)
+        assert error.value.endpoint == 'GET /api/food/{id}' and 0 < error.value.retry_in <= 0.2
+        assert zojnik_server.requests_count == before
+        # Другие эндпоинты работают
+        assert zf.get_plate_details(1)[0] == 200
+
+        time.sleep(0.25)
+        zojnik_server.fail_next(1, status=500, path='/api/food/')
+        assert zf.get_dish_details(1)[0] == 500  # пробный запрос не удался - цепь снова разомкнута
+        with pytest.raises(CircuitOpenError):
+            zf.get_dish_details(1)
+        time.sleep(0.25)
+        assert zf.get_dish_details(1)[0] == 200
+        assert breaker.state('GET /api/food/{id}') == CircuitBreaker.CLOSED
+
+    assert resilience.stats()['short_circuited'] == 2
+
+
+def test_aimd_limiter():
+    """Проверка аддитивного роста и одного мультипликативного снижения на поколение запросов"""
+    limiter = AIMDLimiter(initial=10, minimum=2, maximum=12)
+    in_flight = [limiter.acquire() for _ in range(5)]
+    for started in in_flight:
+        limiter.release(started, ok=False)
+    assert limiter.limit == 5 and limiter.decreases == 1
+
+    limiter.release(limiter.acquire(), ok=False)
+    assert limiter.limit == 2.5
+    limiter.release(limiter.acquire(), ok=False)
+    assert limiter.limit == 2
+    for _ in range(100):
+        limiter.release(limiter.acquire(), ok=True)
+    assert limiter.limit == 12 and limiter.in_flight == 0
+
+
+def test_limiter_caps_concurrency_and_reacts_to_latency(zojnik_server):
+    """Проверка, что одновременно выполняется не больше limit запросов, а медленные ответы снижают limit"""
+    zojnik_server.latency = 0.1
+    limiter = AIMDLimiter(initial=2, maximum=2)
+    with client(zojnik_server, Resilience(limiter=limiter), pool_maxsize=6) as zf:
+        barrier = threading.Barrier(6)
+
+        def fetch(dish_id):
+            barrier.wait()
+            return zf.get_dish_details(dish_id)[0]
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(6) as executor:
+            assert list(executor.map(fetch, range(1, 7))) == [200] * 6
+        assert time.perf_counter() - started >= 0.3
+
+    limiter = AIMDLimiter(initial=8, latency_target=0.05)
+    with client(zojnik_server, Resilience(limiter=limiter)) as zf:
+        for _ in range(3):
+            zf.get_plate_details(1)
+    assert limiter.limit == 1 and limiter.decreases == 3
+
+
+def test_all_layers_with_random_faults(zojnik_server):
+    """Проверка, что при случайных 503 повторы, ограничитель и размыкатель вместе доводят GET до успеха"""
+    zojnik_server.error_rate, zojnik_server.error_status = 0.3, 503
+    resilience = Resilience(RetryPolicy(attempts=5, backoff=0.01, seed=3), AIMDLimiter(),
+                            CircuitBreaker(failure_threshold=10))
+    with client(zojnik_server, resilience) as zf:
+        statuses = [zf.get_dish_details(dish_id)[0] for dish_id in range(1, 21)]
+    assert statuses.count(200) >= 19
+    assert resilience.stats()['retries'] > 0 and resilience.stats()['limit'] < 10
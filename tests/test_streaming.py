@@ -0,0 +1,127 @@
+import asyncio
+import json
+
+import pytest
+
+from api import Zojnik
+from async_api import AsyncZojnik
+from fake_server import FakeZojnikServer
+from models import Dish
+from streaming import aiter_json_items, iter_json_items
+
+
+def _split(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 7, 4096])
+def test_items_parsed_incrementally_across_chunks(chunk_size):
+    """Проверка разбора массива, разрезанного на куски в произвольных местах, в том числе внутри UTF-8 символов"""
+    items = [{'id': i, 'name': f'Блюдо «{i}»', 'tags': ['Мясо', 'Острое']} for i in range(20)] + [12345, 'строка', None]
+    data = json.dumps(items, ensure_ascii=False, indent=1).encode('utf-8')
+    assert list(iter_json_items(_split(data, chunk_size))) == items
+
+
+def test_first_item_available_before_body_is_complete():
+    """Проверка, что первый элемент отдаётся до получения остальной части ответа"""
+    def chunks():
+        yield b'[{"id": 1}, '
+        raise AssertionError('Генератор прочитал лишний кусок')
+
+    assert next(iter_json_items(chunks())) == {'id': 1}
+
+
+def test_page_envelope_fills_next_link():
+    """Проверка разбора страницы в формате DRF"""
+    envelope = {}
+    data = json.dumps({'count': 3, 'next': 'http://host/api/plate/?page=2', 'results': [{'id': 1}]}).encode()
+    assert list(iter_json_items(_split(data, 5), envelope)) == [{'id': 1}]
+    assert envelope['next'] == 'http://host/api/plate/?page=2'
+
+
+def test_iter_plates_follows_pagination():
+    """Проверка, что iter_plates обходит все страницы списка тарелок"""
+    with FakeZojnikServer(dishes=30, plates=250) as server:
+        user = server.add_user('stream@example.com', 'Streampass1')
+        with Zojnik(base_url=server.base_url, verbosity='silent') as zf:
+            tokens = server.issue_tokens(user['id'])
+            zf.tokens.set_tokens(tokens['access'], tokens['refresh'])
+            requests_before = server.requests_count
+            plates = list(zf.iter_plates(page_size=100))
+            assert server.requests_count - requests_before == 3
+            assert [plate['id'] for plate in plates] == list(range(1, 251))
+
+            streamed = list(zf.iter_plates(chunk_size=256))
+            assert streamed == plates
+
+
+def test_iter_menu_with_filters_matches_regular_call(authorize):
+    """Проверка, что потоковое меню совпадает с результатом get_menu_with_filters"""
+    with authorize(Zojnik(verbosity='silent')) as zf:
+        _, expected = zf.get_menu_with_filters('Мясо%Гарнир', 'Куркума%Паприка', 'Белковое блюдо')
+        assert list(zf.iter_menu_with_filters('Мясо%Гарнир', 'Куркума%Паприка', 'Белковое блюдо',
+                                              page_size=7)) == expected
+
+
+def test_async_items_match_sync_parser():
+    """Проверка, что aiter_json_items разбирает куски так же, как iter_json_items"""
+    items = [{'id': i, 'name': f'Блюдо «{i}»'} for i in range(10)] + [3.5, 'строка']
+    data = json.dumps(items, ensure_ascii=False).encode('utf-8')
+
+    async def chunks():
+        for chunk in _split(data, 3):
+            yield chunk
+
+    async def collect():
+        return [item async for item in aiter_json_items(chunks())]
+
+    assert asyncio.run(collect()) == items
+
+
+def test_async_iterators_follow_pagination():
+    """Проверка iter_plates, iter_dishes и iter_menu_with_filters в AsyncZojnik"""
+    with FakeZojnikServer(dishes=30, plates=250) as server:
+        user = server.add_user('astream@example.com', 'Streampass1')
+        tokens = server.issue_tokens(user['id'])
+        with Zojnik(base_url=server.base_url, verbosity='silent') as zf:
+            zf.tokens.set_tokens(tokens['access'], tokens['refresh'])
+            expected_plates = list(zf.iter_plates())
+            expected_dishes = list(zf.iter_dishes())
+            _, expected_menu = zf.get_menu_with_filters('Мясо%Гарнир', 'Куркума%Паприка', 'Белковое блюдо')
+
+        async def scenario():
+            async with AsyncZojnik(base_url=server.base_url) as azf:
+                azf.tokens.set_tokens(tokens['access'], tokens['refresh'])
+                requests_before = server.requests_count
+                plates = [plate async for plate in azf.iter_plates(page_size=100)]
+                assert server.requests_count - requests_before == 3
+                dishes = [dish async for dish in azf.iter_dishes(chunk_size=256, model=Dish)]
+                menu = [dish async for dish in azf.iter_menu_with_filters(
+                    'Мясо%Гарнир', 'Куркума%Паприка', 'Белковое блюдо', page_size=7)]
+                return plates, dishes, menu
+
+        plates, dishes, menu = asyncio.run(scenario())
+        assert plates == expected_plates and [plate['id'] for plate in plates] == list(range(1, 251))
+        assert [dish.as_dict() for dish in dishes] == [Dish.from_dict(dish).as_dict() for dish in expected_dishes]
+        assert menu == expected_menu
+
+
+def test_async_iterator_keeps_streaming_after_token_refresh(zojnik_server):
+    """Проверка, что повтор после 401 тоже уходит с stream=True, а не читает ответ целиком"""
+    async def scenario():
+        async with AsyncZojnik(base_url=zojnik_server.base_url) as azf:
+            azf.tokens.set_tokens('expired', zojnik_server.tokens['refresh'])
+            sent = []
+            send = azf._client.send
+
+            async def recording_send(request, **kwargs):
+                sent.append(kwargs.get('stream'))
+                return await send(request, **kwargs)
+
+            azf._client.send = recording_send
+            plates = [plate async for plate in azf.iter_plates()]
+            return plates, sent
+
+    plates, sent = asyncio.run(scenario())
+    assert len(plates) == len(zojnik_server.plates)
+    assert sent[0] is True and sent[-1] is True and len(sent) >= 2
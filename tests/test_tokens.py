@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+
+import pytest
+import requests
+
+from api import Zojnik
+from async_api import AsyncZojnik
+from fake_server import FakeZojnikServer
+from tokens import TokenManager, decode_token_expiry
+
+
+@pytest.fixture
+def server():
+    with FakeZojnikServer(dishes=10, plates=2) as server:
+        server.user = server.add_user('tokens@example.com', 'Tokenpass1')
+        yield server
+
+
+def test_decode_token_expiry(server):
+    """Проверка чтения поля exp из JWT без проверки подписи"""
+    token = server._encode_token(server.user['id'], 'access', 60)
+    assert decode_token_expiry(token) == pytest.approx(time.time() + 60, abs=2)
+    assert decode_token_expiry('not-a-jwt') is None
+
+
+def test_concurrent_requests_trigger_single_refresh(server):
+    """Проверка, что потоки с истекающим токеном вызывают обновление ровно один раз"""
+    short_access = server._encode_token(server.user['id'], 'access', 5)
+    refresh = server._encode_token(server.user['id'], 'refresh', 600)
+    with Zojnik(base_url=server.base_url, token_leeway=30) as zf:
+        zf.tokens.set_tokens(short_access, refresh)
+        barrier = threading.Barrier(16)
+        statuses = []
+
+        def worker():
+            barrier.wait()
+            status, _ = zf.get_list_of_tags()
+            statuses.append(status)
+
+        threads = [threading.Thread(target=worker) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert statuses == [200] * 16
+        assert zf.tokens.refresh_count == 1
+        assert zf.tokens.access_token != short_access
+
+
+def test_request_retried_once_after_401(server):
+    """Проверка, что после ответа 401 токен обновляется, а запрос повторяется"""
+    valid = server._encode_token(server.user['id'], 'access', 600)
+    forged = valid[:-4] + ('AAAA' if not valid.endswith('AAAA') else 'BBBB')
+    refresh = server._encode_token(server.user['id'], 'refresh', 600)
+    with Zojnik(base_url=server.base_url) as zf:
+        zf.tokens.set_tokens(forged, refresh)
+        status, result = zf.open_user_profile()
+    assert status == 200
+    assert result['email'] == 'tokens@example.com'
+    assert zf.tokens.refresh_count == 1
+
+
+def test_background_refresh_replaces_token_before_expiry(server):
+    """Проверка фонового обновления токена незадолго до истечения"""
+    short_access = server._encode_token(server.user['id'], 'access', 2)
+    refresh = server._encode_token(server.user['id'], 'refresh', 600)
+    with Zojnik(base_url=server.base_url, token_leeway=1.5) as zf:
+        zf.tokens.set_tokens(short_access, refresh)
+        zf.tokens.start_background_refresh(retry_interval=0.1)
+        deadline = time.time() + 3
+        while zf.tokens.refresh_count == 0 and time.time() < deadline:
+            time.sleep(0.05)
+    assert zf.tokens.refresh_count >= 1
+    assert zf.tokens.access_token != short_access
+
+
+def test_background_refresh_survives_network_errors(server):
+    """Проверка, что ошибка сети при обновлении не останавливает фоновый поток: он повторяет попытку"""
+    calls = []
+
+    def refresh_callback(refresh_token):
+        calls.append(refresh_token)
+        if len(calls) <= 2:
+            raise requests.ConnectionError('сервер недоступен')
+        return 200, {'access': server._encode_token(server.user['id'], 'access', 600)}
+
+    tokens = TokenManager(refresh_callback, server._encode_token(server.user['id'], 'access', 1),
+                          server._encode_token(server.user['id'], 'refresh', 600), leeway=5)
+    tokens.start_background_refresh(retry_interval=0.01)
+    try:
+        deadline = time.time() + 3
+        while tokens.refresh_count == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        assert tokens._thread.is_alive()
+    finally:
+        tokens.stop_background_refresh()
+    assert len(calls) == 3 and tokens.refresh_count == 1
+
+
+def test_async_client_refreshes_once(server):
+    """Проверка единственного обновления токена в асинхронном клиенте"""
+    short_access = server._encode_token(server.user['id'], 'access', 5)
+    refresh = server._encode_token(server.user['id'], 'refresh', 600)
+
+    async def scenario():
+        async with AsyncZojnik(base_url=server.base_url, token_leeway=30) as zf:
+            zf.tokens.set_tokens(short_access, refresh)
+            results = await zf.gather_dish_details(range(1, 11))
+            return zf.tokens.refresh_count, [status for status, _ in results]
+
+    refresh_count, statuses = asyncio.run(scenario())
+    assert refresh_count == 1
+    assert statuses == [200] * 10
@@ -0,0 +1,104 @@
+import asyncio
+import os
+
+import pytest
+
+import uploads
+from api import Zojnik
+from async_api import AsyncZojnik
+from resilience import Resilience, RetryPolicy
+from uploads import ImagePreprocessor
+
+DISH = dict(name='Суп с фото', calories=120.5, protein=6, fat=3.5, carbohydrates=14, allergen=True, other='',
+            price=210, rating=4, category='VEGETABLE_PRODUCTS')
+
+
+@pytest.fixture
+def photo(tmp_path):
+    path = tmp_path / 'photo.jpg'
+    path.write_bytes(os.urandom(2 * 1024 * 1024))
+    return path
+
+
+def client(server, **kwargs) -> Zojnik:
+    zf = Zojnik(base_url=server.base_url, verbosity='silent', **kwargs)
+    zf.tokens.set_tokens(server.tokens['access'], server.tokens['refresh'])
+    return zf
+
+
+def test_create_dish_streams_avatar(zojnik_server, photo):
+    """Проверка потоковой отправки файла с прогрессом и приведения полей формы к типам"""
+    progress = []
+    with client(zojnik_server) as zf:
+        status, dish = zf.create_dish(**DISH, avatar=photo, on_progress=lambda sent, total: progress.append(sent))
+    assert status == 201
+    assert zojnik_server.avatars[dish['avatar']] == photo.read_bytes()
+    assert dish['avatar'].endswith('_photo.jpg')
+    assert dish['calories'] == 120.5 and dish['allergen'] is True and dish['rating'] == 4
+
+    # Файл читается кусками по мере отправки, а не целиком
+    steps = [after - before for before, after in zip(progress, progress[1:])]
+    assert len(progress) > 100 and max(steps) <= 64 * 1024
+    assert progress == sorted(progress) and progress[-1] > photo.stat().st_size
+
+
+def test_change_dish_with_open_file_is_retried_whole(zojnik_server, photo):
+    """Проверка, что при повторе запроса файл отправляется заново с начала, а строковый avatar идёт в JSON"""
+    resilience = Resilience(RetryPolicy(backoff=0))
+    with client(zojnik_server, resilience=resilience) as zf, open(photo, 'rb') as file:
+        file.read(100)
+        zojnik_server.fail_next(1, status=429, retry_after=0, path='/api/food/')
+        status, dish = zf.change_dish(1, **DISH, avatar=file)
+        assert not file.closed
+        assert zf.change_dish(2, **DISH, avatar='https://cdn.example.com/soup.jpg')[1]['avatar'] == \
+            'https://cdn.example.com/soup.jpg'
+
+    assert status == 200 and resilience.stats()['retries'] == 1
+    assert zojnik_server.avatars[dish['avatar']] == photo.read_bytes()[100:]
+
+
+def test_image_preprocessor_requires_pillow(monkeypatch):
+    """Проверка понятной ошибки без pillow"""
+    monkeypatch.setattr(uploads, '_pillow_installed', lambda: False)
+    with pytest.raises(ImportError):
+        ImagePreprocessor()
+
+
+def test_image_preprocessor(zojnik_server, tmp_path):
+    """Проверка уменьшения картинок в пуле процессов и отправки результата"""
+    Image = pytest.importorskip('PIL.Image')
+    sources = []
+    for number in range(3):
+        path = tmp_path / f'big_{number}.png'
+        Image.new('RGBA', (3000, 2000), (200, 100, number, 255)).save(path)
+        sources.append(path)
+
+    with ImagePreprocessor(max_size=(800, 800), max_workers=2) as preprocessor, client(zojnik_server) as zf:
+        for dish_id, path in enumerate(preprocessor.map(sources), start=1):
+            with Image.open(path) as image:
+                assert image.size == (800, 533) and image.format == 'JPEG'
+            status, dish = zf.change_dish(dish_id, **DISH, avatar=path)
+            assert status == 200 and zojnik_server.avatars[dish['avatar']] == path.read_bytes()
+        directory = preprocessor.directory
+    assert not os.path.exists(directory)
+
+
+def test_async_client_streams_avatar(zojnik_server, photo):
+    """Проверка, что AsyncZojnik отправляет файл так же, как Zojnik: multipart по частям, и заново после 401"""
+    progress = []
+
+    async def scenario():
+        async with AsyncZojnik(base_url=zojnik_server.base_url) as zf:
+            zf.tokens.set_tokens(zojnik_server.tokens['access'], zojnik_server.tokens['refresh'])
+            created = await zf.create_dish(**DISH, avatar=photo, on_progress=lambda sent, total: progress.append(sent))
+            # Просроченный access токен: первая отправка получает 401, файл отправляется повторно с начала
+            zf.tokens.set_tokens('expired', zojnik_server.tokens['refresh'])
+            with open(photo, 'rb') as file:
+                changed = await zf.change_dish(1, **DISH, avatar=file)
+            return created, changed
+
+    (status, dish), (changed_status, changed) = asyncio.run(scenario())
+    assert status == 201 and zojnik_server.avatars[dish['avatar']] == photo.read_bytes()
+    assert dish['calories'] == 120.5 and dish['allergen'] is True
+    assert len(progress) > 30 and progress[-1] > photo.stat().st_size
+    assert changed_status == 200 and zojnik_server.avatars[changed['avatar']] == photo.read_bytes()
@@ -0,0 +1,128 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from api import Zojnik
+from write_queue import DONE, FAILED, PENDING, WriteQueue
+
+DISH = dict(calories=100, protein=5, fat=2, carbohydrates=10, allergen=False, other='', price=150, rating=5,
+            category='GARNISH_PRODUCTS')
+
+
+@pytest.fixture
+def zf(zojnik_server):
+    with Zojnik(base_url=zojnik_server.base_url, verbosity='silent', pool_maxsize=4) as client:
+        client.tokens.set_tokens(zojnik_server.tokens['access'], zojnik_server.tokens['refresh'])
+        yield client
+
+
+def test_enqueue_returns_immediately_and_flushes(zojnik_server, zf, tmp_path):
+    """Проверка, что постановка в очередь не ждёт медленный сервер, а все записи доходят до него"""
+    zojnik_server.latency = 0.2
+    plates_before = len(zojnik_server.plates)
+    with WriteQueue(zf, tmp_path / 'writes.db', batch_size=5, start=False) as queue:
+        requests_before = zojnik_server.requests_count
+        ids = [queue.create_plate(1, 2, dish_id) for dish_id in range(3, 13)]
+        # Постановка в очередь только пишет журнал: на сервер не ушло ни одного запроса
+        assert zojnik_server.requests_count == requests_before
+        assert all(queue.status(write_id)['state'] == PENDING for write_id in ids)
+        queue.start(workers=2)
+        assert queue.wait(timeout=5)
+        statuses = [queue.status(write_id) for write_id in ids]
+
+    assert len(zojnik_server.plates) - plates_before == 10
+    assert all(status['state'] == DONE and status['response_status'] == 201 for status in statuses)
+    assert sorted(status['result']['vegetableproduct'] for status in statuses) == list(range(3, 13))
+
+
+def test_retries_do_not_duplicate(zojnik_server, zf, tmp_path):
+    """Проверка повтора после 503 и того, что повтор с тем же ключом не создаёт вторую тарелку"""
+    zojnik_server.fail_next(2, status=503, path='/api/plate/')
+    plates_before = len(zojnik_server.plates)
+    with WriteQueue(zf, tmp_path / 'writes.db', backoff=0.01, poll_interval=0.01) as queue:
+        write_id = queue.create_plate(1, 2, 3)
+        assert queue.wait(write_id, timeout=5)
+        status = queue.status(write_id)
+    assert status['state'] == DONE and status['attempts'] == 3
+    assert len(zojnik_server.plates) - plates_before == 1
+
+    # Ответ потерян, запрос отправлен снова с тем же ключом: сервер возвращает первый результат
+    first = zf.create_plate(4, 5, 6, idempotency_key='plate-key')
+    second = zf.create_plate(4, 5, 6, idempotency_key='plate-key')
+    assert first == second and zojnik_server.idempotent_replays == 1
+    assert zf.create_plate(4, 5, 6)[1]['id'] != first[1]['id']
+    assert zf.change_dish(1, name='Другой запрос', avatar='', idempotency_key='plate-key', **DISH)[0] == 422
+
+
+def test_journal_survives_restart(zojnik_server, zf, tmp_path):
+    """Проверка, что записи, не отправленные до остановки процесса, отправляются после перезапуска"""
+    path = tmp_path / 'writes.db'
+    queue = WriteQueue(zf, path, start=False)
+    created = queue.create_dish('Плов', avatar='', **DISH)
+    changed = queue.change_dish(2, 'Плов с фото', avatar=tmp_path / 'missing.jpg', **DISH)
+    profile = queue.change_user_profile('Анна', '', 'client@example.com', '', 'anna', {})
+    assert queue.counts()[PENDING] == 3
+    queue.close()
+
+    # Запись, которую прошлый процесс начал отправлять, но не завершил
+    with sqlite3.connect(path) as db:
+        db.execute("UPDATE writes SET state = 'in_progress' WHERE id = ?", (profile,))
+
+    with WriteQueue(zf, path) as queue:
+        assert queue.wait(timeout=5)
+        assert queue.status(created)['state'] == DONE and queue.status(created)['result']['name'] == 'Плов'
+        assert queue.status(profile)['state'] == DONE
+        # Файл avatar пропал: повтор не поможет, запись сразу завершается ошибкой
+        failed = queue.status(changed)
+        assert failed['state'] == FAILED and failed['attempts'] == 1 and 'FileNotFoundError' in failed['error']
+        assert queue.counts() == {'pending': 0, 'in_progress': 0, 'done': 2, 'failed': 1}
+    assert zojnik_server.users[1]['user']['first_name'] == 'Анна'
+
+
+def test_permanent_errors_and_validation(zf, tmp_path):
+    """Проверка, что 4xx не повторяется, а неподходящие вызовы отклоняются сразу"""
+    with WriteQueue(zf, tmp_path / 'writes.db') as queue:
+        write_id = queue.create_dish('', avatar='', **DISH)
+        assert queue.wait(write_id, timeout=5)
+        status = queue.status(write_id)
+        assert (status['state'], status['response_status'], status['attempts']) == (FAILED, 400, 1)
+        assert queue.status('unknown') is None
+
+        with pytest.raises(ValueError):
+            queue.enqueue('get_plate_details', 1)
+        with open(__file__, 'rb') as file, pytest.raises(TypeError):
+            queue.create_dish('Суп', avatar=file, **DISH)
+
+
+def test_reused_idempotency_key(zf, tmp_path):
+    """Проверка, что повтор enqueue с тем же ключом не создаёт вторую запись, а ключ другого вызова отклоняется"""
+    with WriteQueue(zf, tmp_path / 'writes.db', start=False) as queue:
+        assert queue.create_plate(1, 2, 3, idempotency_key='plate-1') == 'plate-1'
+        assert queue.create_plate(1, 2, 3, idempotency_key='plate-1') == 'plate-1'
+        assert queue.counts()[PENDING] == 1
+        with pytest.raises(ValueError, match='plate-1'):
+            queue.create_plate(4, 5, 6, idempotency_key='plate-1')
+
+
+def test_close_with_timeout_waits_for_busy_worker(zojnik_server, zf, tmp_path, monkeypatch):
+    """Проверка, что close(timeout) не закрывает журнал под потоком, который ещё отправляет пачку"""
+    errors = []
+    monkeypatch.setattr(threading, 'excepthook', lambda args: errors.append(args.exc_value))
+    zojnik_server.latency = 0.3
+    path = tmp_path / 'writes.db'
+    queue = WriteQueue(zf, path, workers=1, poll_interval=0.01)
+    write_id = queue.create_plate(1, 2, 3)
+    while queue.status(write_id)['state'] == PENDING:
+        time.sleep(0.01)
+    worker = queue._threads[0]
+    queue.close(timeout=0.01)
+    assert worker.is_alive()
+    worker.join(5)
+
+    assert errors == []
+    with sqlite3.connect(path) as db:
+        assert db.execute('SELECT state FROM writes WHERE id = ?', (write_id,)).fetchone() == (DONE,)
+    with pytest.raises(sqlite3.ProgrammingError):
+        queue._db.execute('SELECT 1')
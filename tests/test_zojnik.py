@@ -1,63 +1,66 @@
 from api import Zojnik
-from settings import (admin_username, valid_email, admin_password, valid_password, valid_refresh_token,
-                      valid_access_token, valid_email_2, valid_password_2, new_valid_password, user_id)
-import os
 
-zf = Zojnik()
+# Фикстуры zf, account, register_account, dish, plate_dishes и plate - в conftest.py. У каждого воркера pytest-xdist свой
+# зарегистрированный пользователь и токены в памяти, поэтому тесты не зависят от порядка и не пишут в .env
 
-def test_successful_get_access_and_refresh_token_pair(username=valid_email, password=valid_password):
+def test_successful_get_access_and_refresh_token_pair(zf, account):
     """ Takes a set of user credentials and returns an access and refresh JSON web token pair to prove
     the authentication of those credentials."""
-    status, result = zf.get_access_and_refresh_token_pair(username, password)
+    status, result = zf.get_access_and_refresh_token_pair(account['email'], account['password'])
     assert 200 <= status < 300
     assert 'access' in result
     assert 'refresh' in result
 
-    # Запись access_token в .env файл
-    zf.update_env_file('valid_access_token', result['access'])
-    # Запись refresh_token в .env файл
-    zf.update_env_file('valid_refresh_token', result['refresh'])
+    # Полученные токены клиент хранит в памяти
+    assert zf.tokens.access_token == result['access']
 
-def test_successful_get_access_token_by_refresh_token(refresh_token=valid_refresh_token):
+def test_successful_get_access_token_by_refresh_token(zf):
     """ Takes a refresh type JSON web token and returns an access type JSON web token if the refresh token is valid"""
-    status, result = zf.get_access_token_by_refresh_token(refresh_token)
+    status, result = zf.get_access_token_by_refresh_token(zf.tokens.refresh_token)
     assert 200 <= status < 300
     assert 'access' in result
     assert 'refresh' in result
 
-def test_successful_verify_token(token=valid_access_token):
+def test_successful_verify_token(zf):
     """Takes a token and indicates if it is valid"""
-    status = zf.verify_token(token)
+    status = zf.verify_token(zf.tokens.access_token)
     assert 200 <= status < 300
 
-def test_successful_new_user_registration(first_name='', last_name='', username='', phone_number='', email=valid_email_2, password=valid_password_2):
+def test_successful_new_user_registration(zf, unique_email, first_name='', last_name='', username='', phone_number='', password='Newuser11'):
     """Проверка возможности регистрации нового пользователя"""
+    email = unique_email('registration')
     status, result = zf.new_user_registration(first_name, last_name, username, phone_number, email, password)
     assert 200 <= status < 300
     assert result ['email'] == email
 
-def test_successful_open_user_profile():
+def test_successful_open_user_profile(zf, account):
     """Проверка возможности просмотра данных зарегистрированного пользователя"""
     status, result = zf.open_user_profile()
     assert 200 <= status < 300
-    assert result ['email'] == valid_email
+    assert result ['email'] == account['email']
 
-def test_successful_change_password(old_password=valid_password, new_password=new_valid_password):
+def test_successful_change_password(register_account, new_password='Changed11pass'):
     """Проверка возможности смены пароля"""
-    status = zf.change_password(old_password, new_password)
-    assert 200 <= status < 300
-
-    # Перезапись паролей в .env файле
-    zf.update_env_file('valid_password', new_password)
-    zf.update_env_file('new_valid_password', old_password)
-
-def test_successful_change_user_profile(first_name='Bob', last_name='White', email=valid_email, phone_number='', username='Bo', profile={}):
+    # Пароль меняется у отдельного пользователя, чтобы не мешать остальным тестам воркера
+    account = register_account()
+    with Zojnik() as client:
+        client.get_access_and_refresh_token_pair(account['email'], account['password'])
+        status = client.change_password(account['password'], new_password)
+        assert 200 <= status < 300
+
+        # Со старым паролем войти уже нельзя, с новым - можно
+        status, _ = client.get_access_and_refresh_token_pair(account['email'], account['password'])
+        assert status >= 400
+        status, _ = client.get_access_and_refresh_token_pair(account['email'], new_password)
+        assert 200 <= status < 300
+
+def test_successful_change_user_profile(zf, account, first_name='Bob', last_name='White', phone_number='', username='Bo', profile={}):
     """Проверка возможности частичного изменения данных пользователя"""
-    status, result = zf.change_user_profile(first_name, last_name, email, phone_number, username, profile)
+    status, result = zf.change_user_profile(first_name, last_name, account['email'], phone_number, username, profile)
     assert 200 <= status < 300
     assert result ['first_name'] == first_name
 
-def test_successful_get_food_categories():
+def test_successful_get_food_categories(zf):
     """Проверка возможности просмотра категорий продуктов для зарегистрированного пользователя"""
     status, result = zf.get_food_categories()
     assert 200 <= status < 300
@@ -65,7 +68,7 @@ def test_successful_get_food_categories():
     #Проверка, что список не пустой
     assert len(result) > 0
 
-def test_successful_get_list_of_tags():
+def test_successful_get_list_of_tags(zf):
     """Проверка возможности получения списка тегов для зарегистрированного пользователя"""
     status, result = zf.get_list_of_tags()
     assert 200 <= status < 300
@@ -73,7 +76,7 @@ def test_successful_get_list_of_tags():
     #Проверка, что список не пустой
     assert len(result) > 0
 
-def test_successful_get_list_of_antitags():
+def test_successful_get_list_of_antitags(zf):
     """Проверка возможности получения списка антитегов для зарегистрированного пользователя"""
     status, result = zf.get_list_of_antitags()
     assert 200 <= status < 300
@@ -81,47 +84,47 @@ def test_successful_get_list_of_antitags():
     #Проверка, что список не пустой
     assert len(result) > 0
 
-def test_successful_get_list_of_plates():
+def test_successful_get_list_of_plates(zf, plate):
     """Проверка возможности просмотра списка тарелок для зарегистрированного пользователя"""
     status, result = zf.get_list_of_plates()
     assert 200 <= status < 300
     # Проверка, что список не пустой
     assert len(result) > 0
 
-def test_successful_create_plate(protein=18, garnish=3, vegetable=7):
+def test_successful_create_plate(zf, plate_dishes):
     """Проверка возможности создания тарелки по id компонентов для зарегистрированного пользователя"""
-    status, result = zf.create_plate(protein, garnish, vegetable)
+    status, result = zf.create_plate(*plate_dishes)
     assert 200 <= status < 300
 
-def test_successful_get_plate_details(plate_id = 5):
+def test_successful_get_plate_details(zf, plate):
     """Проверка возможности просмотра полной информации о созданной тарелке по её id для зарегистрированного пользователя"""
-    status, result = zf.get_plate_details(plate_id)
+    status, result = zf.get_plate_details(plate['id'])
     assert 200 <= status < 300
     # Проверка, что id соответствует введённому
-    assert result ['id'] == plate_id
+    assert result ['id'] == plate['id']
 
-def test_successful_get_menu_with_filters(tags='Мясо%Гарнир', antitags='Куркума%Паприка', category='Белковое блюдо'):
+def test_successful_get_menu_with_filters(zf, tags='Мясо%Гарнир', antitags='Куркума%Паприка', category='Белковое блюдо'):
     """Проверка возможности фильтрации блюд по тегам, антитегам и категории для зарегистрированного пользователя"""
     status, result = zf.get_menu_with_filters(tags, antitags, category)
     assert 200 <= status < 300
     assert 'Куркума' and 'Паприка' not in result
 
-def test_successful_create_dish(name='Шашлык из говядины', calories=465.5, protein=22.1, fat=40.8, carbohydrates=2.7, allergen=True, other=None, price=800, rating=0, avatar=None, category='PROTEIN_PRODUCTS'):
+def test_successful_create_dish(zf, name='Шашлык из говядины', calories=465.5, protein=22.1, fat=40.8, carbohydrates=2.7, allergen=True, other=None, price=800, rating=0, avatar=None, category='PROTEIN_PRODUCTS'):
     """Проверка возможности создания тарелки по id компонентов для зарегистрированного пользователя"""
     status, result = zf.create_dish(name, calories, protein, fat, carbohydrates, allergen, other, price, rating, avatar, category)
     assert 200 <= status < 300
     assert result['name'] == name
 
-def test_successful_get_dish_details(dish_id = 98):
+def test_successful_get_dish_details(zf, dish):
     """Проверка возможности просмотра полной информации о созданном блюде по его id для зарегистрированного пользователя"""
-    status, result = zf.get_dish_details(dish_id)
+    status, result = zf.get_dish_details(dish['id'])
     assert 200 <= status < 300
     # Проверка, что id соответствует введённому
-    assert result ['id'] == dish_id
+    assert result ['id'] == dish['id']
 
-#FAILED
 def test_successful_change_dish(
-        dish_id=98,
+        zf,
+        dish,
         name='Шашлык из свинины',
         calories=285,
         protein=14,
@@ -134,7 +137,7 @@ def test_successful_change_dish(
         avatar=None,
         category='PROTEIN_PRODUCTS'):
     """Проверка возможности изменения блюда по его id для зарегистрированного пользователя"""
-    status, result = zf.change_dish(dish_id, name, calories, protein, fat, carbohydrates, allergen, other, price, rating, avatar, category)
+    status, result = zf.change_dish(dish['id'], name, calories, protein, fat, carbohydrates, allergen, other, price, rating, avatar, category)
     assert 200 <= status < 300
     assert result['name'] == name
 
@@ -0,0 +1,161 @@
+import base64
+import hashlib
+import json
+import threading
+import time
+
+
+def _decode_claims(token: str) -> dict:
+    try:
+        payload = token.split('.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+    except (AttributeError, IndexError, TypeError, ValueError):
+        return {}
+    return claims if isinstance(claims, dict) else {}
+
+
+def decode_token_expiry(token: str):
+    """Возвращает время истечения JWT (поле exp, unix-время) или None, если его не удалось прочитать.
+    Подпись не проверяется: это делает сервер"""
+    try:
+        return float(_decode_claims(token)['exp'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def token_identity(token: str) -> str:
+    """Пользователь, которому выдан access токен: 'user:<user_id>' из JWT, а если поля нет - хэш самого токена.
+    Не меняется при обновлении токена, поэтому подходит для ключей кэша. None - токена нет"""
+    if not token:
+        return None
+    user_id = _decode_claims(token).get('user_id')
+    if user_id is not None:
+        return f'user:{user_id}'
+    return 'token:' + hashlib.sha256(token.encode('utf-8')).hexdigest()[:32]
+
+
+class _TokenState:
+    """Пара access/refresh токенов в памяти и срок жизни access токена"""
+
+    def __init__(self, access_token: str = None, refresh_token: str = None, leeway: float = 30.0):
+        self.leeway = leeway
+        self.refresh_count = 0
+        self.access_token = None
+        self.refresh_token = None
+        self.expires_at = None
+        self.set_tokens(access_token, refresh_token)
+
+    def set_tokens(self, access_token: str, refresh_token: str = None):
+        """Сохраняет новую пару токенов. Если refresh токен не передан, остаётся прежний"""
+        self.access_token = access_token
+        if refresh_token:
+            self.refresh_token = refresh_token
+        self.expires_at = decode_token_expiry(access_token) if access_token else None
+
+    def needs_refresh(self) -> bool:
+        """Access токен истекает в ближайшие leeway секунд (или его нет вовсе)"""
+        if not self.access_token:
+            return True
+        return self.expires_at is not None and self.expires_at - self.leeway <= time.time()
+
+    def _apply_refresh(self, status: int, result) -> bool:
+        if 200 <= status < 300 and isinstance(result, dict) and result.get('access'):
+            self.set_tokens(result['access'], result.get('refresh'))
+            self.refresh_count += 1
+            return True
+        return False
+
+
+class TokenManager(_TokenState):
+    '''Хранит access/refresh токены в памяти и обновляет access токен незадолго до истечения.
+
+    refresh_callback(refresh_token) должен возвращать статус и результат, как Zojnik.get_access_token_by_refresh_token.
+    Одновременные запросы на обновление из разных потоков приводят ровно к одному вызову refresh_callback'''
+
+    def __init__(self, refresh_callback, access_token: str = None, refresh_token: str = None, leeway: float = 30.0):
+        super().__init__(access_token, refresh_token, leeway)
+        self._refresh_callback = refresh_callback
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def get_access_token(self):
+        """Возвращает действующий access токен, при необходимости обновив его"""
+        access_token = self.access_token
+        if self.needs_refresh() and self.refresh_token:
+            self.refresh(stale_token=access_token)
+        return self.access_token
+
+    def refresh(self, stale_token: str = None) -> bool:
+        """Обновляет access токен по refresh токену.
+
+        stale_token - токен, который вызывающий считает устаревшим. Если пока поток ждал блокировку его уже
+        заменили, повторного запроса к серверу не будет"""
+        with self._lock:
+            if stale_token is not None and self.access_token != stale_token:
+                return True
+            if not self.refresh_token:
+                return False
+            status, result = self._refresh_callback(self.refresh_token)
+            return self._apply_refresh(status, result)
+
+    def start_background_refresh(self, retry_interval: float = 5.0):
+        """Запускает фоновый поток, который обновляет токен за leeway секунд до истечения"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._background_loop, args=(retry_interval,),
+                                        name='zojnik-token-refresh', daemon=True)
+        self._thread.start()
+
+    def stop_background_refresh(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _background_loop(self, retry_interval: float):
+        while not self._stop.is_set():
+            if self.expires_at is None or not self.refresh_token:
+                delay = retry_interval
+            else:
+                delay = max(self.expires_at - self.leeway - time.time(), 0)
+            if self._stop.wait(delay):
+                break
+            if not (self.refresh_token and self.needs_refresh()):
+                continue
+            try:
+                refreshed = self.refresh(stale_token=self.access_token)
+            except Exception:
+                # Временная ошибка сети или сервера не должна останавливать фоновое обновление
+                refreshed = False
+            if not refreshed:
+                self._stop.wait(retry_interval)
+
+
+class AsyncTokenManager(_TokenState):
+    '''Асинхронный вариант TokenManager: refresh_callback является корутиной, а одновременные обновления внутри
+    event loop объединяются в один запрос'''
+
+    def __init__(self, refresh_callback, access_token: str = None, refresh_token: str = None, leeway: float = 30.0):
+        super().__init__(access_token, refresh_token, leeway)
+        self._refresh_callback = refresh_callback
+        self._lock = None
+
+    async def get_access_token(self):
+        access_token = self.access_token
+        if self.needs_refresh() and self.refresh_token:
+            await self.refresh(stale_token=access_token)
+        return self.access_token
+
+    async def refresh(self, stale_token: str = None) -> bool:
+        if self._lock is None:
+            import asyncio  # не импортируется вместе с модулем: синхронному клиенту asyncio не нужен
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if stale_token is not None and self.access_token != stale_token:
+                return True
+            if not self.refresh_token:
+                return False
+            status, result = await self._refresh_callback(self.refresh_token)
+            return self._apply_refresh(status, result)
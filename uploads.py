@@ -0,0 +1,134 @@
+import importlib.util
+import io
+import os
+import pathlib
+import shutil
+import tempfile
+
+# requests_toolbelt, mimetypes, concurrent.futures и PIL импортируются при первом использовании:
+# api импортирует этот модуль всегда, а загрузка файлов нужна редко
+
+
+def is_upload(value) -> bool:
+    """Файл для отправки: путь (pathlib.Path) или открытый в двоичном режиме файл. Строка остаётся значением
+    поля, как раньше (например, URL уже загруженной картинки)"""
+    return isinstance(value, (os.PathLike, io.IOBase))
+
+
+def form_value(value) -> str:
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+class AvatarUpload:
+    '''Тело multipart/form-data, в котором файл из поля file_field читается с диска по частям во время отправки
+    и целиком в памяти не держится.
+
+    encoder() каждый раз строит новое тело с начала файла, поэтому запрос можно повторить (после обновления
+    токена или через resilience). on_progress(отправлено_байт, всего_байт) вызывается по мере отправки'''
+
+    def __init__(self, fields: dict, on_progress=None, file_field: str = 'avatar'):
+        self.source = fields[file_field]
+        self.fields = {name: form_value(value) for name, value in fields.items()
+                       if name != file_field and value is not None}
+        self.file_field = file_field
+        self.on_progress = on_progress
+        self._opened = None
+        self._start = None if isinstance(self.source, os.PathLike) else self.source.tell()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Закрывает файл, открытый по пути. Переданный открытым файл остаётся открытым"""
+        if self._opened is not None:
+            self._opened.close()
+            self._opened = None
+
+    def encoder(self):
+        """Новое тело запроса: requests_toolbelt MultipartEncoderMonitor"""
+        import mimetypes
+        from requests_toolbelt.multipart.encoder import MultipartEncoder, MultipartEncoderMonitor
+
+        self.close()
+        if self._start is None:
+            file = self._opened = open(self.source, 'rb')
+        else:
+            file = self.source
+            file.seek(self._start)
+        filename = os.path.basename(getattr(file, 'name', None) or self.file_field)
+        content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        encoder = MultipartEncoder(fields={**self.fields, self.file_field: (filename, file, content_type)})
+        callback = None
+        if self.on_progress is not None:
+            callback = lambda monitor: self.on_progress(monitor.bytes_read, monitor.len)
+        return MultipartEncoderMonitor(encoder, callback)
+
+
+def _pillow_installed() -> bool:
+    return importlib.util.find_spec('PIL') is not None
+
+
+def _preprocess(source: str, target: str, max_size: tuple, quality: int, image_format: str) -> str:
+    """Выполняется в процессе пула: уменьшает картинку до max_size с сохранением пропорций и пережимает её"""
+    from PIL import Image
+
+    with Image.open(source) as image:
+        image.thumbnail(max_size)
+        if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image.save(target, image_format, quality=quality, optimize=True)
+    return target
+
+
+class ImagePreprocessor:
+    '''Уменьшение и пережатие картинок перед загрузкой в отдельных процессах, чтобы массовое обновление меню
+    с фотографиями не занимало поток вызывающего и не раздувало память основного процесса.
+
+    Готовые файлы складываются во временный каталог и удаляются при close(). Требует пакет pillow'''
+
+    EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+
+    def __init__(self, max_size: tuple = (1024, 1024), quality: int = 85, image_format: str = 'JPEG',
+                 max_workers: int = None, directory: str = None):
+        if not _pillow_installed():
+            raise ImportError("ImagePreprocessor требует пакет pillow")
+        from concurrent.futures import ProcessPoolExecutor
+
+        self.max_size = tuple(max_size)
+        self.quality = quality
+        self.image_format = image_format.upper()
+        self.directory = tempfile.mkdtemp(prefix='zojnik-avatars-', dir=directory)
+        self._executor = ProcessPoolExecutor(max_workers)
+        self._submitted = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def submit(self, source):
+        """Ставит картинку в очередь. Future вернёт путь к готовому файлу"""
+        self._submitted += 1
+        stem = os.path.splitext(os.path.basename(source))[0]
+        extension = self.EXTENSIONS.get(self.image_format, '')
+        target = os.path.join(self.directory, f'{self._submitted}_{stem}{extension}')
+        return self._executor.submit(_preprocess, os.fspath(source), target, self.max_size, self.quality,
+                                     self.image_format)
+
+    def map(self, sources):
+        """Ставит в очередь все картинки сразу и отдаёт pathlib.Path готовых файлов в порядке sources:
+        первую можно отправлять, пока остальные ещё обрабатываются"""
+        futures = [self.submit(source) for source in sources]
+        for future in futures:
+            yield pathlib.Path(future.result())
+
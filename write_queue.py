@@ -0,0 +1,263 @@
+import json
+import pathlib
+import sqlite3
+import threading
+import time
+import uuid
+
+import requests
+
+from resilience import CircuitOpenError
+
+PENDING, IN_PROGRESS, DONE, FAILED = 'pending', 'in_progress', 'done', 'failed'
+# Методы Zojnik, которые можно поставить в очередь
+QUEUED_METHODS = ('create_plate', 'create_dish', 'change_dish', 'change_user_profile')
+# Ответы, после которых запись повторяется позже; остальные 4xx - окончательная ошибка
+RETRY_STATUSES = frozenset({408, 425, 429})
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS writes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    method TEXT NOT NULL,
+    arguments TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    response_status INTEGER,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS writes_queue ON writes (state, next_attempt_at, seq);
+'''
+
+
+def _encode_arguments(arguments: dict) -> str:
+    """Аргументы хранятся в JSON; путь к файлу (avatar=Path(...)) сохраняется как путь, а не как строка"""
+    def default(value):
+        if isinstance(value, pathlib.PurePath):
+            return {'$path': str(value)}
+        raise TypeError(f'Аргумент {value!r} нельзя сохранить в журнал: поддерживаются JSON-значения и пути')
+
+    return json.dumps(arguments, ensure_ascii=False, default=default)
+
+
+def _decode_arguments(text: str) -> dict:
+    return json.loads(text, object_hook=lambda value: pathlib.Path(value['$path']) if set(value) == {'$path'}
+                      else value)
+
+
+class WriteQueue:
+    '''Отложенная запись: create_plate, create_dish, change_dish и change_user_profile сохраняются в журнал SQLite
+    и сразу возвращают id записи, а фоновые потоки отправляют их на сервер пачками по batch_size.
+
+    id записи передаётся серверу как Idempotency-Key, поэтому повтор после сбоя сети или перезапуска процесса
+    не создаёт дублей. Журнал переживает перезапуск: незавершённые записи отправляются снова. Ответы 5xx, 408,
+    425, 429 и сетевые ошибки повторяются с экспоненциальной задержкой, пока не кончатся max_attempts;
+    остальные 4xx сразу переводят запись в failed. status(id) показывает состояние записи'''
+
+    def __init__(self, client, path: str = 'zojnik_writes.sqlite3', workers: int = 2, batch_size: int = 20,
+                 poll_interval: float = 0.5, max_attempts: int = 5, backoff: float = 0.5, max_backoff: float = 60.0,
+                 start: bool = True):
+        self.client = client
+        self.path = path
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        # Одно соединение на все потоки под блокировкой: записи в журнал короткие, а WAL не блокирует чтение
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._stopping = False
+        self._closed = False
+        self._active = 0
+        self._threads = []
+        with self._lock:
+            # Записи, отправка которых прервалась вместе с прошлым процессом
+            self._db.execute('UPDATE writes SET state = ? WHERE state = ?', (PENDING, IN_PROGRESS))
+        if start:
+            self.start(workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start(self, workers: int = 2):
+        for number in range(workers):
+            thread = threading.Thread(target=self._work, name=f'zojnik-write-queue-{number}', daemon=True)
+            with self._lock:
+                self._active += 1
+            thread.start()
+            self._threads.append(thread)
+
+    def close(self, timeout: float = None):
+        """Останавливает потоки после текущей пачки. Неотправленные записи остаются в журнале.
+
+        Если за timeout потоки не завершились, журнал закрывает последний из них, дописав результат своей пачки"""
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        with self._lock:
+            self._closed = True
+            if self._active == 0:
+                self._db.close()
+
+    # ---- Постановка в очередь ----
+
+    def enqueue(self, method: str, *args, **kwargs) -> str:
+        """Сохраняет вызов client.method(*args, **kwargs) в журнал и возвращает id записи.
+
+        Повтор с тем же idempotency_key и теми же аргументами возвращает id уже сохранённой записи, не создавая
+        вторую. Тот же ключ у другого вызова - ValueError"""
+        if method not in QUEUED_METHODS:
+            raise ValueError(f"Метод {method!r} нельзя поставить в очередь: "
+                             f"ожидается один из {', '.join(QUEUED_METHODS)}")
+        write_id = kwargs.pop('idempotency_key', None) or str(uuid.uuid4())
+        arguments = _encode_arguments({'args': args, 'kwargs': kwargs})
+        now = time.time()
+        with self._lock:
+            try:
+                self._db.execute('INSERT INTO writes (id, method, arguments, state, next_attempt_at, created_at, '
+                                 'updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                 (write_id, method, arguments, PENDING, now, now, now))
+            except sqlite3.IntegrityError:
+                stored = self._db.execute('SELECT method, arguments FROM writes WHERE id = ?', (write_id,)).fetchone()
+                if stored != (method, arguments):
+                    raise ValueError(f'idempotency_key {write_id!r} уже использован для другой записи') from None
+                return write_id
+            self._wakeup.notify()
+        return write_id
+
+    def create_plate(self, *args, **kwargs) -> str:
+        return self.enqueue('create_plate', *args, **kwargs)
+
+    def create_dish(self, *args, **kwargs) -> str:
+        return self.enqueue('create_dish', *args, **kwargs)
+
+    def change_dish(self, *args, **kwargs) -> str:
+        return self.enqueue('change_dish', *args, **kwargs)
+
+    def change_user_profile(self, *args, **kwargs) -> str:
+        return self.enqueue('change_user_profile', *args, **kwargs)
+
+    # ---- Состояние ----
+
+    def status(self, write_id: str) -> dict:
+        """Состояние записи: state (pending, in_progress, done, failed), attempts, response_status и result
+        последнего ответа, error - описание сетевой ошибки. None, если записи нет"""
+        with self._lock:
+            row = self._db.execute('SELECT id, method, state, attempts, response_status, result, error, created_at, '
+                                   'updated_at FROM writes WHERE id = ?', (write_id,)).fetchone()
+        if row is None:
+            return None
+        keys = ('id', 'method', 'state', 'attempts', 'response_status', 'result', 'error', 'created_at', 'updated_at')
+        status = dict(zip(keys, row))
+        status['result'] = json.loads(status['result']) if status['result'] is not None else None
+        return status
+
+    def counts(self) -> dict:
+        """Число записей в каждом состоянии"""
+        with self._lock:
+            rows = self._db.execute('SELECT state, COUNT(*) FROM writes GROUP BY state').fetchall()
+        return {PENDING: 0, IN_PROGRESS: 0, DONE: 0, FAILED: 0, **dict(rows)}
+
+    def wait(self, write_id: str = None, timeout: float = None) -> bool:
+        """Ждёт завершения записи write_id (или всех записей, если он не задан). False - если не дождались"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if write_id is not None:
+                finished = self.status(write_id)['state'] in (DONE, FAILED)
+            else:
+                counts = self.counts()
+                finished = counts[PENDING] + counts[IN_PROGRESS] == 0
+            if finished:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+
+    # ---- Отправка ----
+
+    def _claim(self) -> list:
+        """Забирает пачку готовых к отправке записей, помечая их in_progress, чтобы их не взял другой поток"""
+        now = time.time()
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self._db.execute('SELECT seq, id, method, arguments, attempts FROM writes '
+                                        'WHERE state = ? AND next_attempt_at <= ? ORDER BY seq LIMIT ?',
+                                        (PENDING, now, self.batch_size)).fetchall()
+                self._db.executemany('UPDATE writes SET state = ?, updated_at = ? WHERE seq = ?',
+                                     [(IN_PROGRESS, now, row[0]) for row in rows])
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+        return rows
+
+    def _work(self):
+        try:
+            while True:
+                with self._lock:
+                    if self._stopping:
+                        return
+                rows = self._claim()
+                if not rows:
+                    with self._lock:
+                        if not self._stopping:
+                            self._wakeup.wait(self.poll_interval)
+                    continue
+                self._finish([self._send(*row[1:]) for row in rows])
+        finally:
+            with self._lock:
+                self._active -= 1
+                # close() не дождался этого потока и оставил журнал открытым
+                if self._closed and self._active == 0:
+                    self._db.close()
+
+    def _send(self, write_id: str, method: str, arguments: str, attempts: int) -> tuple:
+        """Отправляет одну запись и возвращает значения для UPDATE"""
+        arguments = _decode_arguments(arguments)
+        attempts += 1
+        now = time.time()
+        try:
+            status, result = getattr(self.client, method)(*arguments['args'], **arguments['kwargs'],
+                                                          idempotency_key=write_id, verbosity='silent')
+        except (requests.RequestException, CircuitOpenError) as error:
+            status, result, message, retry = None, None, f'{type(error).__name__}: {error}', True
+        except Exception as error:
+            # Например, файл avatar удалён до отправки: повтор не поможет
+            status, result, message, retry = None, None, f'{type(error).__name__}: {error}', False
+        else:
+            message = None
+            retry = status >= 500 or status in RETRY_STATUSES
+        if retry and attempts < self.max_attempts:
+            state = PENDING
+        elif status is not None and status < 300:
+            state = DONE
+        else:
+            state = FAILED
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+        return (state, attempts, now + delay, status, json.dumps(result, ensure_ascii=False), message, now,
+                write_id)
+
+    def _finish(self, updates: list):
+        """Результаты пачки записываются одной транзакцией"""
+        with self._lock:
+            self._db.execute('BEGIN')
+            self._db.executemany('UPDATE writes SET state = ?, attempts = ?, next_attempt_at = ?, '
+                                 'response_status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?', updates)
+            self._db.execute('COMMIT')
+            self._wakeup.notify_all()
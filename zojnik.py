@@ -0,0 +1,138 @@
+'''Командная строка для API Zojnik: python -m zojnik <команда> [аргументы].
+
+Каждый публичный метод Zojnik доступен как команда с тем же именем через дефис (get-plate-details 5,
+verify-token TOKEN, create-plate 1 2 3). Ответ печатается в JSON одной строкой: {"status": ..., "result": ...};
+пакетные и потоковые методы (get-dishes, iter-plates) печатают по строке JSON на запись. Код выхода 0 при
+успешных ответах, 1 при ошибке HTTP.
+
+Модуль рассчитан на частые запуски из cron и скриптов: на старте импортируются только argparse и inspect,
+api (и requests) загружается при разборе команды, а httpx, requests_toolbelt, dotenv и pillow - только если
+команде они действительно нужны'''
+import argparse
+import inspect
+import json
+import os
+import sys
+
+# Публичные методы Zojnik, которые не обращаются к API
+SKIPPED_METHODS = {'close', 'get_authorized_headers', 'update_env_file', 'update_env_values'}
+# Параметры, которые в командной строке не имеют смысла
+SKIPPED_PARAMETERS = {'self', 'verbosity', 'on_progress', 'model'}
+
+
+def parse_bool(value: str) -> bool:
+    lowered = value.lower()
+    if lowered in ('true', '1', 'yes', 'да'):
+        return True
+    if lowered in ('false', '0', 'no', 'нет'):
+        return False
+    raise argparse.ArgumentTypeError(f'ожидается true или false, получено {value!r}')
+
+
+def parse_avatar(value: str):
+    """@путь - загрузить файл (как у curl), иначе строка передаётся как есть (например, URL картинки)"""
+    if value.startswith('@'):
+        import pathlib
+        return pathlib.Path(value[1:])
+    return value
+
+
+CONVERTERS = {int: int, float: float, bool: parse_bool, dict: json.loads}
+
+
+def _converter(parameter: inspect.Parameter):
+    if parameter.name == 'avatar':
+        return parse_avatar
+    return CONVERTERS.get(parameter.annotation, str)
+
+
+def _command_name(method_name: str) -> str:
+    return method_name.replace('_', '-')
+
+
+def api_methods(client_class) -> dict:
+    """Команда -> метод клиента для всех публичных методов, которые обращаются к API"""
+    return {_command_name(name): method for name, method in inspect.getmembers(client_class, inspect.isfunction)
+            if not name.startswith('_') and name not in SKIPPED_METHODS}
+
+
+def add_method_arguments(parser: argparse.ArgumentParser, method):
+    """Аргументы команды по сигнатуре метода: обязательные параметры становятся позиционными, параметры
+    со значением по умолчанию и keyword-only - опциями --имя-параметра"""
+    for parameter in inspect.signature(method).parameters.values():
+        if parameter.name in SKIPPED_PARAMETERS:
+            continue
+        converter = _converter(parameter)
+        if parameter.name.endswith('_ids'):
+            parser.add_argument(parameter.name, type=int, nargs='+')
+        elif parameter.default is inspect.Parameter.empty:
+            parser.add_argument(parameter.name, type=converter)
+        else:
+            parser.add_argument('--' + _command_name(parameter.name), dest=parameter.name, type=converter,
+                                default=parameter.default)
+
+
+def build_parser(client_class) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m zojnik', description='Вызов методов API Zojnik')
+    parser.add_argument('--base-url', help='адрес API, по умолчанию ZOJNIK_BASE_URL или dev-сервер')
+    parser.add_argument('--env', help='путь к .env с учётными данными; без него ищется ближайший .env')
+    parser.add_argument('--timeout', type=float, help='таймаут запроса в секундах')
+    parser.add_argument('--pretty', action='store_true', help='печатать JSON с отступами')
+    commands = parser.add_subparsers(dest='command', metavar='команда', required=True)
+    for name, method in api_methods(client_class).items():
+        summary = (inspect.getdoc(method) or '').split('\n')[0]
+        add_method_arguments(commands.add_parser(name, help=summary, description=inspect.getdoc(method)), method)
+    return parser
+
+
+def _dump(value, pretty: bool) -> str:
+    return json.dumps(value, ensure_ascii=False, indent=2 if pretty else None, default=str)
+
+
+def print_result(result, pretty: bool = False, output=None) -> int:
+    """Печатает результат метода и возвращает код выхода"""
+    output = output or sys.stdout
+    if isinstance(result, int):
+        # verify_token и change_password возвращают только статус
+        print(_dump({'status': result}, pretty), file=output)
+        return 0 if result < 400 else 1
+    if isinstance(result, tuple):
+        status, body = result
+        print(_dump({'status': status, 'result': body}, pretty), file=output)
+        return 0 if status < 400 else 1
+
+    failed = False
+    for item in result:
+        if isinstance(item, tuple):  # get_dishes и get_plates: (id, статус, результат)
+            item_id, status, body = item
+            failed = failed or status is None or status >= 400
+            item = {'id': item_id, 'status': status, 'result': body}
+        print(_dump(item, pretty), file=output)
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    # --env нужен до импорта api: путь к .env определяется при создании клиента
+    env_parser = argparse.ArgumentParser(add_help=False)
+    env_parser.add_argument('--env')
+    known, _ = env_parser.parse_known_args(argv)
+    if known.env:
+        os.environ['ZOJNIK_DOTENV'] = known.env
+
+    from api import Zojnik
+
+    args = build_parser(Zojnik).parse_args(argv)
+    method = api_methods(Zojnik)[args.command]
+    options = {'base_url': args.base_url, 'verbosity': 'silent'}
+    if args.timeout is not None:
+        options['timeout'] = args.timeout
+    arguments = {name: value for name, value in vars(args).items()
+                 if name not in ('base_url', 'env', 'timeout', 'pretty', 'command')}
+
+    with Zojnik(**options) as client:
+        raise SystemExit(print_result(method(client, **arguments), args.pretty))
+
+
+if __name__ == '__main__':
+    main()